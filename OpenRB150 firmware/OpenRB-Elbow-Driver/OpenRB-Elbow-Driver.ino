@@ -9,6 +9,7 @@
 // - Performs a pre-movement check to ensure a motor isn't already at its limit.
 //
 // - Send "TOGGLE_VERBOSE" to switch between detailed logging and a fast, quiet mode.
+// - Send "PING <token>" to get "PONG <token>" back (link heartbeat / round-trip time).
 // - In quiet mode, only critical errors are printed.
 //
 
@@ -309,6 +310,11 @@ void handleSerialCommands() {
         DEBUG_SERIAL.print("Verbose mode is now ");
         DEBUG_SERIAL.println(verbose_mode ? "ON" : "OFF");
       }
+      else if (incomingCommand.startsWith("PING")) {
+        // Heartbeat: echo the token back whatever the verbose mode, so the host can time the round trip.
+        DEBUG_SERIAL.print("PONG");
+        DEBUG_SERIAL.println(incomingCommand.substring(4));
+      }
       incomingCommand = "";
     } else {
       incomingCommand += incomingChar;
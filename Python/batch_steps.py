@@ -0,0 +1,211 @@
+"""
+Batch step compiler: MotionController.compute_motor_steps for whole arrays
+of moves at once, for precomputing the workspace (workspace.py) and
+compiling planned trajectories without a get_steps call per joint per move.
+
+Each joint function below follows its q*_pl get_steps operation for
+operation (same float expressions, int() truncation, direction
+compensation), so compiled steps equal what MotionController would send.
+The one exception is the Q3 jaw path lengths, which come from
+kinematics_vec and can differ in the last bit: a move whose path-length
+change lands within rounding error of a whole step may be one step off.
+"""
+import numpy as np
+
+import config
+from config import MotorIndex, STEPS_TO_MM_CAPSTAN, STEPS_TO_MM_LS, STEPS_PER_REV, LEAD_SCREW_PITCH, CAPSTAN_CIRCUMFERENCE
+import experimental_model
+import q1_pl, q2_pl, q3_pl, q4_pl
+from joint_state import JOINT_KEYS
+from kinematics_vec import wrist_path_length
+
+# Radii the get_steps functions use (mm), taken from their modules so the two cannot drift apart
+Q1_COUPLED_Q3_RADIUS = q1_pl.q3_radius
+Q1_COUPLED_JAW_RADIUS = q1_pl.jaw_radius
+Q2_COUPLED_JAW_RADIUS = q2_pl.q4_radius
+WP_RADIUS = q3_pl.WP_EFFECTIVE_RADIUS_MM
+
+MOTORS = len(MotorIndex)
+
+
+def _int(values):
+    """int() of every element: truncation toward zero, without -0.0."""
+    return np.trunc(values).astype(np.int64)
+
+
+def _ls_steps(mm):
+    return _int(mm * STEPS_PER_REV / LEAD_SCREW_PITCH) # config.ls_steps_from_mm
+
+
+def _capstan_steps(mm):
+    return _int(mm * STEPS_PER_REV / CAPSTAN_CIRCUMFERENCE) # config.capstan_steps_from_mm
+
+
+def _direction_compensation(steps, delta, latest_dir, dir_offset):
+    """The q3/q4 direction-change compensation: (steps, latest_dir) after the move."""
+    apply = (latest_dir == 0) | ((latest_dir * delta < 0) & config.DIR_COMP)
+    comp = np.copysign(dir_offset, steps)
+    comp = np.where(latest_dir == 0, comp / 2, comp)
+    return np.where(apply, steps + comp, steps), np.where(apply, delta, latest_dir)
+
+
+def ep_steps(curr, delta, latest_dir):
+    """q1_pl.get_steps over arrays. Returns (steps (n, 8), latest_dir)."""
+    steps = np.zeros(curr.shape + (MOTORS,))
+    steps_q1 = _int(np.radians(delta) * q1_pl.q1_rad * STEPS_TO_MM_CAPSTAN)
+    mm_comp = -experimental_model.get_q3_change_array(np.radians(curr), np.radians(delta)) * Q1_COUPLED_Q3_RADIUS
+    steps_q4 = _int(np.radians(delta) * Q1_COUPLED_JAW_RADIUS * STEPS_TO_MM_LS)
+    steps[:, MotorIndex.EP] = steps_q1
+    steps[:, MotorIndex.LJL] = -steps_q4
+    steps[:, MotorIndex.LJR] = -steps_q4
+    steps[:, MotorIndex.RJL] = steps_q4
+    steps[:, MotorIndex.RJR] = steps_q4
+    steps[:, MotorIndex.WPU] = _ls_steps(mm_comp)
+    steps[:, MotorIndex.WPD] = _ls_steps(-mm_comp)
+    return steps, latest_dir
+
+
+def ey_steps(curr, delta, latest_dir):
+    """q2_pl.get_steps over arrays."""
+    steps = np.zeros(curr.shape + (MOTORS,))
+    mm_comp = -experimental_model.get_q4_change_array(np.radians(curr), np.radians(delta)) * Q2_COUPLED_JAW_RADIUS
+    steps_q4_pos, steps_q4_neg = _ls_steps(mm_comp), _ls_steps(-mm_comp)
+    steps[:, MotorIndex.EY] = _capstan_steps(np.radians(delta) * q2_pl.EY_effective_radius)
+    steps[:, MotorIndex.RJL] = steps_q4_pos
+    steps[:, MotorIndex.LJL] = steps_q4_pos
+    steps[:, MotorIndex.RJR] = steps_q4_neg
+    steps[:, MotorIndex.LJR] = steps_q4_neg
+    return steps, latest_dir
+
+
+def wrist_geometry():
+    """The constants q3_pl is using (fitted values when present)."""
+    return {name: getattr(q3_pl, name) for name in ("L1_c", "L2_c", "r1_c", "c1x_c", "c1y_c", "r2_c")}
+
+
+def wp_steps(curr, delta, latest_dir):
+    """q3_pl.get_steps over arrays."""
+    steps = np.zeros(curr.shape + (MOTORS,))
+    steps_wp = _int(np.radians(delta) * WP_RADIUS * STEPS_TO_MM_LS)
+    steps_wp, latest_dir = _direction_compensation(steps_wp, delta, latest_dir, q3_pl.dir_offset)
+    g = wrist_geometry()
+    target = curr + delta
+    delta_lj = wrist_path_length(target, g) - wrist_path_length(curr, g)
+    delta_rj = wrist_path_length(180.0 - target, g) - wrist_path_length(180.0 - curr, g)
+    steps_lj, steps_rj = -_int(delta_lj * STEPS_TO_MM_LS), -_int(delta_rj * STEPS_TO_MM_LS)
+    steps[:, MotorIndex.WPD] = -steps_wp
+    steps[:, MotorIndex.WPU] = steps_wp
+    steps[:, MotorIndex.RJL] = steps_rj
+    steps[:, MotorIndex.LJR] = steps_lj
+    steps[:, MotorIndex.LJL] = steps_lj
+    steps[:, MotorIndex.RJR] = steps_rj
+    return steps, latest_dir
+
+
+def lj_steps(curr, delta, latest_dir):
+    """q4_pl.get_steps_L over arrays."""
+    steps = np.zeros(curr.shape + (MOTORS,))
+    jaw, latest_dir = _direction_compensation(_int(np.radians(delta) * q4_pl.jaw_radius * STEPS_TO_MM_LS),
+                                              delta, latest_dir, config.Q4_L_DR_COMP)
+    steps[:, MotorIndex.LJL] = -jaw
+    steps[:, MotorIndex.LJR] = jaw
+    return steps, latest_dir
+
+
+def rj_steps(curr, delta, latest_dir):
+    """q4_pl.get_steps_R over arrays."""
+    steps = np.zeros(curr.shape + (MOTORS,))
+    jaw, latest_dir = _direction_compensation(_int(np.radians(delta) * q4_pl.jaw_radius * STEPS_TO_MM_LS),
+                                              delta, latest_dir, config.Q4_R_DR_COMP)
+    steps[:, MotorIndex.RJL] = jaw
+    steps[:, MotorIndex.RJR] = -jaw
+    return steps, latest_dir
+
+
+# Same order as MotionController._processors (JOINT_KEYS)
+JOINT_STEP_FUNCTIONS = (ep_steps, ey_steps, wp_steps, lj_steps, rj_steps)
+
+
+def joint_contributions(joint, curr, delta, latest_dir=None):
+    """
+    One joint's get_steps for n moves: (steps (n, 8) float, latest_dir (n,)).
+    Moves with delta == 0 contribute nothing and keep their direction, as in
+    MotionController.compute_motor_steps.
+    """
+    curr = np.asarray(curr, dtype=float)
+    delta = np.asarray(delta, dtype=float)
+    latest_dir = np.zeros(curr.shape) if latest_dir is None else np.asarray(latest_dir, dtype=float)
+    with np.errstate(all="ignore"):
+        steps, new_dir = JOINT_STEP_FUNCTIONS[joint](curr, delta, latest_dir)
+    moved = delta != 0
+    return np.where(moved[:, None], steps, 0.0), np.where(moved, new_dir, latest_dir)
+
+
+def compile_moves(angles, deltas, directions=None):
+    """
+    compute_motor_steps for n independent moves. angles, deltas and
+    directions are (n, 5) in JOINT_KEYS order (directions default to 0, no
+    previous move). Returns (steps (n, 8) int64 in MotorIndex order,
+    directions after each move (n, 5)).
+    """
+    angles = np.atleast_2d(np.asarray(angles, dtype=float))
+    deltas = np.atleast_2d(np.asarray(deltas, dtype=float))
+    directions = np.zeros(angles.shape) if directions is None else np.atleast_2d(np.asarray(directions, dtype=float))
+    total = np.zeros((len(angles), MOTORS))
+    new_directions = directions.copy()
+    for joint in range(len(JOINT_KEYS)):
+        steps, new_directions[:, joint] = joint_contributions(joint, angles[:, joint], deltas[:, joint], directions[:, joint])
+        total += steps
+    return np.rint(total).astype(np.int64), new_directions
+
+
+def _directions_along(deltas, start_directions):
+    """
+    Direction state before each move of a sequence (m, 5), as the q3/q4
+    get_steps functions thread it: it takes a move's delta whenever that move
+    is compensated (the first move, and with DIR_COMP every reversal).
+    EP and EY keep their start direction.
+    """
+    count = len(deltas)
+    before = np.empty_like(deltas)
+    for joint in range(deltas.shape[1]):
+        start = start_directions[joint]
+        if JOINT_STEP_FUNCTIONS[joint] in (ep_steps, ey_steps):
+            before[:, joint] = start
+            continue
+        delta = deltas[:, joint]
+        moved = np.flatnonzero(delta != 0)
+        # Sign of the previous moved delta (start direction's sign before the first one)
+        previous_sign = np.full(count, np.sign(start))
+        if len(moved):
+            last = np.maximum.accumulate(np.where(delta != 0, np.arange(count), -1))
+            previous_index = np.concatenate(([-1], last[:-1]))
+            has_previous = previous_index >= 0
+            previous_sign[has_previous] = np.sign(delta[previous_index[has_previous]])
+        compensated = (delta != 0) & ((previous_sign == 0) | ((previous_sign * np.sign(delta) < 0) & config.DIR_COMP))
+        # The direction after a compensated move is its delta; forward-fill it
+        source = np.maximum.accumulate(np.where(compensated, np.arange(count), -1))
+        after = np.where(source >= 0, delta[np.maximum(source, 0)], start)
+        before[:, joint] = np.concatenate(([start], after[:-1]))
+    return before
+
+
+def compile_path(waypoints, start_angles=None, start_directions=None):
+    """
+    Compiles a path of absolute joint targets (n, 5), JOINT_KEYS order, into
+    one move per waypoint as MotionController.apply_target_values sends them
+    without the deadband: each delta is the target minus the previous
+    waypoint as JointState keeps it (rounded to 0.01 deg).
+    Returns (steps (n, 8) int64, deltas (n, 5), directions after the last move).
+    """
+    waypoints = np.atleast_2d(np.asarray(waypoints, dtype=float))
+    if start_angles is None:
+        start_angles = np.full(waypoints.shape[1], config.HOME_JOINT_DEGREES)
+    if start_directions is None:
+        start_directions = np.zeros(waypoints.shape[1])
+    start_angles = np.asarray(start_angles, dtype=float)
+    angles = np.vstack([start_angles, np.round(waypoints[:-1], 2)])
+    deltas = waypoints - angles
+    directions = _directions_along(deltas, np.asarray(start_directions, dtype=float))
+    steps, after = compile_moves(angles, deltas, directions)
+    return steps, deltas, after[-1] if len(after) else np.asarray(start_directions, dtype=float)
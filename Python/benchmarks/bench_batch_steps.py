@@ -0,0 +1,131 @@
+"""
+Batch step compiler (batch_steps.py) against the per-move step math, and
+the workspace trajectory check (workspace.py).
+
+    python benchmarks/bench_batch_steps.py [--moves 20000] [--waypoints 5000]
+
+Compiles the same random moves with the scalar get_steps loop
+(MotionController.compute_motor_steps) and with batch_steps.compile_moves,
+and a random walk of waypoints with compile_path against a JointState
+driven move by move (with and without DIR_COMP). Reports both times and
+every mismatching move; exit status 1 if any. Then times
+workspace.validate_trajectory on the waypoints and reports how far its
+table positions are from single moves compiled from home.
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import config
+import batch_steps
+import q1_pl, q2_pl, q3_pl, q4_pl
+from joint_state import JointState
+from workspace import Workspace, joint_ranges
+
+STEP_FUNCTIONS = (q1_pl.get_steps, q2_pl.get_steps, q3_pl.get_steps, q4_pl.get_steps_L, q4_pl.get_steps_R)
+
+
+def scalar_move(angles, deltas, directions):
+    total = [0] * len(config.MotorIndex)
+    directions = list(directions)
+    for joint, function in enumerate(STEP_FUNCTIONS):
+        if deltas[joint] != 0:
+            steps, directions[joint] = function(angles[joint], deltas[joint], directions[joint])
+            for motor in range(len(total)):
+                total[motor] += steps[motor]
+    return [int(round(s)) for s in total], directions
+
+
+def random_moves(rng, count):
+    angles = rng.uniform(0, 180, (count, 5)).round(2)
+    deltas = rng.uniform(-20, 20, (count, 5))
+    for decimals in range(4):
+        rounded = rng.random((count, 5)) < 0.25
+        deltas[rounded] = deltas[rounded].round(decimals)
+    deltas[rng.random((count, 5)) < 0.2] = 0
+    directions = rng.choice([0.0, -3.0, 2.5], (count, 5))
+    return angles, deltas, directions
+
+
+def random_walk(rng, count):
+    low, high = np.array(joint_ranges()).T
+    waypoints = np.cumsum(rng.uniform(-2, 2, (count, 5)), axis=0) + (low + high) / 2
+    held = rng.random((count, 5)) < 0.3
+    for i in range(1, count):
+        waypoints[i][held[i]] = waypoints[i - 1][held[i]]
+    return np.clip(waypoints, low, high)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--moves", type=int, default=20000)
+    parser.add_argument("--waypoints", type=int, default=5000)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args(argv)
+    rng = np.random.default_rng(args.seed)
+    failures = 0
+
+    angles, deltas, directions = random_moves(rng, args.moves)
+    batch_steps.compile_moves(angles[:10], deltas[:10], directions[:10]) # Loads the coupling models
+    started = time.perf_counter()
+    expected = [scalar_move(*move) for move in zip(angles.tolist(), deltas.tolist(), directions.tolist())]
+    scalar_s = time.perf_counter() - started
+    started = time.perf_counter()
+    steps, new_directions = batch_steps.compile_moves(angles, deltas, directions)
+    batch_s = time.perf_counter() - started
+    mismatches = np.flatnonzero(np.any(steps != np.array([e[0] for e in expected]), axis=1) |
+                                np.any(new_directions != np.array([e[1] for e in expected]), axis=1))
+    failures += len(mismatches)
+    print(f"compile_moves: {args.moves} moves, scalar {scalar_s * 1000:.0f} ms, batch {batch_s * 1000:.1f} ms "
+          f"({scalar_s / batch_s:.0f}x), {len(mismatches)} mismatches")
+    for i in mismatches[:5]:
+        print(f"  move {i}: angles {angles[i]} deltas {deltas[i]} -> {expected[i][0]} vs {steps[i].tolist()}")
+
+    waypoints = random_walk(rng, args.waypoints)
+    dir_comp = config.DIR_COMP
+    try:
+        for config.DIR_COMP in (False, True):
+            state = JointState()
+            expected = []
+            for target in waypoints.tolist():
+                current = state.snapshot()
+                move_deltas = [t - a for t, a in zip(target, current.angles)]
+                move_steps, move_directions = scalar_move(current.angles, move_deltas, current.directions)
+                for joint, direction in enumerate(move_directions):
+                    state.set_direction(joint, direction)
+                state.commit_move(move_deltas, move_steps)
+                expected.append(move_steps)
+            started = time.perf_counter()
+            steps, _, _ = batch_steps.compile_path(waypoints)
+            elapsed = time.perf_counter() - started
+            mismatches = int(np.count_nonzero(np.any(steps != np.array(expected), axis=1)))
+            failures += mismatches
+            print(f"compile_path (DIR_COMP={config.DIR_COMP}): {len(waypoints)} waypoints in {elapsed * 1000:.1f} ms, "
+                  f"{mismatches} mismatches")
+    finally:
+        config.DIR_COMP = dir_comp
+
+    workspace = Workspace.load()
+    workspace.validate_trajectory(waypoints)
+    timings = []
+    for _ in range(5):
+        started = time.perf_counter()
+        check = workspace.validate_trajectory(waypoints)
+        timings.append(time.perf_counter() - started)
+    low, high = np.array(joint_ranges()).T
+    poses = rng.uniform(low, high, (args.moves, 5))
+    from_home = poses - config.HOME_JOINT_DEGREES
+    exact, _ = batch_steps.compile_moves(np.full_like(poses, config.HOME_JOINT_DEGREES), from_home, np.sign(from_home))
+    error = np.abs(workspace.motor_positions(poses) - exact).max()
+    print(f"validate_trajectory: {len(waypoints)} waypoints in {min(timings) * 1000:.2f} ms (best of 5), "
+          f"ok={check.ok}; table vs compiled positions within {error:.1f} steps")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,238 @@
+"""
+End-to-end throughput of the host stack against the emulated driver:
+synthetic joint target stream -> TargetMailbox -> TargetStreamer ->
+MotionController (q*_pl) -> SerialHandler -> pty -> FirmwareEmulator,
+with the firmware's real character timing.
+
+    python benchmarks/bench_e2e_throughput.py [--duration 10] [--rate-hz 1000] [--full] [--json out.json]
+
+Each run reports, over --duration seconds:
+  moves/s      moves the emulated firmware executed
+  bytes/s      command bytes it received (moves, heartbeats)
+  ack p50/p99  send -> "[SyncWrite] Success" (verbose firmware only)
+  lag p50/p99  move written -> executed by the firmware
+  err p50/max  commanded pose (the stream at that instant) minus the pose the executed move reached, degrees
+  backlog      moves written but not executed when the run ended
+Executed moves are matched to the writes by their command line (the oldest
+write of the same line), so a move the firmware dropped or a heartbeat in
+between does not shift the pairs after it.
+
+Knobs swept, one at a time from the first value of each (--full: every combination):
+  firmware     verbose / quiet
+  line_ending  SERIAL_LINE_ENDING
+  pacing       TARGET_PACE_TO_LINK (coalesce in the mailbox while the link is busy)
+  reader       SERIAL_READER_MODE
+  period_ms    scheduler period (ROS_UPDATE_FREQ_MS)
+POSIX only (the emulator needs a pty).
+"""
+import argparse
+import itertools
+import json
+import math
+import os
+import sys
+import threading
+import time
+from collections import deque
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import config
+from command_codec import MOVE_ALL_MOTORS_HEADER, encode_update_limits
+from firmware_emulator import FirmwareEmulator
+from log_writer import no_log
+from motion_controller import MotionController
+from serial_handler import SerialHandler
+from target_stream import TargetMailbox, TargetStreamer
+
+
+KNOBS = {
+    "firmware": ["verbose", "quiet"],
+    "line_ending": ["\r\n", "\n"],
+    "pacing": [True, False],
+    "reader": ["blocking", "poll"],
+    "period_ms": [100, 50, 10],
+}
+
+# Synthetic teleop trajectory per target (Q1, Q2, Q3, Q4L, Q4R): amplitude (deg), frequency (Hz), phase (rad)
+TRAJECTORY = ((20.0, 0.25, 0.0), (15.0, 0.2, 1.0), (25.0, 0.3, 2.0), (10.0, 0.5, 0.0), (10.0, 0.5, math.pi))
+
+
+def target_at(t, out):
+    for i, (amplitude, frequency, phase) in enumerate(TRAJECTORY):
+        out[i] = amplitude * math.sin(2 * math.pi * frequency * t + phase)
+    return out
+
+
+def percentile(values, p):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p / 100.0))]
+
+
+def settings_to_run(full):
+    if full:
+        names = list(KNOBS)
+        return [dict(zip(names, combo)) for combo in itertools.product(*KNOBS.values())]
+    base = {name: values[0] for name, values in KNOBS.items()}
+    runs = [base]
+    for name, values in KNOBS.items():
+        runs += [{**base, name: value} for value in values[1:]]
+    return runs
+
+
+def run_once(settings, duration_s, rate_hz):
+    emulator = FirmwareEmulator(verbose=settings["firmware"] == "verbose", record_moves=True)
+    port = emulator.start()
+    serial_handler = SerialHandler(log_callback=no_log)
+    serial_handler.line_ending = settings["line_ending"]
+    serial_handler.reader_mode = settings["reader"]
+    if not serial_handler.connect(port):
+        emulator.stop()
+        raise RuntimeError(f"Could not open {port}")
+    try:
+        # The power-on limits would block Q1/Q2
+        serial_handler.send_command(encode_update_limits(-100000, 100000, -100000, 100000))
+        while emulator.commands_received < 1:
+            time.sleep(0.01)
+
+        motion_controller = MotionController(serial_handler, log_callback=no_log)
+        sends = {} # Move command line -> deque of (perf_counter() after the write, target values), oldest first
+        moves_sent = 0
+        applying = [None] # Target values of the move being sent
+        apply_target_values = motion_controller.apply_target_values
+        send_command = serial_handler.send_command
+
+        def recorded_apply(values):
+            applying[0] = list(values)
+            return apply_target_values(values)
+
+        def recorded_send(command, origin=None):
+            nonlocal moves_sent
+            sent = send_command(command, origin=origin)
+            if sent and command.startswith(MOVE_ALL_MOTORS_HEADER):
+                sends.setdefault(command, deque()).append((time.perf_counter(), applying[0]))
+                moves_sent += 1
+            return sent
+        motion_controller.apply_target_values = recorded_apply
+        serial_handler.send_command = recorded_send
+
+        mailbox = TargetMailbox()
+        streamer = TargetStreamer(mailbox, motion_controller, serial_handler, settings["period_ms"] / 1000.0,
+                                  no_log, pace_to_link=settings["pacing"])
+        stop_event = threading.Event()
+        t0 = time.perf_counter()
+
+        def publish():
+            values = [0.0] * len(TRAJECTORY)
+            period = 1.0 / rate_hz
+            next_send = time.perf_counter()
+            while not stop_event.is_set():
+                mailbox.publish(target_at(time.perf_counter() - t0, values))
+                next_send += period
+                delay = next_send - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+
+        publisher = threading.Thread(target=publish, daemon=True)
+        bytes_at_start = emulator.bytes_received
+        moves_at_start = len(emulator.move_log)
+        publisher.start()
+        streamer.start()
+        time.sleep(duration_s)
+        t_end = time.perf_counter()
+        stop_event.set()
+        streamer.stop()
+        publisher.join()
+        streamer.join()
+        bytes_received = emulator.bytes_received - bytes_at_start
+        move_log = emulator.move_log[moves_at_start:]
+    finally:
+        serial_handler.disconnect()
+        emulator.stop()
+
+    lags = []
+    errors = []
+    commanded = [0.0] * len(TRAJECTORY)
+    executed = 0
+    handled = 0
+    for t_exec, ok, command in move_log:
+        if t_exec > t_end:
+            break
+        handled += 1
+        executed += ok
+        pending = sends.get(command)
+        if not pending:
+            continue # Not one of the streamed moves
+        t_sent, values = pending.popleft()
+        lags.append(t_exec - t_sent)
+        if ok:
+            target_at(t_exec - t0, commanded)
+            errors.append(max(abs(c - v) for c, v in zip(commanded, values)))
+
+    ack = serial_handler.ack_latency
+    return {
+        "settings": settings,
+        "moves_sent": moves_sent,
+        "moves_per_s": executed / duration_s,
+        "bytes_per_s": bytes_received / duration_s,
+        "ack_p50_s": ack.percentile(50) if ack.count else None,
+        "ack_p99_s": ack.percentile(99) if ack.count else None,
+        "lag_p50_s": percentile(lags, 50),
+        "lag_p99_s": percentile(lags, 99),
+        "pose_error_p50_deg": percentile(errors, 50),
+        "pose_error_max_deg": max(errors) if errors else None,
+        "backlog": moves_sent - handled,
+        "streamer": streamer.stats(),
+    }
+
+
+def _ms(value):
+    return f"{value * 1000:7.0f}" if value is not None else f"{'-':>7s}"
+
+
+def _deg(value):
+    return f"{value:6.1f}" if value is not None else f"{'-':>6s}"
+
+
+def print_row(result):
+    s = result["settings"]
+    label = (f"{s['firmware']:7s} {repr(s['line_ending']):6s} {'paced' if s['pacing'] else 'free':5s} "
+             f"{s['reader']:8s} {s['period_ms']:4d}")
+    print(f"{label}  {result['moves_per_s']:6.2f} {result['bytes_per_s']:7.0f} "
+          f"{_ms(result['ack_p50_s'])} {_ms(result['ack_p99_s'])} {_ms(result['lag_p50_s'])} {_ms(result['lag_p99_s'])} "
+          f"{_deg(result['pose_error_p50_deg'])} {_deg(result['pose_error_max_deg'])} {result['backlog']:7d}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds per run")
+    parser.add_argument("--rate-hz", type=float, default=1000.0, help="Target stream rate")
+    parser.add_argument("--full", action="store_true", help="Sweep every combination of knobs")
+    parser.add_argument("--json", help="Write all results to this file")
+    args = parser.parse_args(argv)
+
+    runs = settings_to_run(args.full)
+    print(f"{len(runs)} runs of {args.duration:g} s, targets at {args.rate_hz:g} Hz")
+    print(f"{'firmware eol    pace  reader   per':39s}  {'moves/s':>6s} {'bytes/s':>7s} {'ack p50':>7s} {'ack p99':>7s} "
+          f"{'lag p50':>7s} {'lag p99':>7s} {'err50':>6s} {'errmax':>6s} {'backlog':>7s}")
+    results = []
+    connect_delay = config.SERIAL_CONNECT_DELAY
+    config.SERIAL_CONNECT_DELAY = 0 # A pty does not reset the board
+    try:
+        for settings in runs:
+            result = run_once(settings, args.duration, args.rate_hz)
+            results.append(result)
+            print_row(result)
+    finally:
+        config.SERIAL_CONNECT_DELAY = connect_delay
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"duration_s": args.duration, "rate_hz": args.rate_hz, "results": results}, f, indent=2)
+        print(f"Results written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Segmenting planner (motion_planner.py) against single big moves: how far
+the coupled cables stray from the coupling models while the elbow moves.
+
+    python benchmarks/bench_motion_planner.py [--segment-ms 500] [--jerk-ms 100]
+
+For each large move (from home) the motors run either the one command, or
+the planner's segments compiled through the step math (batch_steps), each
+segment a straight line in motor steps. Along the way the joint angles are
+read off the directly driven joints and every motor is compared with the
+steps the coupling models give for that pose, compiled as one move from
+home. Reports the largest difference per move (steps, any motor), the
+number of segments and the planned duration. Wrist moves stay between
+the wrist model's case switches (Q3 = 83 and 97 deg): the model jumps by
+~1200 steps there, which no segmenting can follow. Every segment truncates
+its steps, so very short segments drift a little.
+"""
+import argparse
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import config
+import batch_steps
+from motion_planner import TrajectoryPlanner, plan_path
+
+HOME = np.full(5, config.HOME_JOINT_DEGREES)
+SUBDIVISIONS = 20 # Points checked inside each straight-line segment
+
+MOVES = {
+    "EP +60": (60, 0, 0, 0, 0),
+    "EY -45": (0, -45, 0, 0, 0),
+    "WP -6": (0, 0, -6, 0, 0),
+    "EP +45 EY +30": (45, 30, 0, 0, 0),
+    "EP -30 WP -6 jaws +15": (-30, 0, -6, 15, 15),
+}
+
+
+def exact_steps(poses):
+    """Motor steps the models give for each pose, as one move from home."""
+    from_home = poses - HOME
+    steps, _ = batch_steps.compile_moves(np.broadcast_to(HOME, poses.shape), from_home, np.sign(from_home))
+    return steps
+
+
+def worst_deviation(waypoints):
+    """Largest motor deviation along straight-line motor moves through the joint waypoints (first = home)."""
+    start_directions = np.sign(waypoints[1] - waypoints[0])
+    steps, _, _ = batch_steps.compile_path(waypoints[1:], waypoints[0], start_directions)
+    positions = np.vstack([np.zeros(steps.shape[1]), np.cumsum(steps, axis=0)])
+    s = np.linspace(0, 1, SUBDIVISIONS + 1)[:, None, None]
+    # Joint poses along each segment and the motor positions the motors pass through there
+    poses = (waypoints[:-1] + s * np.diff(waypoints, axis=0)).reshape(-1, waypoints.shape[1])
+    motors = (positions[:-1] + s * np.diff(positions, axis=0)).reshape(-1, positions.shape[1])
+    return float(np.abs(motors - exact_steps(poses)).max())
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--segment-ms", type=float, default=500.0, help="Segment length (the link's move interval)")
+    parser.add_argument("--jerk-ms", type=float, default=config.PLANNER_JERK_TIME_S * 1000)
+    args = parser.parse_args(argv)
+    planner = TrajectoryPlanner(HOME, jerk_time_s=args.jerk_ms / 1000.0)
+
+    print(f"{'move':<26}{'single cmd':>12}{'planned':>10}{'segments':>10}{'duration s':>12}")
+    for name, deltas in MOVES.items():
+        goal = HOME + deltas
+        single = worst_deviation(np.vstack([HOME, goal]))
+        poses = np.round(plan_path(HOME, [goal], args.segment_ms / 1000.0, planner), 2)
+        planned = worst_deviation(np.vstack([HOME, poses]))
+        print(f"{name:<26}{single:>12.0f}{planned:>10.0f}{len(poses):>10}{planner.time_s:>12.2f}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,88 @@
+"""
+Synchronised motion profiles (motion_profile.py) against the sketch's fixed
+profile velocities, on random joint moves compiled to motor steps.
+
+    python benchmarks/bench_motion_profile.py [--moves 2000] [--max-deg 10]
+
+For each move reports, as percentiles over the moves:
+  duration     time until the last motor arrives, seconds
+  spread       first to last arrival of the moving motors, seconds
+  lag          largest distance of any motor from the straight line in
+               motor space (all motors at the same fraction of their
+               steps) during the move, steps: the cable mistension proxy
+  line         extra characters per command, and the link time they cost
+Exit status 1 if a synchronised profile exceeds a motor limit.
+"""
+import argparse
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import config
+import batch_steps
+from command_codec import encode_move_all, encode_move_profiled
+from motion_profile import default_profile, synchronised_profile, travelled
+
+SAMPLES = 50 # Instants per move for the lag
+
+
+def path_lag(steps, profile):
+    """Largest |travelled - s * steps| over the move, s the progress of the slowest motor."""
+    slowest = int(np.argmax(profile.arrivals_s))
+    worst = 0.0
+    for t in np.linspace(0, profile.duration_s, SAMPLES):
+        s = travelled(steps[slowest], profile.velocities[slowest], profile.accelerations[slowest], t) / steps[slowest]
+        for i, motor_steps in enumerate(steps):
+            if motor_steps:
+                done = travelled(motor_steps, profile.velocities[i], profile.accelerations[i], t)
+                worst = max(worst, abs(done - s * motor_steps))
+    return worst
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--moves", type=int, default=2000)
+    parser.add_argument("--max-deg", type=float, default=10.0, help="Largest joint delta of a move")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args(argv)
+    rng = np.random.default_rng(args.seed)
+
+    angles = rng.uniform(45, 135, (args.moves, 5))
+    deltas = rng.uniform(-args.max_deg, args.max_deg, (args.moves, 5))
+    deltas[rng.random((args.moves, 5)) < 0.4] = 0
+    steps, _ = batch_steps.compile_moves(angles, deltas)
+    moves = [s for s in steps.tolist() if any(s)]
+
+    failures = 0
+    results = {"fixed": [], "synchronised": []}
+    extra_chars = []
+    for motor_steps in moves:
+        synced = synchronised_profile(motor_steps)
+        failures += any(v > m for v, m in zip(synced.velocities, config.MOTOR_MAX_PROFILE_VELOCITY))
+        failures += any(a > m for a, m in zip(synced.accelerations, config.MOTOR_MAX_PROFILE_ACCELERATION))
+        for name, profile in (("fixed", default_profile(motor_steps)), ("synchronised", synced)):
+            moving = [t for t, s in zip(profile.arrivals_s, motor_steps) if s]
+            results[name].append((profile.duration_s, max(moving) - min(moving), path_lag(motor_steps, profile)))
+        extra_chars.append(len(encode_move_profiled(motor_steps, synced.velocities, synced.accelerations))
+                           - len(encode_move_all(motor_steps)))
+
+    print(f"{len(moves)} moves, joint deltas up to {args.max_deg} deg")
+    print(f"{'profile':<14}{'duration p50/p99 s':>20}{'spread p50/p99 s':>20}{'lag p50/max steps':>20}")
+    for name, rows in results.items():
+        duration, spread, lag = np.array(rows).T
+        print(f"{name:<14}{np.median(duration):>10.3f}/{np.percentile(duration, 99):<9.3f}"
+              f"{np.median(spread):>10.3f}/{np.percentile(spread, 99):<9.3f}"
+              f"{np.median(lag):>10.1f}/{lag.max():<9.1f}")
+    chars = np.median(extra_chars)
+    print(f"line: +{chars:.0f} characters per command (median), "
+          f"~{chars * config.FIRMWARE_CHAR_PERIOD_S * 1000:.0f} ms of link time")
+    if failures:
+        print(f"{failures} profiles over a motor limit")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,124 @@
+"""
+Benchmark for the ROS JointState callback. Runs without ROS: messages are a
+plain stand-in with the same name/position fields.
+
+    python benchmarks/bench_ros_callback.py [--messages 200000]
+
+Reports time per message and transient bytes allocated per message for the current
+callback and for the previous dict-based one, for reference.
+"""
+import argparse
+import math
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ros_interface import ROSSubscriberThread
+from target_stream import TargetMailbox
+
+
+class FakeStamp:
+    __slots__ = ("secs", "nsecs")
+
+    def __init__(self, secs, nsecs):
+        self.secs = secs
+        self.nsecs = nsecs
+
+
+class FakeHeader:
+    __slots__ = ("stamp",)
+
+    def __init__(self, stamp):
+        self.stamp = stamp
+
+
+class FakeJointState:
+    """Just the fields the callback reads from sensor_msgs/JointState."""
+    __slots__ = ("header", "name", "position")
+
+    def __init__(self, name, position, stamp):
+        self.header = FakeHeader(stamp)
+        self.name = name
+        self.position = position
+
+
+def make_messages(count):
+    # Like a teleop publisher: same layout every time, fresh lists per message, extra joints included
+    layout = ["shoulder", "elbow_pitch", "elbow_yaw", "wrist_pitch", "jaw_1", "jaw_2"]
+    now = time.time()
+    return [FakeJointState(list(layout), [0.001 * (i % 500)] * len(layout), FakeStamp(int(now), i % 1000000000))
+            for i in range(count)]
+
+
+def legacy_callback(mailbox, msg):
+    """The dict-based callback this module used to have, kept for comparison."""
+    joint_map = dict(zip(msg.name, msg.position))
+    required_joints = ["elbow_pitch", "elbow_yaw", "wrist_pitch", "jaw_1"]
+    if not all(joint in joint_map for joint in required_joints):
+        return
+
+    def convert_rad_to_deg(rad_val):
+        return math.degrees(rad_val) + 90.0
+
+    mailbox.publish([
+        -convert_rad_to_deg(joint_map["elbow_pitch"]),
+        convert_rad_to_deg(joint_map["elbow_yaw"]),
+        convert_rad_to_deg(joint_map["wrist_pitch"]),
+        -convert_rad_to_deg(joint_map["jaw_1"]),
+        math.degrees(joint_map["jaw_1"]) + 90.0
+    ], time.monotonic())
+
+
+def run_case(label, callback, messages):
+    for msg in messages[:1000]: # Warm up caches
+        callback(msg)
+
+    start = time.perf_counter()
+    for msg in messages:
+        callback(msg)
+    elapsed = time.perf_counter() - start
+
+    # Transient allocation: highest traced memory while one callback runs, above what it started with
+    sample = messages[:2000]
+    tracemalloc.start()
+    transient = 0
+    for msg in sample:
+        tracemalloc.reset_peak()
+        before = tracemalloc.get_traced_memory()[0]
+        callback(msg)
+        transient += tracemalloc.get_traced_memory()[1] - before
+    tracemalloc.stop()
+
+    print(f"{label:<10} {elapsed / len(messages) * 1e9:8.0f} ns/msg   "
+          f"{transient / len(sample):6.0f} B transient/msg")
+    return elapsed / len(messages)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=200000)
+    args = parser.parse_args(argv)
+
+    messages = make_messages(args.messages)
+    log = lambda message, level="info", **kwargs: print(f"LOG ({level}): {message}")
+
+    legacy_mailbox = TargetMailbox()
+    legacy = run_case("legacy", lambda msg: legacy_callback(legacy_mailbox, msg), messages)
+
+    current_mailbox = TargetMailbox()
+    thread = ROSSubscriberThread("/bench/joint_states", current_mailbox, log)
+    current = run_case("current", thread._ros_callback, messages)
+
+    values = [0.0] * 5
+    legacy_mailbox.take(values, timeout=0)
+    expected = list(values)
+    current_mailbox.take(values, timeout=0)
+    assert values == expected, f"targets differ: {values} != {expected}"
+    print(f"speedup    {legacy / current:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
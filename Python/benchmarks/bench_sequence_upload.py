@@ -0,0 +1,99 @@
+"""
+Sequence upload (sequence_upload.py) against one MOVE_ALL_MOTORS per
+waypoint, through SerialHandler to the emulated driver with the firmware's
+real character timing.
+
+    python benchmarks/bench_sequence_upload.py [--waypoints 100] [--max-deg 1] [--quiet]
+
+A random joint path (small steps around home) is compiled to motor steps
+once and executed both ways. Reports, per mode:
+  seconds      first byte written -> last waypoint executed by the firmware
+  waypoints/s  executed waypoints per second
+  bytes        command bytes the firmware received
+  final        whether the emulated motors ended on the same positions
+Moves are paced the way the streamer paces them (move_interval_s); the
+sequence runs back to back (period 0). POSIX only (the emulator needs a pty).
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import config
+import batch_steps
+from command_codec import encode_move_all, encode_update_limits
+from firmware_emulator import FirmwareEmulator
+from log_writer import no_log
+from serial_handler import SerialHandler
+
+
+def run_mode(mode, steps, verbose):
+    emulator = FirmwareEmulator(verbose=verbose)
+    port = emulator.start()
+    serial_handler = SerialHandler(log_callback=no_log)
+    serial_handler.heartbeat.mode = "off"
+    if not serial_handler.connect(port):
+        emulator.stop()
+        raise RuntimeError(f"Could not open {port}")
+    try:
+        # The power-on limits would block Q1/Q2
+        serial_handler.send_command(encode_update_limits(-100000, 100000, -100000, 100000))
+        while emulator.commands_received < 1:
+            time.sleep(0.01)
+        bytes_at_start = emulator.bytes_received
+        started = time.perf_counter()
+        if mode == "sequence":
+            serial_handler.sequence.upload(steps)
+            serial_handler.sequence.wait(600)
+            executed = serial_handler.sequence.executed
+        else:
+            for motor_steps in steps:
+                serial_handler.send_command(encode_move_all(motor_steps))
+                time.sleep(serial_handler.move_interval_s())
+            while emulator.moves_executed < len(steps) and time.perf_counter() - started < 600:
+                time.sleep(0.005)
+            executed = emulator.moves_executed
+        elapsed = time.perf_counter() - started
+        return elapsed, executed, emulator.bytes_received - bytes_at_start, list(emulator.positions)
+    finally:
+        serial_handler.disconnect()
+        emulator.stop()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--waypoints", type=int, default=100)
+    parser.add_argument("--max-deg", type=float, default=1.0, help="Largest joint change between waypoints")
+    parser.add_argument("--quiet", action="store_true", help="Quiet firmware (no per-move lines)")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args(argv)
+    rng = np.random.default_rng(args.seed)
+
+    home = np.full(5, config.HOME_JOINT_DEGREES)
+    path = home + np.cumsum(rng.uniform(-args.max_deg, args.max_deg, (args.waypoints, 5)), axis=0)
+    steps, _, _ = batch_steps.compile_path(path, home)
+    steps = [s for s in steps.tolist() if any(s)]
+
+    print(f"{len(steps)} waypoints, joint steps up to {args.max_deg} deg, "
+          f"{'quiet' if args.quiet else 'verbose'} firmware")
+    print(f"{'mode':<10}{'seconds':>10}{'waypoints/s':>13}{'bytes':>9}{'final':>8}")
+    finals = []
+    connect_delay = config.SERIAL_CONNECT_DELAY
+    config.SERIAL_CONNECT_DELAY = 0 # A pty does not reset the board
+    try:
+        for mode in ("moves", "sequence"):
+            elapsed, executed, received, positions = run_mode(mode, steps, not args.quiet)
+            finals.append(positions)
+            print(f"{mode:<10}{elapsed:>10.2f}{executed / elapsed:>13.1f}{received:>9}"
+                  f"{'same' if positions == finals[0] else 'DIFF':>8}")
+    finally:
+        config.SERIAL_CONNECT_DELAY = connect_delay
+    return 0 if finals[0] == finals[1] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,170 @@
+"""
+Compares target input paths on one machine: shared memory, UDP and ROS.
+
+    python benchmarks/bench_target_inputs.py [--packets 3000] [--rate-hz 500] [--shm-period-ms 1]
+
+For each path a sender process publishes targets at a fixed rate and the
+driver side publishes them to a TargetMailbox; a consumer thread takes them
+like the TargetStreamer does and records send -> consumer latency. The send
+time travels inside the target itself. ROS runs only when rospy is installed
+and a master is up. Also reports the raw cost of one seqlock write/read.
+"""
+import argparse
+import math
+import multiprocessing
+import os
+import socket
+import sys
+import threading
+import time
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from joint_state import JointState
+from latency_histogram import LatencyHistogram
+from log_writer import no_log
+from target_stream import TargetMailbox
+from shm_interface import SharedTargetSegment, ShmTargetPoller
+from udp_interface import UDPTargetListener, pack_target, parse_address
+from ros_interface import ROSSubscriberThread, IS_ROS_AVAILABLE, rospy
+
+SHM_NAME = "elbow_driver_bench"
+
+
+def _pace(packets, rate_hz, send):
+    period = 1.0 / rate_hz
+    next_send = time.perf_counter()
+    for seq in range(1, packets + 1):
+        send(seq, time.time())
+        next_send += period
+        delay = next_send - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+
+
+def shm_sender(packets, rate_hz):
+    segment = SharedTargetSegment(SHM_NAME)
+    _pace(packets, rate_hz, lambda seq, now: segment.write_target((now, 90.0, 90.0, 90.0, 90.0), now))
+    segment.close()
+
+
+def udp_sender(address, packets, rate_hz):
+    family, target = parse_address(address)
+    sock = socket.socket(family, socket.SOCK_DGRAM)
+    _pace(packets, rate_hz, lambda seq, now: sock.sendto(pack_target(seq, now, (now, 90.0, 90.0, 90.0, 90.0)), target))
+    sock.close()
+
+
+def ros_sender(topic, packets, rate_hz):
+    from sensor_msgs.msg import JointState as JointStateMsg
+    rospy.init_node("elbow_bench_sender", anonymous=True, disable_signals=True)
+    publisher = rospy.Publisher(topic, JointStateMsg, queue_size=1, tcp_nodelay=True)
+    time.sleep(1.0) # Let the subscriber connect
+    msg = JointStateMsg()
+    msg.name = ["elbow_pitch", "elbow_yaw", "wrist_pitch", "jaw_1"]
+
+    def send(seq, now):
+        # Q1 = -(deg(elbow_pitch) + 90), so carry -(now + 90) degrees in elbow_pitch
+        msg.position = [math.radians(-now - 90.0), 0.0, 0.0, 0.0]
+        publisher.publish(msg)
+    _pace(packets, rate_hz, send)
+
+
+def measure(label, mailbox, sender_process, stop_input):
+    histogram = LatencyHistogram(label)
+    done = threading.Event()
+
+    def consume():
+        values = [0.0] * 5
+        while not done.is_set():
+            if mailbox.take(values, timeout=0.1) is not None:
+                histogram.record(time.time() - values[0])
+
+    consumer = threading.Thread(target=consume, daemon=True)
+    consumer.start()
+    sender_process.start()
+    sender_process.join()
+    time.sleep(0.2)
+    done.set()
+    stop_input()
+    consumer.join()
+    print(f"{histogram.summary()} (merged={mailbox.overwritten})")
+    return histogram
+
+
+def run_shm(args):
+    mailbox = TargetMailbox()
+    segment = SharedTargetSegment(SHM_NAME, create=True)
+    poller = ShmTargetPoller(segment, mailbox, JointState(), no_log, period_s=args.shm_period_ms / 1000.0)
+    poller.start()
+
+    def stop():
+        poller.stop()
+        poller.join()
+        segment.close()
+    measure(f"shm ({args.shm_period_ms:g} ms poll)", mailbox,
+            multiprocessing.Process(target=shm_sender, args=(args.packets, args.rate_hz)), stop)
+
+
+def run_udp(args):
+    mailbox = TargetMailbox()
+    address = f"127.0.0.1:{args.port}"
+    listener = UDPTargetListener(address, mailbox, no_log)
+    listener.open()
+    listener.start()
+
+    def stop():
+        listener.stop()
+        listener.join()
+    measure("udp", mailbox, multiprocessing.Process(target=udp_sender, args=(address, args.packets, args.rate_hz)), stop)
+
+
+def run_ros(args):
+    if not IS_ROS_AVAILABLE:
+        print("ros: skipped (rospy not installed)")
+        return
+    import rosgraph
+    if not rosgraph.is_master_online():
+        print("ros: skipped (no ROS master running)")
+        return
+    topic = "/elbow_bench/joint_states"
+    rospy.init_node("elbow_bench_receiver", anonymous=True, disable_signals=True)
+    mailbox = TargetMailbox()
+    subscriber = ROSSubscriberThread(topic, mailbox, no_log)
+    subscriber.start()
+
+    def stop():
+        subscriber.stop()
+        subscriber.join()
+    measure("ros", mailbox, multiprocessing.Process(target=ros_sender, args=(topic, args.packets, args.rate_hz)), stop)
+
+
+def run_seqlock_cost():
+    segment = SharedTargetSegment(SHM_NAME, create=True)
+    try:
+        values = (90.0, 90.0, 90.0, 90.0, 90.0)
+        number = 100000
+        write = timeit.timeit(lambda: segment.write_target(values, 0.0), number=number) / number
+        read = timeit.timeit(segment.read_target, number=number) / number
+        print(f"seqlock write {write * 1e9:.0f} ns, read {read * 1e9:.0f} ns")
+    finally:
+        segment.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--packets", type=int, default=3000)
+    parser.add_argument("--rate-hz", type=float, default=500.0)
+    parser.add_argument("--shm-period-ms", type=float, default=1.0)
+    parser.add_argument("--port", type=int, default=50056)
+    args = parser.parse_args(argv)
+
+    run_seqlock_cost()
+    run_shm(args)
+    run_udp(args)
+    run_ros(args)
+
+
+if __name__ == "__main__":
+    main()
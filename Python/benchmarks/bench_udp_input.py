@@ -0,0 +1,96 @@
+"""
+End-to-end latency of the datagram target input on localhost, no ROS master.
+
+    python benchmarks/bench_udp_input.py [--packets 5000] [--rate-hz 1000]
+
+A sender process packs targets with udp_interface.pack_target() and the
+listener publishes them to a TargetMailbox; a consumer thread takes them
+like the TargetStreamer does. Latency is send time -> consumer wake-up
+(the send time is also carried in Q1 so the consumer can see it). Runs over
+UDP and, where available, a Unix-domain datagram socket. A short burst of
+reordered and stale datagrams at the end checks the drop counters.
+"""
+import argparse
+import multiprocessing
+import os
+import socket
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from latency_histogram import LatencyHistogram
+from log_writer import no_log
+from target_stream import TargetMailbox
+from udp_interface import UDPTargetListener, pack_target, parse_address
+
+
+def sender(address, packets, rate_hz):
+    family, target = parse_address(address)
+    sock = socket.socket(family, socket.SOCK_DGRAM)
+    period = 1.0 / rate_hz
+    next_send = time.perf_counter()
+    for seq in range(1, packets + 1):
+        now = time.time()
+        sock.sendto(pack_target(seq, now, (now, 90.0, 90.0, 90.0, 90.0)), target)
+        next_send += period
+        delay = next_send - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+    # Out of order (seq going back), then stale (sent "1 s ago"), then one valid packet
+    now = time.time()
+    sock.sendto(pack_target(packets - 10, now, (now, 90.0, 90.0, 90.0, 90.0)), target)
+    sock.sendto(pack_target(packets + 1, now - 1.0, (now, 90.0, 90.0, 90.0, 90.0)), target)
+    sock.sendto(pack_target(packets + 2, now, (now, 90.0, 90.0, 90.0, 90.0)), target)
+    sock.close()
+
+
+def run_case(address, packets, rate_hz):
+    mailbox = TargetMailbox()
+    listener = UDPTargetListener(address, mailbox, no_log, use_send_stamp=True) # Same clock: the stale check applies
+    listener.open()
+    listener.start()
+
+    histogram = LatencyHistogram(address)
+    done = threading.Event()
+
+    def consume():
+        values = [0.0] * 5
+        while not done.is_set():
+            if mailbox.take(values, timeout=0.1) is not None:
+                histogram.record(time.time() - values[0])
+
+    consumer = threading.Thread(target=consume, daemon=True)
+    consumer.start()
+
+    process = multiprocessing.Process(target=sender, args=(address, packets, rate_hz))
+    process.start()
+    process.join()
+    time.sleep(0.2)
+    done.set()
+    listener.stop()
+    listener.join()
+    consumer.join()
+
+    print(f"{histogram.summary()}")
+    print(f"    {listener.summary()}, merged={mailbox.overwritten}")
+    assert listener.dropped_out_of_order == 1 and listener.dropped_stale == 1, listener.stats()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--packets", type=int, default=5000)
+    parser.add_argument("--rate-hz", type=float, default=1000.0)
+    parser.add_argument("--port", type=int, default=50055)
+    args = parser.parse_args(argv)
+
+    run_case(f"127.0.0.1:{args.port}", args.packets, args.rate_hz)
+    if hasattr(socket, "AF_UNIX"):
+        with tempfile.TemporaryDirectory() as tmp:
+            run_case("unix:" + os.path.join(tmp, "elbow_targets.sock"), args.packets, args.rate_hz)
+
+
+if __name__ == "__main__":
+    main()
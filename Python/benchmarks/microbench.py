@@ -0,0 +1,240 @@
+"""
+Microbenchmarks for the per-move math and the wire format: the kinematic
+and experimental coupling models, every q*_pl get_steps, and command
+building / response classification.
+
+    python benchmarks/microbench.py --save             # run, record a local baselines.json
+    python benchmarks/microbench.py                    # run, compare with it
+    python benchmarks/microbench.py -k get_steps       # only cases whose name contains "get_steps"
+
+Each case calls its function over a fixed sweep of inputs; the reported
+time is per call, best (min) and median over --repeats rounds. Every round
+of a case sits between two rounds of a fixed pure-Python reference
+workload, and the case is compared by the median over its rounds of its
+time divided by the faster neighbouring reference round, so a slower or
+busier machine (or a burst of load) moves the reference too. A case is a
+regression when that ratio is more than --threshold above the baseline's;
+the run then exits with status 1. baselines.json is machine-specific and not kept in
+git: record it with --save on the machine you measure on, before the
+change, and compare after it.
+"""
+import argparse
+import contextlib
+import io
+import json
+import math
+import os
+import platform
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import kinematic_model
+import experimental_model
+import q1_pl, q2_pl, q3_pl, q4_pl
+from command_codec import classify_response, encode_move_all, encode_ping, encode_update_limits
+
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines.json")
+DEFAULT_THRESHOLD = 0.25 # Fractional rise of a case's time relative to the reference that counts as a regression
+REFERENCE_CASE = "reference.float_math"
+
+# One verbose move as the firmware prints it (see PROTOCOL.md), plus a heartbeat reply
+VERBOSE_MOVE_LINES = [
+    "=======================================================",
+    "Received Command: MOVE_ALL_MOTORS:120,-35,0,0,14,-14,0,0",
+    "Step 1: Reading current motor positions...",
+    "> Success. All motors responded.",
+    "Step 2: Parsing movement deltas...",
+    "Step 3: Mapping deltas to motors...",
+    "Step 4: Performing pre-move safety check...",
+    "> Success. Path is clear.",
+    "Step 5: Finalizing goal positions...",
+    "Step 6: Executing move with SyncWrite...",
+    "> [SyncWrite] Success. Command sent.",
+    "=======================================================",
+    "PONG 42",
+]
+
+
+def _sweep(low, high, count):
+    return [low + (high - low) * i / (count - 1) for i in range(count)]
+
+
+def _step_inputs():
+    """
+    (curr_theta, delta_theta, latest_dir) over the joint state's range (0..180 around
+    HOME_JOINT_DEGREES, through q3_pl's case switch near 83 and 97 deg), both
+    directions, with direction changes.
+    """
+    inputs = []
+    for i, curr in enumerate(_sweep(0.0, 180.0, 25)):
+        delta = (0.5 + (i % 5)) * (1 if i % 2 else -1)
+        inputs.append((curr, delta, -delta if i % 3 == 0 else delta))
+    return inputs
+
+
+def _reference(x):
+    """Fixed float / math-call mix, about the size of one model evaluation."""
+    total = 0.0
+    for i in range(8):
+        total += math.sqrt(x * x + i) * math.cos(x + i) - math.atan2(x, i + 1.0)
+    return total
+
+
+def build_cases():
+    """Returns [(name, function, list of argument tuples)]."""
+    angles = [(a,) for a in _sweep(-80.0, 80.0, 33)]
+    step_inputs = _step_inputs()
+    rad_moves = [(a * 0.0174533, d * 0.0174533) for a, d, _ in step_inputs]
+    move_steps = [([120 + i, -35, i, -i, 14, -14, 3 * i, -3 * i],) for i in range(16)]
+
+    return [
+        ("kinematic_model.get_q3_pl", kinematic_model.get_q3_pl, angles),
+        ("kinematic_model.get_q4_pl", kinematic_model.get_q4_pl, angles),
+        ("q3_pl._calculate_pl_value", q3_pl._calculate_pl_value, angles),
+        ("experimental_model.get_q3_change", experimental_model.get_q3_change, rad_moves),
+        ("experimental_model.get_q4_change", experimental_model.get_q4_change, rad_moves),
+        ("q1_pl.get_steps", q1_pl.get_steps, step_inputs),
+        ("q2_pl.get_steps", q2_pl.get_steps, step_inputs),
+        ("q3_pl.get_steps", q3_pl.get_steps, step_inputs),
+        ("q4_pl.get_steps_L", q4_pl.get_steps_L, step_inputs),
+        ("q4_pl.get_steps_R", q4_pl.get_steps_R, step_inputs),
+        ("command_codec.encode_move_all", encode_move_all, move_steps),
+        ("command_codec.encode_update_limits", encode_update_limits, [(1000 + i, 3000 - i, 900 + i, 3100 - i) for i in range(16)]),
+        ("command_codec.encode_ping", encode_ping, [(i,) for i in range(16)]),
+        ("command_codec.classify_response", classify_response, [(line,) for line in VERBOSE_MOVE_LINES]),
+    ]
+
+
+def _time_sweep(fn, inputs, loops):
+    started = time.perf_counter_ns()
+    for _ in range(loops):
+        for args in inputs:
+            fn(*args)
+    return (time.perf_counter_ns() - started) / (loops * len(inputs))
+
+
+def _calibrate(fn, inputs, min_round_s):
+    """Loop count for a round of about min_round_s."""
+    loops = 1
+    while True:
+        started = time.perf_counter()
+        _time_sweep(fn, inputs, loops)
+        if time.perf_counter() - started >= min_round_s:
+            return loops
+        loops *= 2
+
+
+def measure(fn, inputs, repeats, min_round_s):
+    """Per-call ns for each of `repeats` rounds; the loop count is calibrated so a round lasts about min_round_s."""
+    loops = _calibrate(fn, inputs, min_round_s)
+    return [_time_sweep(fn, inputs, loops) for _ in range(repeats)]
+
+
+def measure_paired(fn, inputs, reference_inputs, repeats, min_round_s):
+    """(per-call ns per round, case / reference ratio per round), each case round between two reference rounds."""
+    loops = _calibrate(fn, inputs, min_round_s)
+    reference_loops = _calibrate(_reference, reference_inputs, min_round_s)
+    before = _time_sweep(_reference, reference_inputs, reference_loops)
+    rounds, ratios = [], []
+    for _ in range(repeats):
+        ns = _time_sweep(fn, inputs, loops)
+        after = _time_sweep(_reference, reference_inputs, reference_loops)
+        rounds.append(ns)
+        ratios.append(ns / min(before, after))
+        before = after
+    return rounds, ratios
+
+
+def environment():
+    return {"python": platform.python_version(), "machine": platform.machine(), "node": platform.node(),
+            "processor": platform.processor()}
+
+
+def load_baselines(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-k", dest="keyword", default="", help="Only run cases whose name contains this")
+    parser.add_argument("--repeats", type=int, default=7)
+    parser.add_argument("--min-round-ms", type=float, default=50.0, help="Calibrated length of one round")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="Regression threshold as a fraction of the baseline (default 0.25 = 25%% slower)")
+    parser.add_argument("--baseline", default=BASELINE_FILE, help="Baseline JSON file")
+    parser.add_argument("--save", action="store_true", help="Write the results as the new baseline")
+    parser.add_argument("--json", help="Also write this run's results to a JSON file")
+    args = parser.parse_args(argv)
+
+    # The coupling models load and fit their data files on first use and print while doing it
+    with contextlib.redirect_stdout(io.StringIO()):
+        cases = [case for case in build_cases() if args.keyword in case[0]]
+        for _, fn, inputs in cases:
+            fn(*inputs[0])
+    reference_inputs = [(a,) for a in _sweep(-1.5, 1.5, 33)]
+
+    baseline = None if args.save else load_baselines(args.baseline)
+    recorded_on = (baseline or {}).get("environment", {})
+    if baseline and (recorded_on.get("node"), recorded_on.get("python")) != (environment()["node"], environment()["python"]):
+        print(f"Note: {os.path.basename(args.baseline)} was recorded on another machine or Python "
+              f"({baseline['environment'].get('node')}, Python {baseline['environment'].get('python')}); "
+              "ratios carry over only roughly, re-record it with --save.")
+    baseline_cases = (baseline or {}).get("cases", {})
+
+    reference_rounds = measure(_reference, reference_inputs, args.repeats, args.min_round_ms / 1000.0)
+    reference_ns = min(reference_rounds)
+
+    results = {REFERENCE_CASE: {"min_ns": round(reference_ns, 1), "median_ns": round(statistics.median(reference_rounds), 1),
+                                "ratio": 1.0, "inputs": len(reference_inputs)}}
+    regressions = []
+    print(f"{REFERENCE_CASE}: {reference_ns:.0f} ns per call (ratios below are relative to it)")
+    print(f"{'case':40s} {'min':>10s} {'median':>10s} {'ratio':>8s} {'baseline':>8s} {'change':>8s}")
+    for name, fn, inputs in cases:
+        with contextlib.redirect_stdout(io.StringIO()):
+            rounds, ratios = measure_paired(fn, inputs, reference_inputs, args.repeats, args.min_round_ms / 1000.0)
+        best_ns = min(rounds)
+        median_ns = statistics.median(rounds)
+        ratio = statistics.median(ratios)
+        results[name] = {"min_ns": round(best_ns, 1), "median_ns": round(median_ns, 1), "ratio": round(ratio, 4),
+                         "inputs": len(inputs)}
+
+        reference = baseline_cases.get(name, {}).get("ratio")
+        if reference:
+            change = ratio / reference - 1.0
+            flag = " REGRESSION" if change > args.threshold else ""
+            if flag:
+                regressions.append(name)
+            compared = f"{reference:8.3f} {change * 100:+7.1f}%{flag}"
+        else:
+            compared = f"{'-':>8s} {'-':>8s}"
+        print(f"{name:40s} {best_ns:8.0f}ns {median_ns:8.0f}ns {ratio:8.3f} {compared}")
+
+    report = {"environment": environment(), "recorded": time.strftime("%Y-%m-%d %H:%M:%S"),
+              "threshold": args.threshold, "cases": results}
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.save:
+        # Keep baselines of cases that were not run this time (-k)
+        previous = load_baselines(args.baseline) or {}
+        report["cases"] = {**previous.get("cases", {}), **results}
+        with open(args.baseline, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Baseline saved to {args.baseline}")
+        return 0
+
+    if regressions:
+        print(f"{len(regressions)} regression(s) over {args.threshold * 100:.0f}%: {', '.join(regressions)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
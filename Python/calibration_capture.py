@@ -0,0 +1,244 @@
+"""
+Captures coupling calibration data by sweeping one joint through a
+commanded range while a tracker measures the joints.
+
+The swept joint is moved in --step-deg increments from --from to --to and
+back. After each move is acknowledged (or, with quiet firmware, the link
+has had time for it) and --settle-ms has passed, every measurement the
+tracker publishes for --dwell-ms (a JointState topic, or target datagrams
+in the udp_interface format, both in the GUI's target convention) is
+recorded with the commanded angle and the newest present-position
+telemetry frame into an append-only memory-mapped .npy
+(calibration_dataset.py), so a sweep yields thousands of samples in a few
+minutes. Measurements taken while the joint is still moving are dropped:
+the joint state already holds the goal then, and experimental_model fits
+the coupled angle against it. The capture is written
+as <out>.partial and only renamed to <out> once the sweep has finished;
+experimental_model fits from the newest finished capture of each model on
+its next start, if it has enough samples over a wide enough range.
+
+    python calibration_capture.py q1_q3 --port COM8 --udp 127.0.0.1:5006 --from 60 --to 120
+    python calibration_capture.py q2_q4_comp --port COM8 --topic /tracker/joint_states
+
+Models (swept joint -> coupled joint):
+  q1_q3       Q1 -> Q3 without the WPD/WPU compensation (the jaw cables still follow EP)
+  q2_q4       Q2 -> Q4R, only the EY motor moves (no compensation)
+  q2_q4_comp  Q2 -> Q4R with the layer 1 compensation active (residual)
+"""
+import argparse
+import json
+import math
+import os
+import sys
+import threading
+import time
+
+import config
+from config import MotorIndex
+from calibration_dataset import PARTIAL_SUFFIX, CaptureWriter, capture_dir, capture_usable, load_capture
+from command_codec import encode_update_limits
+from motion_controller import MotionController, TARGET_KEYS
+from ros_interface import ROSSubscriberThread, IS_ROS_AVAILABLE, rospy
+from serial_handler import SerialHandler
+from target_stream import TargetMailbox
+from udp_interface import UDPTargetListener
+
+_SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Model name -> (swept target, coupled target, compensation motors the sweep leaves out)
+# Only the compensation being identified is left out; routing terms (q1_pl's jaw cables) stay in
+CALIBRATION_MODELS = {
+    "q1_q3": ("Q1", "Q3", (MotorIndex.WPD, MotorIndex.WPU)),
+    "q2_q4": ("Q2", "Q4R", (MotorIndex.RJL, MotorIndex.RJR, MotorIndex.LJR, MotorIndex.LJL)),
+    "q2_q4_comp": ("Q2", "Q4R", ()),
+}
+
+
+def sweep_plan(current_deg, start_deg, end_deg, step_deg):
+    """Absolute angles for the swept joint: current -> start -> end -> start, step_deg apart."""
+    plan = []
+    position = current_deg
+    for goal in (start_deg, end_deg, start_deg):
+        step = step_deg if goal >= position else -step_deg
+        count = int(abs(goal - position) // step_deg)
+        plan += [position + step * (i + 1) for i in range(count)]
+        if not plan or plan[-1] != goal:
+            plan.append(goal)
+        position = goal
+    return plan
+
+
+class CalibrationCapture(threading.Thread):
+    """Moves the swept joint through its plan and records every measurement until the plan is done."""
+    def __init__(self, model, motion_controller, serial_handler, measurements, writer, plan, log_callback,
+                 settle_s=config.CALIBRATION_SETTLE_S, dwell_s=config.CALIBRATION_DWELL_S):
+        super().__init__(daemon=True)
+        swept, coupled, left_out = CALIBRATION_MODELS[model]
+        self.only_motors = tuple(m for m in MotorIndex if m not in left_out) if left_out else None
+        self.swept_index = TARGET_KEYS.index(swept)
+        self.coupled_index = TARGET_KEYS.index(coupled)
+        self.motion_controller = motion_controller
+        self.serial_handler = serial_handler
+        self.measurements = measurements # TargetMailbox fed by the tracker
+        self.writer = writer
+        self.plan = plan
+        self.log = log_callback
+        self.settle_s = settle_s
+        self.dwell_s = dwell_s
+        self.moves_sent = 0
+        self.completed = False
+        self._stop_event = threading.Event()
+
+    def run(self):
+        values = [0.0] * len(TARGET_KEYS)
+        joint_deltas = [0.0] * len(TARGET_KEYS)
+        state = self.motion_controller.state
+        try:
+            for goal in self.plan:
+                if self._stop_event.is_set():
+                    return
+                joint_deltas[self.swept_index] = goal - state.snapshot().angles[self.swept_index]
+                acks = self.serial_handler.ack_latency.count
+                if not self.motion_controller.execute_joint_deltas(joint_deltas, only_motors=self.only_motors):
+                    self.log(f"Sweep stopped: the move to {goal:.2f} deg was not sent.", level="error")
+                    return
+                self.moves_sent += 1
+                self._wait_for_ack(acks, values)
+                self._take_until(time.monotonic() + self.settle_s, values)
+                self._take_until(time.monotonic() + self.dwell_s, values, goal)
+            self.completed = not self._stop_event.is_set()
+        except Exception as e:
+            self.log(f"Calibration capture failed: {e}", level="error")
+
+    def _wait_for_ack(self, acks, values):
+        """Drops measurements until the move sent after acks acknowledgements is acknowledged."""
+        handler = self.serial_handler
+        # Quiet firmware never acknowledges; it gets the modelled time the link needs for the move
+        wait_s = config.MOVE_ACK_TIMEOUT_S if handler.ack_latency_ewma is not None else handler.move_interval_s()
+        deadline = time.monotonic() + wait_s
+        while handler.ack_latency.count == acks and not self._stop_event.is_set():
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            self.measurements.take(values, timeout=min(remaining, 0.01))
+
+    def _take_until(self, end, values, commanded_deg=None):
+        """Takes measurements until end (monotonic()); records them with commanded_deg unless it is None."""
+        while not self._stop_event.is_set():
+            remaining = end - time.monotonic()
+            if remaining <= 0:
+                return
+            stamp = self.measurements.take(values, timeout=remaining)
+            if stamp is not None and commanded_deg is not None:
+                self._record(stamp, values, commanded_deg)
+
+    def _record(self, stamp, values, commanded_deg):
+        row = self.writer.next_row()
+        row["time"] = stamp
+        row["commanded"] = math.radians(commanded_deg)
+        row["measured"] = math.radians(values[self.swept_index])
+        row["coupled"] = math.radians(values[self.coupled_index])
+        latest = self.serial_handler.telemetry.latest()
+        if latest is not None:
+            frame = latest[1]
+            row["board_ms"] = frame["board_ms"]
+            row["positions"] = frame["positions"]
+        self.writer.commit()
+
+    def stop(self):
+        self._stop_event.set()
+
+
+def log(message, level="info", console=True, **kwargs):
+    if console:
+        print(f"[{level}] {message}")
+
+
+def load_saved_limits(settings_file):
+    """(t1_min, t1_max, t2_min, t2_max) saved by the GUI."""
+    with open(settings_file, "r") as f:
+        settings = json.load(f)
+    return tuple(int(settings[key]) for key in ("theta1_min", "theta1_max", "theta2_min", "theta2_max"))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("model", choices=sorted(CALIBRATION_MODELS))
+    parser.add_argument("--port", default=config.DEFAULT_SERIAL_PORT)
+    parser.add_argument("--udp", help="Tracker measurements as target datagrams on host:port or unix:/path")
+    parser.add_argument("--topic", help="Tracker measurements as a JointState topic (needs ROS)")
+    parser.add_argument("--from", dest="start_deg", type=float, default=config.CALIBRATION_SWEEP_DEG[0])
+    parser.add_argument("--to", dest="end_deg", type=float, default=config.CALIBRATION_SWEEP_DEG[1])
+    parser.add_argument("--step-deg", type=float, default=config.CALIBRATION_STEP_DEG)
+    parser.add_argument("--settle-ms", type=float, default=config.CALIBRATION_SETTLE_S * 1000,
+                        help="Wait after each move is acknowledged before recording")
+    parser.add_argument("--dwell-ms", type=float, default=config.CALIBRATION_DWELL_S * 1000,
+                        help="Recording time at each step")
+    parser.add_argument("--settings-file", default=os.path.join(_SCRIPT_DIR, "gui_settings.json"),
+                        help="gui_settings.json with the theta limits sent before the sweep")
+    parser.add_argument("--out", help="Capture file (default calibration/<model>_<time>.npy)")
+    args = parser.parse_args(argv)
+    if bool(args.udp) == bool(args.topic):
+        parser.error("Give exactly one measurement source: --udp or --topic")
+    if args.topic and not IS_ROS_AVAILABLE:
+        parser.error("--topic needs the 'rospy' library")
+
+    out = args.out or os.path.join(capture_dir(), f"{args.model}_{time.strftime('%Y%m%d_%H%M%S')}.npy")
+    measurements = TargetMailbox()
+    if args.udp:
+        source = UDPTargetListener(args.udp, measurements, log)
+        source.open()
+    else:
+        rospy.init_node("calibration_capture", anonymous=True, disable_signals=True)
+        source = ROSSubscriberThread(args.topic, measurements, log)
+
+    serial_handler = SerialHandler(error_callback=lambda message: log(message, level="error"), log_callback=log)
+    motion_controller = MotionController(serial_handler, log_callback=log)
+    limits = load_saved_limits(args.settings_file)
+    serial_handler.limit_guard.seed(*limits)
+    if not serial_handler.connect(args.port):
+        return 1
+    serial_handler.send_command(encode_update_limits(*limits))
+    source.start()
+
+    swept = CALIBRATION_MODELS[args.model][0]
+    current = motion_controller.state.snapshot().angles[TARGET_KEYS.index(swept)]
+    plan = sweep_plan(current, args.start_deg, args.end_deg, args.step_deg)
+    partial = out + PARTIAL_SUFFIX
+    writer = CaptureWriter(partial)
+    capture = CalibrationCapture(args.model, motion_controller, serial_handler, measurements, writer, plan, log,
+                                 settle_s=args.settle_ms / 1000.0, dwell_s=args.dwell_ms / 1000.0)
+    print(f"Sweeping {swept} {args.start_deg:g} -> {args.end_deg:g} -> {args.start_deg:g} deg "
+          f"({len(plan)} moves) into {out} (Ctrl+C to stop)")
+    started = time.monotonic()
+    capture.start()
+    try:
+        while capture.is_alive():
+            capture.join(timeout=1)
+            print(f"  {capture.moves_sent}/{len(plan)} moves, {writer.count} samples", end="\r")
+    except KeyboardInterrupt:
+        capture.stop()
+        capture.join()
+    finally:
+        elapsed = time.monotonic() - started
+        source.stop()
+        serial_handler.disconnect()
+        writer.close()
+
+    data = load_capture(partial)
+    samples = len(data)
+    print(f"\n{samples} samples in {elapsed:.0f} s ({samples / elapsed if elapsed else 0:.0f}/s)")
+    del data # Release the map before renaming
+    if not capture.completed:
+        print(f"Sweep did not finish; the capture stays in {partial} and experimental_model ignores it.")
+        return 1
+    os.replace(partial, out)
+    print(f"-> {out}")
+    rejected = capture_usable(load_capture(out))
+    if rejected:
+        print(f"experimental_model will not fit from this capture: {rejected}.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,111 @@
+"""
+Append-only, memory-mapped calibration captures.
+
+A capture is a plain .npy file of CAPTURE_DTYPE records, written in place
+through a memory map while the sweep runs and grown in chunks; the header
+always describes the rows allocated so far, so a capture cut short by a
+crash still loads (unwritten rows have time == 0 and are dropped).
+A sweep writes to <capture>.partial and renames it once it has finished,
+so latest_capture() never picks up a sweep that was cut short.
+Readers map the file instead of parsing it:
+
+    data = load_capture("calibration/q1_q3_20250829_141500.npy")
+    data["commanded"], data["coupled"]
+"""
+import glob
+import os
+
+import numpy as np
+
+import config
+
+MOTOR_COUNT = 8
+PARTIAL_SUFFIX = ".partial" # Capture still being written (or abandoned); never matched by latest_capture()
+
+CAPTURE_DTYPE = np.dtype([
+    ("time", "<f8"), # Wall-clock time of the measurement (time.time())
+    ("commanded", "<f8"), # Commanded angle of the swept joint, radians (cumulative joint state)
+    ("measured", "<f8"), # Measured angle of the swept joint, radians
+    ("coupled", "<f8"), # Measured angle of the coupled joint, radians
+    ("board_ms", "<u4"), # Board clock of the telemetry frame below (0 = no telemetry)
+    ("positions", "<i4", (MOTOR_COUNT,)), # Present motor positions, MotorIndex order, ticks
+])
+
+_PREFIX_LEN = 10 # Magic, version 1.0, header length
+
+
+def capture_dir():
+    return os.path.join(os.path.dirname(os.path.abspath(__file__)), config.CALIBRATION_DIR_NAME)
+
+
+def _write_header(f, data_offset, rows):
+    """Rewrites the .npy header in place for a new row count; the data offset never moves."""
+    header = repr({"descr": np.lib.format.dtype_to_descr(CAPTURE_DTYPE), "fortran_order": False, "shape": (rows,)})
+    space = data_offset - _PREFIX_LEN - 1
+    if len(header) > space:
+        raise ValueError(f"No room in the .npy header for {rows} rows")
+    f.seek(_PREFIX_LEN)
+    f.write((header.ljust(space) + "\n").encode("latin1"))
+
+
+class CaptureWriter:
+    """Single-writer, append-only capture file. Rows are written straight into the map."""
+    def __init__(self, filepath, grow_rows=config.CALIBRATION_GROW_ROWS):
+        self.filepath = filepath
+        self.grow_rows = grow_rows
+        self.count = 0
+        os.makedirs(os.path.dirname(os.path.abspath(filepath)), exist_ok=True)
+        self.rows = np.lib.format.open_memmap(filepath, mode="w+", dtype=CAPTURE_DTYPE, shape=(grow_rows,), version=(1, 0))
+        self._data_offset = self.rows.offset
+
+    def next_row(self):
+        """The record to fill for the next sample; it counts once it is filled and commit() is called."""
+        if self.count == len(self.rows):
+            self._grow()
+        return self.rows[self.count]
+
+    def commit(self):
+        self.count += 1
+
+    def _grow(self):
+        rows = len(self.rows) + self.grow_rows
+        self.rows.flush()
+        del self.rows
+        with open(self.filepath, "r+b") as f:
+            _write_header(f, self._data_offset, rows)
+            f.truncate(self._data_offset + rows * CAPTURE_DTYPE.itemsize)
+        self.rows = np.load(self.filepath, mmap_mode="r+")
+
+    def flush(self):
+        self.rows.flush()
+
+    def close(self):
+        """Trims the file to the rows written."""
+        self.rows.flush()
+        del self.rows
+        with open(self.filepath, "r+b") as f:
+            _write_header(f, self._data_offset, self.count)
+            f.truncate(self._data_offset + self.count * CAPTURE_DTYPE.itemsize)
+
+
+def load_capture(filepath):
+    """Memory-mapped records of one capture, without rows a crashed capture never wrote."""
+    rows = np.load(filepath, mmap_mode="r")
+    written = np.flatnonzero(rows["time"])
+    return rows[:written[-1] + 1] if len(written) else rows[:0]
+
+
+def capture_usable(data, min_samples=config.CALIBRATION_MIN_SAMPLES, min_span_deg=config.CALIBRATION_MIN_SPAN_DEG):
+    """None if a capture has enough samples over a wide enough commanded range to fit from, otherwise why not."""
+    if len(data) < min_samples:
+        return f"{len(data)} samples, fewer than {min_samples}"
+    span = float(np.degrees(np.ptp(data["commanded"])))
+    if span < min_span_deg:
+        return f"commanded range spans {span:.1f} deg, less than {min_span_deg:g}"
+    return None
+
+
+def latest_capture(name):
+    """Path of the newest finished capture for a coupling model ("q1_q3", ...), or None."""
+    paths = sorted(glob.glob(os.path.join(capture_dir(), f"{name}_[0-9]*.npy")))
+    return paths[-1] if paths else None
@@ -0,0 +1,257 @@
+# Builders for the line commands understood by the OpenRB150 elbow driver.
+# Every command the host sends goes through here so the wire format lives in one place.
+import base64
+import binascii
+import struct
+
+MOVE_ALL_MOTORS_HEADER = "MOVE_ALL_MOTORS:"
+
+
+def encode_move_all(motor_steps):
+    """MOVE_ALL_MOTORS:<8 relative step counts in MotorIndex order>."""
+    return MOVE_ALL_MOTORS_HEADER + ",".join(map(str, motor_steps))
+
+
+# Profiled moves append per-motor sections to the steps:
+# MOVE_ALL_MOTORS:<8 steps>;<profile velocity per motor>[;<profile acceleration per motor>]
+# An empty field (or a missing trailing one) leaves that motor's register as it is, so
+# stationary motors cost one comma. Firmware without profiles reads the 8 steps and stops.
+PROFILE_SEPARATOR = ";"
+
+
+def _profile_section(values, motor_steps):
+    fields = [str(int(v)) if step else "" for v, step in zip(values, motor_steps)]
+    while fields and not fields[-1]:
+        fields.pop()
+    return ",".join(fields)
+
+
+def encode_move_profiled(motor_steps, velocities, accelerations=None):
+    """MOVE_ALL_MOTORS with Profile Velocity (and Acceleration) for every moving motor."""
+    command = encode_move_all(motor_steps) + PROFILE_SEPARATOR + _profile_section(velocities, motor_steps)
+    if accelerations is not None:
+        command += PROFILE_SEPARATOR + _profile_section(accelerations, motor_steps)
+    return command
+
+
+def decode_move_all(command):
+    """
+    (steps, velocities, accelerations) from a MOVE_ALL_MOTORS line. The
+    profile lists hold None for fields left empty and are None when the
+    section is absent. Raises ValueError on a malformed line.
+    """
+    sections = command[len(MOVE_ALL_MOTORS_HEADER):].split(PROFILE_SEPARATOR)
+    if len(sections) > 3:
+        raise ValueError("too many sections")
+    steps = [int(v) for v in sections[0].split(",")]
+    profiles = []
+    for section in sections[1:]:
+        fields = section.split(",") if section else []
+        if len(fields) > len(steps):
+            raise ValueError("more profile fields than motors")
+        fields += [""] * (len(steps) - len(fields))
+        profiles.append([int(v) if v else None for v in fields])
+    profiles += [None] * (2 - len(profiles))
+    return steps, profiles[0], profiles[1]
+
+
+def encode_update_limits(t1_min, t1_max, t2_min, t2_max):
+    return f"UPDATE_LIMITS [{t1_min},{t1_max},{t2_min},{t2_max}]"
+
+
+TOGGLE_VERBOSE_COMMAND = "TOGGLE_VERBOSE"
+FIND_LIMITS_COMMAND = "FIND_LIMITS" # Interactive: the board then reads single 's' / 'l' characters
+PING_COMMAND = "PING"
+
+
+def encode_ping(token):
+    """PING <token>; the firmware answers PONG <token> whatever the verbose mode."""
+    return f"{PING_COMMAND} {token}"
+
+
+# --- Present-position telemetry ---
+# "TELEMETRY <period ms>" starts a frame every period (0 stops). Each frame is
+# one line: TELEMETRY_PREFIX + base64 of TELEMETRY_FRAME, so it fits the ASCII
+# line protocol and never contains a newline.
+TELEMETRY_COMMAND = "TELEMETRY"
+TELEMETRY_PREFIX = "@T"
+TELEMETRY_FRAME = struct.Struct("<I8i") # Board millis(), present position per motor (MotorIndex order)
+
+
+def encode_telemetry(period_ms):
+    return f"{TELEMETRY_COMMAND} {int(period_ms)}"
+
+
+def encode_telemetry_frame(board_ms, positions):
+    """Firmware side of a frame (used by the emulator)."""
+    packed = TELEMETRY_FRAME.pack(board_ms & 0xFFFFFFFF, *positions)
+    return TELEMETRY_PREFIX + base64.b64encode(packed).decode("ascii")
+
+
+def decode_telemetry_frame(line):
+    """(board_ms, positions) from a frame line (bytes or str, prefix included), or None if it is damaged."""
+    if isinstance(line, str):
+        line = line.encode("ascii", "ignore")
+    try:
+        values = TELEMETRY_FRAME.unpack(base64.b64decode(line.strip()[len(TELEMETRY_PREFIX):], validate=True))
+    except (binascii.Error, struct.error):
+        return None
+    return values[0], values[1:]
+
+
+# --- Firmware responses ---
+# Classes returned by classify_response(). Only verbose firmware prints the
+# per-move lines; quiet firmware only prints failures.
+RESPONSE_OTHER = 0
+RESPONSE_MOVE_RECEIVED = 1 # "Received Command: MOVE_ALL_MOTORS:..."
+RESPONSE_MOVE_DONE = 2 # "> [SyncWrite] Success. Command sent."
+RESPONSE_MOVE_FAILED = 3 # SyncWrite failure, aborted move or parse error
+
+PONG_REPLY = "PONG" # "PONG <token>"
+VERBOSE_REPLY = "Verbose mode is now" # Answer to TOGGLE_VERBOSE: "... ON" / "... OFF"
+
+_MOVE_FAILED_MARKERS = ("[SyncWrite] Fail", "Aborting", "> ERROR")
+
+
+def classify_response(line):
+    """Classifies one firmware output line (already stripped)."""
+    if line.startswith("Received Command:"):
+        return RESPONSE_MOVE_RECEIVED
+    if line.startswith("> [SyncWrite] Success"):
+        return RESPONSE_MOVE_DONE
+    for marker in _MOVE_FAILED_MARKERS:
+        if marker in line:
+            return RESPONSE_MOVE_FAILED
+    return RESPONSE_OTHER
+
+
+# --- Sequence upload ---
+# "SEQUENCE:" + base64 of one block of waypoints (layout in PROTOCOL.md), read by the
+# board in one go instead of a character per loop pass. Steps and profile values are
+# LEB128 varints (steps zigzag-encoded), so a stationary motor costs one byte.
+SEQUENCE_HEADER = "SEQUENCE:"
+SEQUENCE_STOP_COMMAND = "SEQUENCE_STOP"
+SEQUENCE_VERSION = 1
+SEQUENCE_FLAG_PROFILES = 0x01 # Each waypoint carries Profile Velocity and Acceleration for its moving motors
+SEQUENCE_BLOCK_HEAD = struct.Struct("<BBHHB") # version, flags, waypoint count, period ms (0 = back to back), report every
+SEQUENCE_CRC = struct.Struct("<I") # CRC-32 (zlib) of everything before it
+
+# Board replies: "SEQ_START <count>", "SEQ <index>", "SEQ_DONE <count>", "SEQ_ABORT <index> <reason>"
+SEQUENCE_REPLY_PREFIX = "SEQ"
+SEQUENCE_STARTED, SEQUENCE_PROGRESS, SEQUENCE_DONE, SEQUENCE_ABORTED = "SEQ_START", "SEQ", "SEQ_DONE", "SEQ_ABORT"
+
+
+def _put_varint(out, value):
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if value:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return
+
+
+def _get_varint(data, pos):
+    value = shift = 0
+    while True:
+        byte = data[pos] # IndexError on a truncated block
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            return value, pos
+        shift += 7
+        if shift > 35:
+            raise ValueError("varint too long")
+
+
+def encode_sequence_waypoint(motor_steps, velocities=None, accelerations=None):
+    """
+    One waypoint's bytes; the profile only for moving motors. Without
+    accelerations every moving motor gets acceleration 0 (no limit).
+    """
+    out = bytearray()
+    for steps in map(int, motor_steps):
+        _put_varint(out, (steps << 1) ^ (steps >> 63)) # Zigzag: small magnitudes of either sign stay short
+    if velocities is not None:
+        if accelerations is None:
+            accelerations = [0] * len(velocities)
+        for steps, velocity, acceleration in zip(motor_steps, velocities, accelerations):
+            if steps:
+                _put_varint(out, int(velocity))
+                _put_varint(out, int(acceleration))
+    return bytes(out)
+
+
+def encode_sequence_block(waypoints, period_ms=0, report_every=1, profiles=False):
+    """SEQUENCE line from already encoded waypoints (encode_sequence_waypoint)."""
+    head = SEQUENCE_BLOCK_HEAD.pack(SEQUENCE_VERSION, SEQUENCE_FLAG_PROFILES if profiles else 0,
+                                    len(waypoints), int(period_ms), int(report_every))
+    block = head + b"".join(waypoints)
+    block += SEQUENCE_CRC.pack(binascii.crc32(block) & 0xFFFFFFFF)
+    return SEQUENCE_HEADER + base64.b64encode(block).decode("ascii")
+
+
+def encode_sequence(motor_steps_list, period_ms=0, report_every=1, velocities=None, accelerations=None):
+    """SEQUENCE line for a list of 8-motor step lists (and optional per-waypoint profile lists)."""
+    profiles = velocities is not None
+    waypoints = [encode_sequence_waypoint(steps, velocities[i] if profiles else None,
+                                          accelerations[i] if profiles and accelerations is not None else None)
+                 for i, steps in enumerate(motor_steps_list)]
+    return encode_sequence_block(waypoints, period_ms, report_every, profiles)
+
+
+def decode_sequence(command, motor_count=8):
+    """
+    Firmware side (used by the emulator): (period_ms, report_every, steps,
+    velocities, accelerations) with one list per waypoint; the profile lists
+    are None without profiles, and 0 for stationary motors. Raises ValueError
+    on a damaged block.
+    """
+    try:
+        block = base64.b64decode(command[len(SEQUENCE_HEADER):], validate=True)
+    except binascii.Error as e:
+        raise ValueError(f"bad base64: {e}")
+    if len(block) < SEQUENCE_BLOCK_HEAD.size + SEQUENCE_CRC.size:
+        raise ValueError("block too short")
+    (crc,) = SEQUENCE_CRC.unpack_from(block, len(block) - SEQUENCE_CRC.size)
+    if binascii.crc32(block[:-SEQUENCE_CRC.size]) & 0xFFFFFFFF != crc:
+        raise ValueError("crc")
+    version, flags, count, period_ms, report_every = SEQUENCE_BLOCK_HEAD.unpack_from(block)
+    if version != SEQUENCE_VERSION:
+        raise ValueError(f"version {version}")
+    profiles = bool(flags & SEQUENCE_FLAG_PROFILES)
+    data, pos, end = block, SEQUENCE_BLOCK_HEAD.size, len(block) - SEQUENCE_CRC.size
+    steps, velocities, accelerations = [], [] if profiles else None, [] if profiles else None
+    try:
+        for _ in range(count):
+            row = []
+            for _ in range(motor_count):
+                value, pos = _get_varint(data, pos)
+                row.append((value >> 1) ^ -(value & 1))
+            steps.append(row)
+            if profiles:
+                v_row, a_row = [0] * motor_count, [0] * motor_count
+                for motor, motor_steps in enumerate(row):
+                    if motor_steps:
+                        v_row[motor], pos = _get_varint(data, pos)
+                        a_row[motor], pos = _get_varint(data, pos)
+                velocities.append(v_row)
+                accelerations.append(a_row)
+    except IndexError:
+        raise ValueError("truncated block")
+    if pos != end:
+        raise ValueError("trailing bytes")
+    return period_ms, report_every, steps, velocities, accelerations
+
+
+def decode_sequence_reply(line):
+    """(kind, index or count, abort reason or None) from a board reply, or None if it is not one."""
+    parts = line.split()
+    if len(parts) < 2 or parts[0] not in (SEQUENCE_STARTED, SEQUENCE_PROGRESS, SEQUENCE_DONE, SEQUENCE_ABORTED):
+        return None
+    try:
+        value = int(parts[1])
+    except ValueError:
+        return None
+    return parts[0], value, " ".join(parts[2:]) or None
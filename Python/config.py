@@ -67,6 +67,47 @@ MOTOR_TEST_DEFAULT_STEP_COUNT = 50
 MOTOR_TEST_STEP_MIN = -200
 MOTOR_TEST_STEP_MAX = 200
 
+# --- POSITIONAL CONTROL ---
+HOME_JOINT_DEGREES = 90.0 # Reference pose for every joint (cumulative position reset value)
+JOINT_DISPLAY_REFRESH_MS = 100 # How often the CUMULATIVE_POSITION labels mirror the joint state
+
+# --- ROS ---
+DEFAULT_ROS_TOPIC = "/cccleft11/joint_states"
+ROS_UPDATE_FREQ_MS = 100 # Period of the move scheduler clock (a busy link skips ticks)
+# Age targets from JointState header stamps instead of their arrival time. Only with clocks synchronised to well
+# under TARGET_DEADLINE_S (and not under simulated time): an offset clock makes every target stale.
+ROS_USE_HEADER_STAMP = False
+ROS_MIN_DELTA_DEG = 1 # Joint deltas smaller than this are not sent
+
+# --- TARGET SCHEDULING ---
+TARGET_DEADLINE_S = 0.2 # Targets older than this (from their source timestamp) are dropped, not sent
+TARGET_STALE_WARN_COUNT = 20 # Warn when this many targets in a row are dropped as stale (usually an offset clock)
+LIMIT_PREFLIGHT = True # Do not send moves the firmware's Q1/Q2 limit check would certainly reject (limit_guard.py)
+TARGET_PACE_TO_LINK = True # Hold targets in the mailbox (merging them) until the link has finished the last move
+
+# --- MOTION PLANNER ---
+# Jogs and streamed targets as a joint trajectory sent in short segments (motion_planner.py)
+PLANNER_ENABLED = False
+JOINT_MAX_VELOCITY_DEG_S = (10.0, 10.0, 10.0, 12.0, 12.0) # JOINT_KEYS order; about what the motors' profile velocities allow
+JOINT_MAX_ACCELERATION_DEG_S2 = (20.0, 20.0, 20.0, 25.0, 25.0)
+PLANNER_JERK_TIME_S = 0.1 # Moving-average length that turns the trapezoid into an S-curve; 0 = plain trapezoid
+PLANNER_BLEND_DEG = 2.0 # Move on to the next queued goal this close to the current one, without stopping
+PLANNER_TICK_S = 0.005 # Integration step of the trajectory
+PLANNER_MIN_SEGMENT_S = 0.05 # Shortest segment; the link's move interval usually sets it
+
+# --- UDP TARGET INPUT ---
+DEFAULT_UDP_TARGET_ADDRESS = "127.0.0.1:5005" # "host:port", or "unix:/path/to/socket"
+# Age datagrams by their send timestamp instead of their arrival time. Only for senders on this machine or with
+# clocks synchronised to well under UDP_MAX_TARGET_AGE_S: an offset clock makes every datagram stale.
+UDP_USE_SEND_STAMP = False
+UDP_MAX_TARGET_AGE_S = 0.25 # With UDP_USE_SEND_STAMP: datagrams whose send timestamp is older than this are dropped
+UDP_RESYNC_AFTER_S = 1.0 # Accept any sequence number after this long without a valid packet (sender restarted)
+
+# --- SHARED MEMORY TARGET INPUT ---
+SHM_SEGMENT_NAME = "elbow_driver_targets"
+SHM_POLL_PERIOD_S = 0.001 # How often the driver looks for a new target / publishes its joint state
+SHM_MAX_TARGET_AGE_S = 0.25 # Targets written longer ago than this are ignored
+
 # --- SERIAL COMMUNICATION ---
 DEFAULT_SERIAL_PORT = "COM8"
 SERIAL_BAUDRATE = 9600
@@ -75,6 +116,91 @@ SERIAL_PARITY = serial.PARITY_NONE
 SERIAL_STOPBITS = serial.STOPBITS_ONE
 SERIAL_TIMEOUT = 1
 SERIAL_CONNECT_DELAY = 2 # Time to wait for Arduino reset
+SERIAL_LINE_ENDING = "\r\n" # The firmware ends a line at "\n" and trims "\r"; "\n" alone saves one character (~10 ms) per command
+# "blocking": readline() wakes on each line, so acks, pipeline stages and limit feedback are timed to the line;
+# "poll": drain waiting lines every SERIAL_POLL_INTERVAL_S (quantises all of them to the interval)
+SERIAL_READER_MODE = "blocking"
+SERIAL_POLL_INTERVAL_S = 0.01
+
+# --- LINK TIMING ---
+# The firmware reads one character per loop() pass and each pass ends with delay(10)
+FIRMWARE_CHAR_PERIOD_S = 0.010
+FIRMWARE_MOVE_OVERHEAD_S = 0.020 # SyncRead + safety check + SyncWrite once the line is parsed
+FIRMWARE_SYNCWRITE_S = 0.010 # One 8-motor goal SyncWrite on the 57600 baud Dynamixel bus (sequence waypoint rate)
+MOVE_ACK_TIMEOUT_S = 3.0 # A move not acknowledged within this time is assumed unacknowledged (quiet firmware)
+MOVE_ACK_EWMA_ALPHA = 0.2 # Smoothing for the measured move acknowledgement latency
+PIPELINE_TIMING_ENABLED = True # Per-stage move latency histograms (pipeline_timing.py)
+
+# --- MOTION PROFILES ---
+# Synchronised moves (motion_profile.py): every MOVE_ALL_MOTORS carries per-motor Profile Velocity and
+# Profile Acceleration so all motors arrive together. Needs firmware with profiled moves (see PROTOCOL.md);
+# other firmware runs the steps at its fixed profile and ignores the rest of the line (~10 ms per extra character).
+PROFILED_MOVES = False
+PROFILE_VELOCITY_UNIT_RPM = 0.229 # Dynamixel X-series Profile Velocity unit
+PROFILE_ACCELERATION_UNIT_RPM2 = 214.577 # Profile Acceleration unit (rev/min^2)
+# Per motor, MotorIndex order. The velocities are the sketch's SLOW (Q1/Q2) and FAST profile velocities;
+# the sketch leaves Profile Acceleration at 0 (instant velocity changes), these limits are for profiled moves.
+MOTOR_MAX_PROFILE_VELOCITY = (5, 5, 300, 300, 300, 300, 300, 300)
+MOTOR_MAX_PROFILE_ACCELERATION = (2, 2, 100, 100, 100, 100, 100, 100)
+
+# --- SEQUENCE UPLOAD ---
+# Waypoint sequences in one SEQUENCE block (sequence_upload.py). Needs firmware with SEQUENCE (see PROTOCOL.md).
+SEQUENCE_MAX_BYTES = 2048 # Largest block the board buffers (before base64); longer uploads go out as consecutive blocks
+SEQUENCE_REPORT_EVERY = 1 # The board reports progress after every Nth waypoint (and the last)
+
+# --- LINK HEARTBEAT ---
+# "ping" needs firmware with the PING command (the sketch has it); "toggle_verbose" times a TOGGLE_VERBOSE
+# pair (leaves the mode unchanged, but a move read between the two runs quiet and is never acknowledged);
+# "auto" starts with PING and falls back only if HEARTBEAT_FALLBACK_MISSES probes in a row get no PONG.
+HEARTBEAT_MODE = "ping" # "ping", "auto", "toggle_verbose" or "off"
+HEARTBEAT_FALLBACK_MISSES = 5 # "auto" only, and only before the first PONG
+HEARTBEAT_INTERVAL_S = 1.0
+HEARTBEAT_TIMEOUT_S = 2.0 # A probe not answered within this time counts as missed
+HEARTBEAT_WINDOW = 60 # Probes kept for the rolling RTT percentiles
+LINK_DEGRADED_RTT_S = 0.5 # Rolling p90 RTT above this marks the link degraded
+LINK_DEGRADED_MISSES = 2 # Consecutive missed probes that mark the link degraded
+
+# --- PRESENT-POSITION TELEMETRY ---
+# Needs firmware with the TELEMETRY command (see PROTOCOL.md); other firmware ignores the request.
+TELEMETRY_PERIOD_MS = 50 # Frame period requested on connect; 0 leaves telemetry off
+TELEMETRY_RING_SIZE = 4096 # Frames kept for readers (~3.4 min at 50 ms)
+TELEMETRY_LOG_FLUSH_S = 1.0 # How often the telemetry logger appends new frames to its file
+
+# --- CALIBRATION CAPTURE ---
+CALIBRATION_DIR_NAME = "calibration" # Capture .npy files, relative to the Python/ folder
+CALIBRATION_SWEEP_DEG = (60.0, 120.0) # Default commanded range of the swept joint
+CALIBRATION_STEP_DEG = 1.0 # Sweep increment (one move each)
+CALIBRATION_SETTLE_S = 0.1 # Wait after a sweep move is acknowledged before its samples count (the joint is still moving)
+CALIBRATION_DWELL_S = 0.3 # Samples are recorded for this long at each sweep step, once settled
+CALIBRATION_GROW_ROWS = 65536 # Capture files grow by this many rows at a time
+# experimental_model only fits from a capture with at least this many samples spanning this much of the swept joint
+CALIBRATION_MIN_SAMPLES = 200
+CALIBRATION_MIN_SPAN_DEG = 40.0
+
+# --- GEOMETRY FITTING ---
+GEOMETRY_DIR_NAME = "geometry" # Versioned fitted geometry files (geometry_params.py), relative to the Python/ folder
+GEOMETRY_FIT_STARTS = 32 # Multi-start count for fit_geometry.py
+GEOMETRY_FIT_SPREAD = 0.2 # Start points scatter each constant by up to this fraction of its CAD value
+
+# --- TOLERANCE ANALYSIS ---
+TOLERANCE_LENGTH_MM = 0.02 # Default +/- manufacturing tolerance of every length/radius constant (tolerance_analysis.py)
+TOLERANCE_ANGLE_DEG = 0.5 # Default +/- tolerance of the lag/wrap angle constants
+TOLERANCE_SAMPLES = 1000000 # Perturbed geometry sets per run
+TOLERANCE_CHUNK = 4096 # Geometry sets evaluated per vectorised call (bounds worker memory)
+TOLERANCE_GRID_STEP_DEG = 1.0 # Joint angle grid spacing
+
+# --- WORKSPACE ---
+WORKSPACE_DIR_NAME = "workspace" # Cached reachability tables (workspace.py), relative to the Python/ folder
+WORKSPACE_GRID_STEP_DEG = 0.05 # Joint angle spacing of the tables
+# Commandable range of each joint in the target convention apply_target_values receives
+JOINT_RANGE_DEG = {
+    "Q1": (-180.0, 0.0), # Negated by ros_interface.joint_state_to_target: -(pitch + 90)
+    "Q2": (0.0, 180.0),
+    "Q3": (0.0, 180.0),
+    "Q4L": (-180.0, 0.0), # Negated like Q1
+    "Q4R": (0.0, 180.0),
+}
+CABLE_TRAVEL_BUDGET_MM = 6.0 # +/- lead screw carriage travel from the home pose; None skips the check
 
 # --- CONVERSION FACTORS ---
 
@@ -104,6 +230,21 @@ Q3_DR_COMP = 132.3
 Q4_L_DR_COMP = 271
 Q4_R_DR_COMP = 558
 
+# --- DEBUGGING / PROFILING ---
+DEBUG_STEP_PRINTS = False # Print the q*_pl step calculations for every move (slow; hides hot spots when profiling)
+PROFILE_DURATION_S = 10 # Length of an on-demand profile ([PROFILE] button, --profile, SIGUSR1)
+PROFILE_SAMPLE_INTERVAL_S = 0.005 # Stack sampling period for the collapsed-stack output
+
+# --- LOGGING ---
+LOGS_DIR_NAME = "logs" # Relative to the Python/ folder
+LOG_CONSOLE_MAX_LINES = 2000 # Lines kept in the OUTPUT_LOG box
+LOG_CONSOLE_TRIM_SLACK = 200 # Lines allowed over the cap before a bulk trim
+LOG_CONSOLE_FLUSH_MS = 50 # How often queued log records are drawn
+LOG_WRITER_LEVELS = None # e.g. {"sent", "received", "error"}; None writes every level to the session file
+LOG_WRITER_FORMAT = "jsonl" # "jsonl", "binary" or "text" (legacy elbow_ctrl_log layout)
+LOG_ROTATE_BYTES = 8 * 1024 * 1024 # Start a new session file after this many bytes
+LOG_ROTATE_MAX_FILES = None # Oldest session files are deleted past this count; None keeps all
+
 # --- UI ---
 APP_TITLE = "Elbow Control Simulator"
 MAIN_WINDOW_GEOMETRY = "950x950"
@@ -0,0 +1,341 @@
+"""
+elbowd - headless elbow driver.
+
+Runs the same joint processors, SerialHandler and ROS subscriber as the GUI,
+without Tk. The GUI remains available as an optional client for bench work.
+With --udp (datagrams, see udp_interface.py) and/or --shm (a shared-memory
+segment written by a teleop process on the same machine, see
+shm_interface.py), ROS is not needed at all.
+
+Usage:
+    python elbowd.py --port COM8 --topic /cccleft11/joint_states
+    python elbowd.py --port COM8 --udp 127.0.0.1:5005
+    python elbowd.py --port COM8 --shm
+    python elbowd.py --config elbowd.json --stats-interval 5
+    python elbowd.py --port COM8 --udp 127.0.0.1:5005 --telemetry-ms 20
+    python elbowd.py --port COM8 --udp 127.0.0.1:5005 --plan
+
+Options can come from a JSON config file (same names as the long options,
+with dashes replaced by underscores); command line values take precedence.
+"""
+from process_stats import ProcessStats
+PROCESS_STATS = ProcessStats() # Created before the heavy imports so startup time includes them
+
+import argparse
+import json
+import os
+import signal
+import sys
+import threading
+import time
+
+import config
+from serial_handler import SerialHandler
+from motion_controller import MotionController
+from log_writer import StructuredLogWriter, format_timestamp, format_line
+from ros_interface import ROSSubscriberThread, IS_ROS_AVAILABLE, rospy
+from command_codec import encode_update_limits
+from target_stream import TargetMailbox, TargetStreamer
+from motion_planner import SegmentStreamer
+from udp_interface import UDPTargetListener
+from profiler import start_profile, install_signal_handler
+from shm_interface import SharedTargetSegment, ShmTargetPoller
+from latency_histogram import export_histograms
+from telemetry_ring import TelemetryLogger
+
+_SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+DEFAULT_OPTIONS = {
+    "port": config.DEFAULT_SERIAL_PORT,
+    "topic": config.DEFAULT_ROS_TOPIC,
+    "udp": None,
+    "shm": None,
+    "period_ms": config.ROS_UPDATE_FREQ_MS,
+    "deadline_ms": int(config.TARGET_DEADLINE_S * 1000),
+    "settings_file": os.path.join(_SCRIPT_DIR, "gui_settings.json"),
+    "send_limits": False,
+    "stats_interval": 0,
+    "log_format": config.LOG_WRITER_FORMAT,
+    "quiet": False,
+    "profile": 0,
+    "telemetry_ms": config.TELEMETRY_PERIOD_MS,
+    "plan": config.PLANNER_ENABLED,
+}
+
+
+class ElbowDaemon:
+    """Connects to the driver, subscribes to ROS and turns joint targets into moves."""
+    def __init__(self, options):
+        self.options = options
+        self.log_writer = StructuredLogWriter(
+            os.path.join(_SCRIPT_DIR, config.LOGS_DIR_NAME),
+            fmt=options["log_format"],
+            levels=config.LOG_WRITER_LEVELS,
+            rotate_bytes=config.LOG_ROTATE_BYTES,
+            max_files=config.LOG_ROTATE_MAX_FILES,
+            prefix="elbowd_session",
+        )
+        self.serial_handler = SerialHandler(
+            data_callback=self._handle_serial_data,
+            status_callback=self._handle_status,
+            error_callback=self._handle_serial_error,
+            link_callback=self._handle_link_state,
+            log_callback=self.log_message,
+        )
+        self.serial_handler.telemetry_period_ms = options["telemetry_ms"]
+        self.motion_controller = MotionController(self.serial_handler, log_callback=self.log_message)
+        self.target_mailbox = TargetMailbox()
+        self.segment_streamer = (SegmentStreamer(self.motion_controller, self.serial_handler, self.log_message)
+                                 if options["plan"] else None)
+        self.target_streamer = TargetStreamer(
+            self.target_mailbox, self.motion_controller, self.serial_handler,
+            options["period_ms"] / 1000.0, self.log_message, deadline_s=options["deadline_ms"] / 1000.0,
+            planner=self.segment_streamer)
+        self.ros_thread = None
+        self.udp_thread = None
+        self.shm_segment = None
+        self.shm_thread = None
+        self.telemetry_logger = None
+        self.ros_node_initialized = False
+        self.exit_code = 0
+        self._stop_event = threading.Event()
+
+    # --- Logging and serial callbacks ---
+    def log_message(self, message, level="info", source="elbowd", cmd_id=None, console=True):
+        now = time.time()
+        self.log_writer.submit(level, message, source=source, cmd_id=cmd_id, ts=now)
+        if console and not self.options["quiet"]:
+            sys.stdout.write(format_line(format_timestamp(now), level, message))
+
+    def _handle_serial_data(self, response_data, data_type="received"):
+        self.log_message(f"Arduino: {response_data}", level="received", source="serial",
+                         cmd_id=self.serial_handler.command_count)
+
+    def _handle_status(self, message, color, connected):
+        self.log_message(message)
+
+    def _handle_serial_error(self, error_message):
+        is_disconnection_error = "Lost connection" in error_message or "sending" in error_message
+        if is_disconnection_error and self.serial_handler.is_connected:
+            self.log_message("! E-STOP DETECTED: Serial connection lost.", level="error")
+            self.log_message(f"Session log: {self.log_writer.flush()}")
+            self.exit_code = 2
+            self.stop()
+        elif "Not connected" not in error_message:
+            self.log_message(f"ERROR: {error_message}", level="error")
+
+    def _handle_link_state(self, degraded, reason):
+        if degraded:
+            self.log_message(f"! LINK DEGRADED: {reason}", level="warning")
+        else:
+            self.log_message(f"Link healthy again: {reason}")
+
+    # --- Lifecycle ---
+    def start(self):
+        self.log_writer.start()
+        self.log_message(f"// elbowd starting on {self.options['port']} //")
+        if self.options["udp"]:
+            self.udp_thread = UDPTargetListener(self.options["udp"], self.target_mailbox, self.log_message)
+            try:
+                self.udp_thread.open()
+            except Exception as e:
+                self.log_message(f"Could not listen on {self.options['udp']}: {e}", level="error")
+                return False
+        if self.options["shm"]:
+            try:
+                self.shm_segment = SharedTargetSegment(self.options["shm"], create=True)
+            except Exception as e:
+                self.log_message(f"Could not create shared memory '{self.options['shm']}': {e}", level="error")
+                return False
+            self.shm_thread = ShmTargetPoller(self.shm_segment, self.target_mailbox,
+                                              self.motion_controller.state, self.log_message)
+        use_ros = not (self.udp_thread or self.shm_thread)
+        if use_ros and not IS_ROS_AVAILABLE:
+            self.log_message("The 'rospy' library is not installed. Use --udp/--shm or install ROS for joint targets.", level="error")
+            return False
+        saved_limits = self._load_saved_limits()
+        if saved_limits:
+            self.serial_handler.limit_guard.seed(*saved_limits)
+        if not self.serial_handler.connect(self.options["port"]):
+            return False
+        if self.options["telemetry_ms"]:
+            filepath = os.path.join(self.log_writer.logs_dir, f"elbowd_telemetry_{time.strftime('%Y%m%d_%H%M%S')}.bin")
+            self.telemetry_logger = TelemetryLogger(self.serial_handler.telemetry, filepath, self.log_message)
+            self.telemetry_logger.start()
+            self.log_message(f"Present positions every {self.options['telemetry_ms']} ms logged to {filepath}")
+        if self.options["send_limits"] and saved_limits:
+            cmd = encode_update_limits(*saved_limits)
+            if self.serial_handler.send_command(cmd):
+                self.log_message(f"Command: {cmd}", level="sent")
+
+        if self.segment_streamer:
+            self.segment_streamer.start()
+        self.target_streamer.start()
+        for thread in self._input_threads():
+            thread.start()
+        if use_ros:
+            try:
+                rospy.init_node("elbowd", anonymous=True, disable_signals=True)
+                self.ros_node_initialized = True
+            except Exception as e:
+                self.log_message(f"Failed to initialize ROS node: {e}", level="error")
+                return False
+            self.ros_thread = ROSSubscriberThread(self.options["topic"], self.target_mailbox, self.log_message)
+            self.ros_thread.start()
+
+        self.log_message(f"Ready in {PROCESS_STATS.mark_ready() * 1000:.0f} ms.")
+        if self.options["profile"]:
+            start_profile(self.log_writer.logs_dir, self.options["profile"], self.log_message)
+        return True
+
+    def _load_saved_limits(self):
+        """(t1_min, t1_max, t2_min, t2_max) saved by the GUI, or None."""
+        try:
+            with open(self.options["settings_file"], "r") as f:
+                settings = json.load(f)
+            return tuple(int(settings[key]) for key in ("theta1_min", "theta1_max", "theta2_min", "theta2_max"))
+        except Exception as e:
+            self.log_message(f"Could not load limits from {self.options['settings_file']}: {e}",
+                             level="error" if self.options["send_limits"] else "warning")
+            return None
+
+    def run(self):
+        """Moves are sent by the TargetStreamer; this just waits and reports stats."""
+        stats_interval = self.options["stats_interval"]
+        while not self._stop_event.wait(stats_interval or None):
+            self.log_message(f"Stats: {PROCESS_STATS.summary()}")
+            self.log_message(f"Targets: {self.target_streamer.summary()}")
+            if self.segment_streamer:
+                self.log_message(f"Planner: {self.segment_streamer.summary()}")
+            self.log_message(f"Link: {self.serial_handler.ack_latency.summary()}")
+            self.log_message(f"Heartbeat: {self.serial_handler.heartbeat.summary()}")
+            self.log_message(f"Limits: {self.serial_handler.limit_guard.summary()}")
+            if self.telemetry_logger:
+                self.log_message(f"Telemetry: {self.serial_handler.telemetry.summary()}")
+            for line in self.serial_handler.pipeline_timing.summary_lines():
+                self.log_message(f"Timing: {line}")
+            for thread in self._input_threads():
+                self.log_message(f"Input: {thread.summary()}")
+        return self.exit_code
+
+    def stop(self):
+        self._stop_event.set()
+
+    def cleanup(self):
+        self.log_message("elbowd exiting. Cleaning up...")
+        if self.ros_thread and self.ros_thread.is_alive():
+            self.ros_thread.stop()
+            self.ros_thread.join(timeout=2)
+        for thread in self._input_threads():
+            thread.stop()
+            if thread.is_alive():
+                thread.join(timeout=2)
+        if self.udp_thread:
+            self.udp_thread.close()
+        if self.shm_segment:
+            self.shm_segment.close()
+        if self.target_streamer.is_alive():
+            self.target_streamer.stop()
+            self.target_streamer.join(timeout=2)
+            self._export_target_stats()
+        if self.segment_streamer and self.segment_streamer.is_alive():
+            self.segment_streamer.stop()
+            self.segment_streamer.join(timeout=2)
+            self.log_message(f"Planner: {self.segment_streamer.summary()}")
+        if self.ros_node_initialized and not rospy.is_shutdown():
+            rospy.signal_shutdown("elbowd is closing")
+        self.serial_handler.cleanup()
+        if self.telemetry_logger:
+            self.telemetry_logger.stop()
+            self.telemetry_logger.join(timeout=2)
+            self.log_message(f"Telemetry: {self.telemetry_logger.summary()}")
+        self.log_message("Cleanup complete. Goodbye.")
+        self.log_writer.stop()
+
+    def _input_threads(self):
+        """Non-ROS target inputs that are configured."""
+        return [t for t in (self.udp_thread, self.shm_thread) if t]
+
+    def _export_target_stats(self):
+        self.log_message(f"Targets: {self.target_streamer.summary()}")
+        filepath = os.path.join(self.log_writer.logs_dir, f"elbowd_target_stats_{time.strftime('%Y%m%d_%H%M%S')}.json")
+        try:
+            extra = self.target_streamer.stats()
+            if self.segment_streamer:
+                extra.update(self.segment_streamer.stats())
+            extra.update(self.serial_handler.limit_guard.stats())
+            for thread in self._input_threads():
+                extra.update(thread.stats())
+            export_histograms([self.target_streamer.age_histogram, self.serial_handler.ack_latency,
+                               self.serial_handler.heartbeat.rtt_histogram],
+                              filepath, extra=extra)
+            self.log_message(f"Target stats saved to {filepath}")
+            for line in self.serial_handler.pipeline_timing.summary_lines():
+                self.log_message(f"Timing: {line}")
+            timing_path = filepath.replace("elbowd_target_stats_", "elbowd_pipeline_timing_")
+            self.serial_handler.pipeline_timing.export(timing_path)
+            self.log_message(f"Pipeline timing saved to {timing_path}")
+        except Exception as e:
+            self.log_message(f"Could not save target stats: {e}", level="error")
+
+
+def load_options(argv=None):
+    """Merges defaults, the optional JSON config file and command line options."""
+    parser = argparse.ArgumentParser(description="Headless elbow driver (no Tk).")
+    parser.add_argument("--config", help="JSON file with any of the options below")
+    parser.add_argument("--port", help=f"Serial port (default {DEFAULT_OPTIONS['port']})")
+    parser.add_argument("--topic", help=f"JointState topic (default {DEFAULT_OPTIONS['topic']})")
+    parser.add_argument("--udp", help=f"Take targets from datagrams on host:port or unix:/path instead of ROS "
+                                      f"(e.g. {config.DEFAULT_UDP_TARGET_ADDRESS})")
+    parser.add_argument("--shm", nargs="?", const=config.SHM_SEGMENT_NAME,
+                        help=f"Take targets from a shared-memory segment created by elbowd (default name {config.SHM_SEGMENT_NAME})")
+    parser.add_argument("--period-ms", type=int, help=f"Move scheduler period in ms (default {DEFAULT_OPTIONS['period_ms']})")
+    parser.add_argument("--deadline-ms", type=int, help=f"Drop targets older than this (default {DEFAULT_OPTIONS['deadline_ms']})")
+    parser.add_argument("--settings-file", help="gui_settings.json with theta limits")
+    parser.add_argument("--send-limits", action="store_true", default=None, help="Send UPDATE_LIMITS from the settings file on connect")
+    parser.add_argument("--stats-interval", type=float, help="Print startup/CPU stats every N seconds (0 = off)")
+    parser.add_argument("--log-format", choices=["jsonl", "binary", "text"], help="Session log format")
+    parser.add_argument("--quiet", action="store_true", default=None, help="Only write logs to file")
+    parser.add_argument("--telemetry-ms", type=int, help=f"Present-position frame period requested from the firmware, 0 = off "
+                                                         f"(default {DEFAULT_OPTIONS['telemetry_ms']})")
+    parser.add_argument("--plan", action="store_true", default=None,
+                        help="Send targets through the segmenting planner (motion_planner.py)")
+    parser.add_argument("--profile", type=float, metavar="N", help="Profile the first N seconds after startup into logs/ (SIGUSR1 also starts a profile)")
+    args = parser.parse_args(argv)
+
+    options = dict(DEFAULT_OPTIONS)
+    if args.config:
+        with open(args.config, "r") as f:
+            file_options = json.load(f)
+        unknown = set(file_options) - set(DEFAULT_OPTIONS)
+        if unknown:
+            parser.error(f"Unknown option(s) in {args.config}: {', '.join(sorted(unknown))}")
+        options.update(file_options)
+    for key, value in vars(args).items():
+        if key != "config" and value is not None:
+            options[key] = value
+    return options
+
+
+def main(argv=None):
+    daemon = ElbowDaemon(load_options(argv))
+
+    def on_signal(signum, frame):
+        daemon.log_message(f"Signal {signum} received. Stopping.")
+        daemon.stop()
+    signal.signal(signal.SIGINT, on_signal)
+    signal.signal(signal.SIGTERM, on_signal)
+    install_signal_handler(daemon.log_writer.logs_dir, daemon.log_message)
+
+    try:
+        if not daemon.start():
+            daemon.exit_code = 1
+        else:
+            daemon.run()
+    finally:
+        daemon.cleanup()
+    return daemon.exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,6 +1,8 @@
 import numpy as np
 import os
 
+from calibration_dataset import capture_usable, latest_capture, load_capture
+
 # --- Configuration ---
 POLYNOMIAL_DEGREE = 4
 # Get the absolute path of the directory containing this script.
@@ -20,6 +22,23 @@ _model_q2_q4 = None
 _model_q2_q4_comp = None
 
 
+def _load_model_data(name, txt_filepath):
+    """
+    (x, y) for a coupling model: the newest finished calibration capture for
+    it (calibration_capture.py, commanded vs. coupled angle) if it has enough
+    samples over a wide enough range, otherwise the hand-collected text file.
+    """
+    capture_path = latest_capture(name)
+    if capture_path:
+        data = load_capture(capture_path)
+        rejected = capture_usable(data)
+        if rejected is None:
+            print(f"Fitting the {name} model from {len(data)} captured samples in '{capture_path}'.")
+            return data["commanded"], data["coupled"]
+        print(f"Not fitting the {name} model from '{capture_path}' ({rejected}); using '{txt_filepath}'.")
+    data = np.loadtxt(txt_filepath, delimiter=',')
+    return data[:, 0], data[:, 1]
+
 def _remove_outliers_iqr(x_data, y_data):
     """
     Removes statistical outliers from a dataset based on the IQR of the x-data.
@@ -77,8 +96,7 @@ def _initialize_q1_q3_model():
     """
     global _model_q1_q3
     try:
-        data = np.loadtxt(DATA_FILEPATH_Q1_Q3, delimiter=',')
-        q1_data, q3_data = data[:, 0], data[:, 1]
+        q1_data, q3_data = _load_model_data('q1_q3', DATA_FILEPATH_Q1_Q3)
         q1_clean, q3_clean = _clean_data(q1_data, q3_data, x_valid_range=(0, 3))
         coeffs = np.polyfit(q1_clean, q3_clean, POLYNOMIAL_DEGREE)
         _model_q1_q3 = np.poly1d(coeffs)
@@ -93,8 +111,7 @@ def _initialize_q2_q4_model():
     """
     global _model_q2_q4
     try:
-        data = np.loadtxt(DATA_FILEPATH_Q2_Q4, delimiter=',')
-        q2_data, q4_data = data[:, 0], data[:, 1]
+        q2_data, q4_data = _load_model_data('q2_q4', DATA_FILEPATH_Q2_Q4)
         q2_clean, q4_clean = _clean_data(q2_data, q4_data, x_valid_range=(0, 3), y_valid_range=(0, 4))
         coeffs = np.polyfit(q2_clean, q4_clean, POLYNOMIAL_DEGREE)
         _model_q2_q4 = np.poly1d(coeffs)
@@ -112,8 +129,7 @@ def _initialize_q2_q4_comp_model():
     """
     global _model_q2_q4_comp
     try:
-        data = np.loadtxt(DATA_FILEPATH_Q2_Q4_COMP, delimiter=',')
-        q2_data, q4_residual_data = data[:, 0], data[:, 1]
+        q2_data, q4_residual_data = _load_model_data('q2_q4_comp', DATA_FILEPATH_Q2_Q4_COMP)
         
         # Clean the compensation data. Based on the provided file, the valid ranges are different.
         q2_clean, q4_clean = _clean_data(q2_data, q4_residual_data, x_valid_range=(0, 3), y_valid_range=(0, 3.0))
@@ -186,6 +202,41 @@ def get_q4_change(current_q2: float, delta_q2: float) -> float:
     
     return total_delta_q4
 
+def model_coefficients():
+    """Polynomial coefficients of every coupling model ([] for one that failed to load), initializing them."""
+    get_q3_change_array(0.0, 0.0)
+    get_q4_change_array(0.0, 0.0)
+    return {name: ([] if model is None else [float(c) for c in model.coeffs])
+            for name, model in (("q1_q3", _model_q1_q3), ("q2_q4", _model_q2_q4), ("q2_q4_comp", _model_q2_q4_comp))}
+
+def get_q3_change_array(current_q1, delta_q1):
+    """
+    get_q3_change over NumPy arrays of positions and movements (radians), for
+    the batch step compiler. Same polynomial evaluation, element by element.
+    """
+    if _model_q1_q3 is None:
+        _initialize_q1_q3_model()
+    current_q1, delta_q1 = np.broadcast_arrays(np.asarray(current_q1, dtype=float), np.asarray(delta_q1, dtype=float))
+    if _model_q1_q3 is None:
+        return np.zeros(current_q1.shape)
+    change = _model_q1_q3(current_q1 + delta_q1) - _model_q1_q3(current_q1)
+    return np.where(delta_q1 == 0, 0.0, change)
+
+def get_q4_change_array(current_q2, delta_q2):
+    """get_q4_change (both layers) over NumPy arrays of positions and movements (radians)."""
+    if _model_q2_q4 is None:
+        _initialize_q2_q4_model()
+    if _model_q2_q4_comp is None:
+        _initialize_q2_q4_comp_model()
+    current_q2, delta_q2 = np.broadcast_arrays(np.asarray(current_q2, dtype=float), np.asarray(delta_q2, dtype=float))
+    if _model_q2_q4 is None:
+        return np.zeros(current_q2.shape)
+    q2_final = current_q2 + delta_q2
+    total_delta_q4 = _model_q2_q4(q2_final) - _model_q2_q4(current_q2)
+    if _model_q2_q4_comp is not None:
+        total_delta_q4 = total_delta_q4 + (_model_q2_q4_comp(q2_final) - _model_q2_q4_comp(current_q2))
+    return np.where(delta_q2 == 0, 0.0, total_delta_q4)
+
 # --- Optional: For testing and visualization ---
 def visualize_fit(model_choice='q1_q3'):
     """
@@ -223,8 +274,7 @@ def visualize_fit(model_choice='q1_q3'):
         return
 
     # Load the ORIGINAL raw data to show all points
-    data = np.loadtxt(filepath, delimiter=',')
-    x_data, y_data = data[:, 0], data[:, 1]
+    x_data, y_data = _load_model_data(model_choice, filepath)
 
     plt.figure(figsize=(10, 8))
     plt.scatter(x_data, y_data, label='Experimental Data (All Points)', color='black', s=15, alpha=0.5)
@@ -0,0 +1,422 @@
+"""
+Software stand-in for the OpenRB-150 elbow driver sketch, on a pseudo-terminal.
+
+The host code connects to emulator.port exactly as it would to the board
+(pyserial opens the pty path), so the GUI, elbowd and the benchmarks can run
+without hardware. The emulator follows the line protocol in
+"OpenRB150 firmware/PROTOCOL.md" and the sketch's timing: one character is
+consumed per loop pass of char_period_s, and a move takes move_overhead_s
+once its line is complete. With model_motion the motors then travel along
+their Dynamixel profiles (motion_profile.py) instead of jumping to the goal,
+and a move that arrives before they get there starts from where they are,
+like the sketch's present position + delta. A SEQUENCE line is read in
+one go once its header has been parsed, and its waypoints run from the
+loop, one SyncWrite (syncwrite_s) each or every period of the block.
+
+    python firmware_emulator.py [--quiet] [--no-ping] [--no-telemetry] [--no-profiles] [--no-sequences] [--model-motion] [--char-period-ms 10]
+
+prints the port to connect to and runs until Ctrl+C. POSIX only (needs pty).
+"""
+import argparse
+import os
+import select
+import threading
+import time
+import tty
+
+import config
+from command_codec import (MOVE_ALL_MOTORS_HEADER, PING_COMMAND, PONG_REPLY, TELEMETRY_COMMAND, TOGGLE_VERBOSE_COMMAND,
+                           PROFILE_SEPARATOR, SEQUENCE_HEADER, SEQUENCE_STOP_COMMAND, SEQUENCE_STARTED, SEQUENCE_PROGRESS,
+                           SEQUENCE_DONE, SEQUENCE_ABORTED, decode_move_all, decode_sequence, encode_telemetry_frame)
+from motion_profile import move_time_s, travelled
+
+SEPARATOR = "======================================================="
+MOTOR_COUNT = 8
+LIMITED_MOTORS = {0: ("Q1", "theta1"), 1: ("Q2", "theta2")} # Command index -> (name, limit pair)
+_SEQUENCE_HEADER = SEQUENCE_HEADER.encode("ascii")
+
+
+class FirmwareEmulator:
+    """
+    Emulated driver board. Present positions are kept per command index
+    (MotorIndex order) and every accepted move reaches its goal.
+    ping_supported=False behaves like firmware built before the PING command,
+    telemetry_supported=False like firmware without TELEMETRY and
+    profiles_supported=False like firmware without profiled moves and
+    sequences_supported=False like firmware without SEQUENCE (all the sketch
+    today). With record_moves, every MOVE_ALL_MOTORS handled is appended to
+    move_log as (perf_counter() time, executed, command line) in arrival order.
+    """
+    def __init__(self, char_period_s=config.FIRMWARE_CHAR_PERIOD_S, move_overhead_s=config.FIRMWARE_MOVE_OVERHEAD_S,
+                 syncwrite_s=config.FIRMWARE_SYNCWRITE_S, verbose=True, ping_supported=True, telemetry_supported=True,
+                 profiles_supported=True, sequences_supported=True, model_motion=False, record_moves=False):
+        self.char_period_s = char_period_s
+        self.move_overhead_s = move_overhead_s
+        self.syncwrite_s = syncwrite_s
+        self.verbose = verbose
+        self.ping_supported = ping_supported
+        self.telemetry_supported = telemetry_supported
+        self.profiles_supported = profiles_supported
+        self.sequences_supported = sequences_supported
+        self.model_motion = model_motion
+        self.move_log = [] if record_moves else None
+
+        self.positions = [2048] * MOTOR_COUNT # Goal positions; present positions with model_motion off
+        # Profile registers; the sketch's setup() values, restored by every plain move
+        self.profile_velocities = list(config.MOTOR_MAX_PROFILE_VELOCITY)
+        self.profile_accelerations = [0] * MOTOR_COUNT
+        self.last_arrivals_s = [0.0] * MOTOR_COUNT # Motion time of each motor in the last executed move
+        self._motion = [None] * MOTOR_COUNT # model_motion: (start position, steps, start time) per motor
+        # Same power-on limits as the sketch: Q1/Q2 cannot move until UPDATE_LIMITS arrives
+        self.limits = {"theta1": [2048, 2048], "theta2": [2048, 2048]}
+        self.commands_received = 0
+        self.bytes_received = 0
+        self.moves_executed = 0
+        self.moves_blocked = 0
+        self.telemetry_frames = 0
+        self.sequences_executed = 0
+        self.sequences_aborted = 0
+        self.sequence_waypoints = 0 # Waypoints executed from sequences
+
+        # Running sequence: dict(steps, velocities, accelerations, period_s, report_every, goals, index, started, due)
+        self._sequence = None
+
+        self.telemetry_period_s = 0.0 # Set by TELEMETRY <ms>; 0 = off
+        self._next_frame = 0.0
+        self._boot_time = time.monotonic() # millis() origin
+
+        self._master_fd, self._slave_fd = os.openpty()
+        tty.setraw(self._slave_fd)
+        self.port = os.ttyname(self._slave_fd)
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self.port
+
+    def stop(self):
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout=1)
+        for fd in (self._master_fd, self._slave_fd):
+            try:
+                os.close(fd)
+            except OSError:
+                pass
+
+    # --- Board loop ---
+    def _run(self):
+        self._println("Setting up motors and limit switches...")
+        self._println("Setup complete. Ready for commands.")
+        pending = bytearray()
+        line = bytearray()
+        fd = self._master_fd
+        try:
+            while not self._stop_event.is_set():
+                timeout = 0 if pending else 0.1
+                if self._sequence:
+                    now = time.monotonic()
+                    if now >= self._sequence["due"]:
+                        self._sequence_step(now)
+                    if self._sequence:
+                        timeout = min(timeout, max(0.0, self._sequence["due"] - time.monotonic()))
+                if self.telemetry_period_s:
+                    now = time.monotonic()
+                    if now >= self._next_frame:
+                        self._send_telemetry_frame(now)
+                    timeout = min(timeout, max(0.0, self._next_frame - now))
+                ready, _, _ = select.select([fd], [], [], timeout)
+                if ready:
+                    data = os.read(fd, 4096)
+                    self.bytes_received += len(data)
+                    pending += data
+                if not pending:
+                    continue
+                # One character per loop() pass, like handleSerialCommands()
+                char = pending.pop(0)
+                if char == ord("\n"):
+                    self._handle_line(line.decode("ascii", "ignore").strip())
+                    line.clear()
+                else:
+                    line.append(char)
+                    if line == _SEQUENCE_HEADER and self.sequences_supported:
+                        # The block after the header is read in one go, not a character per pass
+                        if self._read_rest_of_line(pending, line):
+                            self._handle_line(line.decode("ascii", "ignore").strip())
+                        line.clear()
+                if self.char_period_s:
+                    time.sleep(self.char_period_s)
+        except OSError:
+            pass # Port closed
+
+    def _read_rest_of_line(self, pending, line):
+        """Moves bytes up to the next newline from pending (reading more as needed) into line."""
+        while b"\n" not in pending:
+            if self._stop_event.is_set():
+                return False
+            ready, _, _ = select.select([self._master_fd], [], [], 0.1)
+            if ready:
+                data = os.read(self._master_fd, 4096)
+                self.bytes_received += len(data)
+                pending += data
+        end = pending.index(b"\n")
+        line += pending[:end]
+        del pending[:end + 1]
+        return True
+
+    def _println(self, text=""):
+        try:
+            os.write(self._master_fd, f"{text}\r\n".encode("ascii"))
+        except OSError:
+            pass
+
+    def _send_telemetry_frame(self, now):
+        # Skip frames missed while the loop was busy (a move), like a millis() schedule
+        self._next_frame = max(self._next_frame + self.telemetry_period_s, now)
+        self.telemetry_frames += 1
+        self._println(encode_telemetry_frame(int((now - self._boot_time) * 1000), self.present_positions(now)))
+
+    def present_positions(self, now=None):
+        """Where the motors are (time.monotonic() now); the goals unless model_motion."""
+        if not self.model_motion:
+            return list(self.positions)
+        now = time.monotonic() if now is None else now
+        present = []
+        for i, motion in enumerate(self._motion):
+            if motion is None:
+                present.append(self.positions[i])
+                continue
+            start, steps, started = motion
+            present.append(start + int(round(travelled(steps, self.profile_velocities[i],
+                                                       self.profile_accelerations[i], now - started))))
+        return present
+
+    # --- Commands ---
+    def _handle_line(self, command):
+        self.commands_received += 1
+        if command.startswith(MOVE_ALL_MOTORS_HEADER):
+            if self._sequence:
+                self._abort_sequence("superseded")
+            self._move_all(command)
+        elif command.startswith(SEQUENCE_HEADER) and self.sequences_supported:
+            self._start_sequence(command)
+        elif command.startswith(SEQUENCE_STOP_COMMAND) and self.sequences_supported:
+            if self._sequence:
+                self._abort_sequence("stopped")
+        elif command.startswith("UPDATE_LIMITS ["):
+            self._update_limits(command)
+        elif command.startswith(TOGGLE_VERBOSE_COMMAND):
+            self.verbose = not self.verbose
+            self._println(f"Verbose mode is now {'ON' if self.verbose else 'OFF'}")
+        elif command.startswith(PING_COMMAND) and self.ping_supported:
+            self._println(f"{PONG_REPLY}{command[len(PING_COMMAND):]}")
+        elif command.startswith(TELEMETRY_COMMAND) and self.telemetry_supported:
+            try:
+                period_ms = int(command[len(TELEMETRY_COMMAND):])
+            except ValueError:
+                return
+            self.telemetry_period_s = max(period_ms, 0) / 1000.0
+            self._next_frame = time.monotonic()
+        # FIND_LIMITS needs the motors; unknown commands are ignored like on the board
+
+    def _move_all(self, command):
+        executed = self._execute_move(command)
+        if self.move_log is not None:
+            self.move_log.append((time.perf_counter(), executed, command))
+
+    def _execute_move(self, command):
+        verbose = self.verbose
+        if verbose:
+            self._println()
+            self._println(SEPARATOR)
+            self._println(f"Received Command: {command}")
+            self._println("Step 1: Reading current motor positions...")
+            self._println("   > Success. All motors responded.")
+            self._println("Step 2: Parsing movement deltas...")
+        present = self.present_positions() # Step 1's SyncRead
+        try:
+            if self.profiles_supported:
+                deltas, velocities, accelerations = decode_move_all(command)
+            else: # atol() on the first 8 fields; a profile after the last step is never read
+                fields = command[len(MOVE_ALL_MOTORS_HEADER):].split(",")[:MOTOR_COUNT]
+                deltas = [int(v.split(PROFILE_SEPARATOR)[0]) for v in fields]
+                velocities = accelerations = None
+        except ValueError:
+            deltas = []
+        if len(deltas) != MOTOR_COUNT:
+            self._println(f"   > ERROR: Command requires {MOTOR_COUNT} values. Aborting.")
+            return False
+        if verbose:
+            self._println("Step 3: Mapping deltas to motors...")
+            self._println("Step 4: Performing pre-move safety check...")
+        if self._blocked_by_limit(deltas, present, report=True):
+            self.moves_blocked += 1
+            if verbose:
+                self._println("   > Aborting move command due to position limits.")
+                self._println(SEPARATOR)
+                self._println()
+            return False
+        if verbose:
+            self._println("   > Success. Path is clear.")
+            self._println("Step 5: Finalizing goal positions...")
+            self._println("Step 6: Executing move with SyncWrite...")
+        self._set_profiles(velocities, accelerations)
+        if self.move_overhead_s:
+            time.sleep(self.move_overhead_s)
+        started = time.monotonic()
+        for i, delta in enumerate(deltas):
+            # Every motor gets a new goal, so one left out of the move stops where it is
+            self.positions[i] = present[i] + delta
+            self._motion[i] = (present[i], delta, started) if delta else None
+            self.last_arrivals_s[i] = move_time_s(delta, self.profile_velocities[i], self.profile_accelerations[i])
+        self.moves_executed += 1
+        if verbose:
+            self._println("   > [SyncWrite] Success. Command sent.")
+            self._println(SEPARATOR)
+            self._println()
+        return True
+
+    def _set_profiles(self, velocities, accelerations):
+        """Profile registers for a move: the given fields, or the setup() values for a plain move."""
+        if velocities is None:
+            self.profile_velocities = list(config.MOTOR_MAX_PROFILE_VELOCITY)
+            self.profile_accelerations = [0] * MOTOR_COUNT
+            return
+        for registers, values in ((self.profile_velocities, velocities), (self.profile_accelerations, accelerations)):
+            for i, value in enumerate(values or ()):
+                if value is not None:
+                    registers[i] = value
+
+    def _blocked_by_limit(self, deltas, present, report=False):
+        for index, (name, limit_key) in LIMITED_MOTORS.items():
+            delta = deltas[index]
+            if delta == 0:
+                continue
+            low, high = self.limits[limit_key]
+            goal = present[index] + delta
+            if (delta < 0 and goal < low) or (delta > 0 and goal > high):
+                if report and self.verbose:
+                    self._println()
+                    self._println(f"   > PRE-MOVE CHECK FAILED: Cannot move motor {name}. Goal ({goal}) exceeds limits [{low}, {high}].")
+                return True
+        return False
+
+    # --- Sequences ---
+    def _start_sequence(self, command):
+        if self._sequence:
+            self._abort_sequence("superseded")
+        try:
+            period_ms, report_every, steps, velocities, accelerations = decode_sequence(command, MOTOR_COUNT)
+        except ValueError as e:
+            self.sequences_aborted += 1
+            self._println(f"{SEQUENCE_ABORTED} 0 {str(e).split(':')[0].replace(' ', '_')}")
+            return
+        # One SyncRead, then every goal is the previous goal + delta; the whole path is limit-checked first
+        goals = self.present_positions()
+        for index, deltas in enumerate(steps):
+            if self._blocked_by_limit(deltas, goals):
+                self.sequences_aborted += 1
+                self._println(f"{SEQUENCE_ABORTED} {index} limits")
+                return
+            goals = [g + d for g, d in zip(goals, deltas)]
+        if not steps:
+            self._println(f"{SEQUENCE_DONE} 0")
+            return
+        if velocities is None:
+            self._set_profiles(None, None)
+        now = time.monotonic()
+        self._sequence = dict(steps=steps, velocities=velocities, accelerations=accelerations,
+                              period_s=period_ms / 1000.0, report_every=max(report_every, 1),
+                              goals=self.present_positions(now), index=0, started=now, due=now)
+        self._println(f"{SEQUENCE_STARTED} {len(steps)}")
+
+    def _sequence_step(self, now):
+        sequence = self._sequence
+        index = sequence["index"]
+        deltas = sequence["steps"][index]
+        if sequence["velocities"] is not None:
+            self._set_profiles(sequence["velocities"][index], sequence["accelerations"][index])
+        if self.syncwrite_s:
+            time.sleep(self.syncwrite_s)
+        started = time.monotonic()
+        present = self.present_positions(started)
+        goals = sequence["goals"]
+        for i, delta in enumerate(deltas):
+            if delta:
+                goals[i] += delta
+                self.positions[i] = goals[i]
+                self._motion[i] = (present[i], goals[i] - present[i], started)
+                self.last_arrivals_s[i] = move_time_s(goals[i] - present[i], self.profile_velocities[i],
+                                                      self.profile_accelerations[i])
+        self.sequence_waypoints += 1
+        sequence["index"] = index + 1
+        last = index + 1 == len(sequence["steps"])
+        if last or (index + 1) % sequence["report_every"] == 0:
+            self._println(f"{SEQUENCE_PROGRESS} {index}")
+        if last:
+            self._sequence = None
+            self.sequences_executed += 1
+            self._println(f"{SEQUENCE_DONE} {index + 1}")
+            return
+        period = sequence["period_s"]
+        sequence["due"] = sequence["started"] + (index + 1) * period if period else started
+
+    def _abort_sequence(self, reason):
+        self.sequences_aborted += 1
+        self._println(f"{SEQUENCE_ABORTED} {self._sequence['index']} {reason}")
+        self._sequence = None
+
+    def _update_limits(self, command):
+        end = command.find("]")
+        if end == -1:
+            self._println("Error: Malformed command, no closing ']' found.")
+            return
+        try:
+            t1_min, t1_max, t2_min, t2_max = (int(v) for v in command[len("UPDATE_LIMITS ["):end].split(","))
+        except ValueError:
+            self._println("Error: Malformed command, expected 4 values.")
+            return
+        self.limits["theta1"] = [t1_min, t1_max]
+        self.limits["theta2"] = [t2_min, t2_max]
+        self._println("Successfully updated motor limits:")
+        self._println(f"  Theta1 Min: {t1_min}")
+        self._println(f"  Theta1 Max: {t1_max}")
+        self._println(f"  Theta2 Min: {t2_min}")
+        self._println(f"  Theta2 Max: {t2_max}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Emulated OpenRB-150 elbow driver on a pseudo-terminal.")
+    parser.add_argument("--quiet", action="store_true", help="Start with verbose mode off")
+    parser.add_argument("--no-ping", action="store_true", help="Behave like firmware without the PING command")
+    parser.add_argument("--no-telemetry", action="store_true", help="Behave like firmware without the TELEMETRY command")
+    parser.add_argument("--no-profiles", action="store_true", help="Behave like firmware without profiled moves")
+    parser.add_argument("--no-sequences", action="store_true", help="Behave like firmware without the SEQUENCE command")
+    parser.add_argument("--model-motion", action="store_true", help="Motors travel along their profiles instead of jumping")
+    parser.add_argument("--char-period-ms", type=float, default=config.FIRMWARE_CHAR_PERIOD_S * 1000)
+    parser.add_argument("--move-overhead-ms", type=float, default=config.FIRMWARE_MOVE_OVERHEAD_S * 1000)
+    args = parser.parse_args(argv)
+
+    emulator = FirmwareEmulator(char_period_s=args.char_period_ms / 1000.0,
+                                move_overhead_s=args.move_overhead_ms / 1000.0,
+                                verbose=not args.quiet, ping_supported=not args.no_ping,
+                                telemetry_supported=not args.no_telemetry, profiles_supported=not args.no_profiles,
+                                sequences_supported=not args.no_sequences, model_motion=args.model_motion)
+    print(f"Emulated driver on {emulator.start()} (Ctrl+C to stop)")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        emulator.stop()
+        print(f"Commands: {emulator.commands_received}, moves executed: {emulator.moves_executed}, "
+              f"blocked: {emulator.moves_blocked}, telemetry frames: {emulator.telemetry_frames}, "
+              f"sequences: {emulator.sequences_executed} ({emulator.sequence_waypoints} waypoints, "
+              f"{emulator.sequences_aborted} aborted)")
+
+
+if __name__ == "__main__":
+    main()
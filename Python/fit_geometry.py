@@ -0,0 +1,193 @@
+"""
+Fits the cable-routing geometry constants (geometry_params) to measured
+path lengths and writes the result as the next geometry/geometry_v<N>.json,
+which kinematic_model and q3_pl load at startup.
+
+    python fit_geometry.py q3_pl measured.csv [--free L1_c,r1_c] [--starts 32] [--jobs 4] [--dry-run]
+
+Data is a CSV, angles in the model's own convention (--angle-offset shifts
+them): angle_deg plus any of the model's columns (mm):
+    kinematic_q3, kinematic_q4   pos_mm, neg_mm
+    q3_pl                        lj_mm (PL(q)), rj_mm (PL(180 - q))
+The lengths must be measured independently of the model. Calibration
+captures are not accepted: their motor positions are the steps the host
+commanded from this same geometry (and the coupling sweeps do not move the
+cables these models describe), so fitting to them would be circular.
+
+Only length changes are fitted: each column gets its own free offset, so the
+absolute cable length (and the motors' zero) does not matter. Every constant
+is fitted as a scale of its current value (the newest fitted version, else
+CAD), so constants left out of --free keep their current values. Start
+points scatter the current values by up to --spread; the starts run in a process pool, each with a local
+least-squares solve (scipy when installed, Nelder-Mead otherwise), and the
+best result is kept.
+"""
+import argparse
+import csv
+import math
+import os
+import sys
+import time
+from multiprocessing import Pool
+
+import numpy as np
+
+import config
+from geometry_params import DEFAULT_FREE_PARAMS, DEFAULT_GEOMETRY, load_geometry, save_geometry
+from kinematics_vec import MODEL_CABLES, cable_lengths
+
+try:
+    from scipy.optimize import least_squares
+except ImportError:
+    least_squares = None
+
+MODEL_COLUMNS = MODEL_CABLES # Data columns each model can be fitted to
+
+
+def predict(model, q_deg, g):
+    """Path lengths for every column of the model, {column: array (mm)}."""
+    return dict(zip(MODEL_CABLES[model], cable_lengths(model, q_deg, g)))
+
+
+def load_data(model, path, angle_offset=0.0):
+    """(angles_deg, {column: measured mm}) from a CSV of measured path lengths."""
+    if path.endswith(".npy"):
+        raise ValueError("Calibration captures hold commanded motor positions, not measured path lengths")
+    with open(path, newline="") as f:
+        reader = csv.DictReader(f)
+        table = [row for row in reader]
+    angles = np.array([float(row["angle_deg"]) for row in table])
+    measured = {name: np.array([float(row[name]) for row in table])
+                for name in MODEL_COLUMNS[model] if table and name in table[0]}
+    unknown = set(measured) - set(MODEL_COLUMNS[model])
+    if unknown or not measured:
+        raise ValueError(f"{model} predicts {', '.join(MODEL_COLUMNS[model])}; data has {', '.join(measured) or 'none'}")
+    return angles + angle_offset, measured
+
+
+def residuals(scales, model, base, free, angles, measured):
+    """Prediction minus measurement per sample, each column's mean removed (its free offset)."""
+    g = dict(base)
+    for name, scale in zip(free, scales):
+        g[name] = base[name] * scale
+    with np.errstate(all="ignore"):
+        predicted = predict(model, angles, g)
+    parts = []
+    for name, values in measured.items():
+        r = predicted[name] - values
+        parts.append(r - r.mean())
+    r = np.concatenate(parts)
+    return r if np.all(np.isfinite(r)) else np.full_like(r, 1e6)
+
+
+def _cost(scales, *args):
+    if np.any(scales <= 0):
+        return math.inf
+    r = residuals(scales, *args)
+    return float(r @ r)
+
+
+def _nelder_mead(f, x0, max_iter, step=0.05, tolerance=1e-14):
+    n = len(x0)
+    simplex = np.vstack([x0] + [x0 + step * np.eye(n)[i] for i in range(n)])
+    values = np.array([f(x) for x in simplex])
+    for _ in range(max_iter):
+        order = np.argsort(values)
+        simplex, values = simplex[order], values[order]
+        if values[-1] - values[0] <= tolerance * max(1.0, abs(values[0])):
+            break
+        centroid = simplex[:-1].mean(axis=0)
+        reflected = centroid + (centroid - simplex[-1])
+        f_reflected = f(reflected)
+        if f_reflected < values[0]:
+            expanded = centroid + 2 * (centroid - simplex[-1])
+            f_expanded = f(expanded)
+            simplex[-1], values[-1] = (expanded, f_expanded) if f_expanded < f_reflected else (reflected, f_reflected)
+        elif f_reflected < values[-2]:
+            simplex[-1], values[-1] = reflected, f_reflected
+        else:
+            contracted = centroid + 0.5 * (simplex[-1] - centroid)
+            f_contracted = f(contracted)
+            if f_contracted < values[-1]:
+                simplex[-1], values[-1] = contracted, f_contracted
+            else:
+                simplex[1:] = simplex[0] + 0.5 * (simplex[1:] - simplex[0])
+                values[1:] = [f(x) for x in simplex[1:]]
+    best = int(np.argmin(values))
+    return simplex[best], values[best]
+
+
+def fit_from(start):
+    """One local fit (runs in a pool worker). start = (x0, model, base, free, angles, measured)."""
+    x0, *args = start
+    if least_squares is not None:
+        result = least_squares(residuals, x0, args=tuple(args), bounds=(1e-3, np.inf), x_scale="jac")
+        scales = result.x
+    else:
+        scales, _ = _nelder_mead(lambda x: _cost(x, *args), x0, max_iter=400 * len(x0))
+    return _cost(scales, *args), scales
+
+
+def fit(model, base, angles, measured, free, starts, spread, jobs, seed=0):
+    """Multi-start fit around the constants in base. Returns (best cost, best scales, every start's cost)."""
+    rng = np.random.default_rng(seed)
+    start_points = [np.ones(len(free))] + [1 + rng.uniform(-spread, spread, len(free)) for _ in range(starts - 1)]
+    work = [(x0, model, base, free, angles, measured) for x0 in start_points]
+    if jobs > 1:
+        with Pool(min(jobs, len(work))) as pool:
+            results = pool.map(fit_from, work)
+    else:
+        results = [fit_from(item) for item in work]
+    best_cost, best_scales = min(results, key=lambda result: result[0])
+    return best_cost, best_scales, [cost for cost, _ in results]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("model", choices=sorted(MODEL_COLUMNS))
+    parser.add_argument("data", help="CSV of measured path lengths")
+    parser.add_argument("--angle-offset", type=float, default=0.0, help="Added to every angle (degrees)")
+    parser.add_argument("--free", help="Comma-separated constants to fit (default: the measured geometry)")
+    parser.add_argument("--starts", type=int, default=config.GEOMETRY_FIT_STARTS)
+    parser.add_argument("--spread", type=float, default=config.GEOMETRY_FIT_SPREAD)
+    parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1, help="Worker processes")
+    parser.add_argument("--dry-run", action="store_true", help="Report the fit without writing a geometry version")
+    args = parser.parse_args(argv)
+
+    angles, measured = load_data(args.model, args.data, args.angle_offset)
+    free = tuple(args.free.split(",")) if args.free else DEFAULT_FREE_PARAMS[args.model]
+    cad = DEFAULT_GEOMETRY[args.model]
+    base = load_geometry(args.model)
+    samples = sum(len(values) for values in measured.values())
+
+    cad_cost = _cost(np.ones(len(cad)), args.model, cad, tuple(cad), angles, measured)
+    current_cost = _cost(np.ones(len(free)), args.model, base, free, angles, measured)
+    started = time.perf_counter()
+    best_cost, scales, costs = fit(args.model, base, angles, measured, free, args.starts, args.spread, args.jobs)
+    elapsed = time.perf_counter() - started
+
+    rms = lambda cost: math.sqrt(cost / samples)
+    agreeing = sum(cost <= best_cost * 1.01 + 1e-9 for cost in costs)
+    print(f"{args.model}: {samples} samples ({', '.join(measured)}), {len(free)} constants, "
+          f"{args.starts} starts in {elapsed:.1f} s ({'scipy least_squares' if least_squares else 'Nelder-Mead'})")
+    print(f"RMS residual: CAD {rms(cad_cost) * 1000:.2f} um, current {rms(current_cost) * 1000:.2f} um, "
+          f"fitted {rms(best_cost) * 1000:.2f} um ({agreeing}/{len(costs)} starts within 1% of the best)")
+    fitted = dict(base)
+    for name, scale in zip(free, scales):
+        fitted[name] = base[name] * scale
+        print(f"  {name:18s} {base[name]: .6g} -> {fitted[name]: .6g} ({(fitted[name] / cad[name] - 1) * 100:+.1f}% from CAD)")
+    if agreeing < 2:
+        print("Only one start reached the best fit; the constants may not be identifiable from this data.")
+
+    if args.dry_run:
+        return 0
+    path = save_geometry(args.model, fitted, {
+        "rms_residual_mm": rms(best_cost), "cad_rms_residual_mm": rms(cad_cost), "samples": samples,
+        "data": os.path.basename(args.data), "free": list(free), "starts": args.starts,
+    })
+    print(f"Written {path}; restart the GUI / elbowd to use it.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
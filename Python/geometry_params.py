@@ -0,0 +1,97 @@
+"""
+Cable-routing geometry constants and their fitted versions.
+
+DEFAULT_GEOMETRY holds the values entered from CAD. fit_geometry.py writes
+fitted sets as geometry/geometry_v<N>.json (N counts up, older versions are
+kept); the models load the newest version at import and fall back to the
+CAD values for any model or constant it does not contain.
+"""
+import glob
+import json
+import os
+import re
+import time
+
+import config
+
+# Units as used by each model: kinematic_model works in metres (and degrees
+# for the lag angles), q3_pl in millimetres.
+DEFAULT_GEOMETRY = {
+    "kinematic_q3": { # kinematic_model.get_q3_pl (Q1 -> Q3 cables)
+        "L_AE": 1e-3 * 1.91, "L_BC": 1e-3 * 1.09, "r_PD": 1e-3 * 1.5, "r_OA": 1e-3 * 1.25,
+        "a_lag_q": 66.92, "b_lag_horizontal": 25.83, "CD_angle": 25.83,
+        "OM": 1e-3 * 2.25, "OE": 1e-3 * 2.29, "ME": 1e-3 * 0.4, "Px": -1e-3 * 2.18, "Py": 1e-3 * 2,
+        "l_offset": 1e-3 * 3.6762,
+    },
+    "kinematic_q4": { # kinematic_model.get_q4_pl (Q2 -> Q4 cables)
+        "L_AE": 1e-3 * 1.75, "L_BC": 1e-3 * 1.48, "r_PD": 1e-3 * 0.875, "r_OA": 1e-3 * 1.3,
+        "a_lag_q": 76.53, "b_lag_horizontal": 11.08, "CD_angle": 11.08,
+        "OM": 1e-3 * 2, "OE": 1e-3 * 2.17, "ME": 1e-3 * 0.858, "Px": -1e-3 * 1.87, "Py": 1e-3 * 1.85,
+        "l_offset": 1e-3 * 3.3992,
+    },
+    "q3_pl": { # q3_pl._calculate_pl_value (wrist pitch -> jaw cables)
+        "L1_c": 1.457, "L2_c": 0.55, "r1_c": 0.89, "c1x_c": 1.6, "c1y_c": -1.5, "r2_c": 1.0,
+    },
+}
+
+# Constants fit_geometry.py tunes unless told otherwise (the lag angles are design choices, not measurements)
+DEFAULT_FREE_PARAMS = {
+    "kinematic_q3": ("L_AE", "L_BC", "r_PD", "r_OA", "OM", "OE", "ME", "Px", "Py", "l_offset"),
+    "kinematic_q4": ("L_AE", "L_BC", "r_PD", "r_OA", "OM", "OE", "ME", "Px", "Py", "l_offset"),
+    "q3_pl": ("L1_c", "L2_c", "r1_c", "c1x_c", "c1y_c", "r2_c"),
+}
+
+FILE_FORMAT = 1
+_VERSION_RE = re.compile(r"geometry_v(\d+)\.json$")
+
+
+def geometry_dir():
+    return os.path.join(os.path.dirname(os.path.abspath(__file__)), config.GEOMETRY_DIR_NAME)
+
+
+def latest_geometry_file():
+    """(version, path) of the newest fitted geometry, or (0, None)."""
+    versions = []
+    for path in glob.glob(os.path.join(geometry_dir(), "geometry_v*.json")):
+        match = _VERSION_RE.search(path)
+        if match:
+            versions.append((int(match.group(1)), path))
+    return max(versions) if versions else (0, None)
+
+
+def _read(path):
+    with open(path, "r") as f:
+        data = json.load(f)
+    if data.get("format") != FILE_FORMAT:
+        raise ValueError(f"{path} has format {data.get('format')}, expected {FILE_FORMAT}")
+    return data
+
+
+def load_geometry(model):
+    """Constants for one model: the newest fitted values over the CAD defaults."""
+    geometry = dict(DEFAULT_GEOMETRY[model])
+    version, path = latest_geometry_file()
+    if path is None:
+        return geometry
+    try:
+        fitted = _read(path)["models"].get(model, {}).get("params", {})
+        geometry.update({name: float(value) for name, value in fitted.items() if name in geometry})
+    except Exception as e:
+        print(f"WARNING: Could not load fitted geometry from '{path}', using the CAD values. Error: {e}")
+    return geometry
+
+
+def save_geometry(model, params, fit_info):
+    """
+    Writes the next geometry version: the previous version's models, with
+    `model` replaced by the fitted params. Returns the new file's path.
+    """
+    version, path = latest_geometry_file()
+    models = _read(path)["models"] if path else {}
+    models[model] = {"params": {name: float(value) for name, value in params.items()}, **fit_info}
+    new_path = os.path.join(geometry_dir(), f"geometry_v{version + 1}.json")
+    os.makedirs(geometry_dir(), exist_ok=True)
+    with open(new_path, "w") as f:
+        json.dump({"format": FILE_FORMAT, "version": version + 1, "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+                   "previous": os.path.basename(path) if path else None, "models": models}, f, indent=2)
+    return new_path
@@ -1,89 +1,23 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
-import math
-from datetime import datetime
 import time 
 import json
 import os
 
 import config # For constants, MotorIndex
 from config import MotorIndex #
-import q1_pl, q2_pl, q3_pl, q4_pl # Joint processors for step calculations
-
-# ROS-related imports with a fallback if ROS is not installed
-import queue
-import threading
-try:
-    import sys
-    sys.path.append("/opt/ros/noetic/lib/python3/dist-packages")
-    import rospy
-    # NEW: Import JointState message type
-    from sensor_msgs.msg import JointState
-    IS_ROS_AVAILABLE = True
-except ImportError:
-    IS_ROS_AVAILABLE = False
-
-# --- Helper Class for ROS Communication ---
-class ROSSubscriberThread(threading.Thread):
-    # REMOVED: min_interval_sec from the constructor
-    def __init__(self, topic_name, data_queue, log_callback):
-        super().__init__(daemon=True)
-        self._topic_name = topic_name
-        self._data_queue = data_queue
-        self._log_callback = log_callback
-        self._subscriber = None
-        self._stop_event = threading.Event()
-        # REMOVED: self._last_processed_time and self._min_interval_sec
-
-    def _ros_callback(self, msg):
-        # This callback is now extremely fast. It just validates and queues.
-        try:
-            joint_map = dict(zip(msg.name, msg.position))
-            required_joints = ["elbow_pitch", "elbow_yaw", "wrist_pitch", "jaw_1"]
-            if not all(joint in joint_map for joint in required_joints):
-                # We can log a warning, but we won't do it on every single message
-                # to avoid spamming the log. A more advanced implementation might
-                # use a flag to only log this once. For now, we'll just return.
-                return
+from log_console import RingLogConsole
+from log_writer import StructuredLogWriter, format_timestamp
+from motion_controller import MotionController
+from joint_state import JOINT_KEYS
+from command_codec import FIND_LIMITS_COMMAND, encode_move_all, encode_update_limits
 
-            def convert_rad_to_deg(rad_val):
-                return math.degrees(rad_val) + 90.0
-
-            target_positions_deg = {
-                "Q1": -convert_rad_to_deg(joint_map["elbow_pitch"]),
-                "Q2": convert_rad_to_deg(joint_map["elbow_yaw"]),
-                "Q3": convert_rad_to_deg(joint_map["wrist_pitch"]),
-                "Q4L": -convert_rad_to_deg(joint_map["jaw_1"]),
-                "Q4R": math.degrees(joint_map["jaw_1"]) + 90.0
-            }
-            self._data_queue.put(target_positions_deg)
-        except Exception as e:
-            self._log_callback(f"ROS Callback Error: {e}", level="error")
+from target_stream import TargetMailbox, TargetStreamer
+from motion_planner import SegmentStreamer
+from latency_histogram import export_histograms
+from profiler import profiled, start_profile
+from ros_interface import ROSSubscriberThread, IS_ROS_AVAILABLE, rospy
 
-    def run(self):
-        """The main execution method of the thread."""
-        try:
-            self._log_callback(f"ROS Thread: Subscribing to topic '{self._topic_name}'.")
-            self._subscriber = rospy.Subscriber(self._topic_name, JointState, self._ros_callback)
-            
-            # The loop is simpler now, just waiting for the stop signal.
-            while not self._stop_event.is_set() and not rospy.is_shutdown():
-                self._stop_event.wait(0.05)
-
-        except rospy.ROSInterruptException:
-            self._log_callback("ROS Thread: Shutdown signal received.")
-        except Exception as e:
-            self._log_callback(f"ROS Thread: An error occurred during run: {e}", level="error")
-        finally:
-            if self._subscriber:
-                self._subscriber.unregister()
-                self._log_callback("ROS Thread: Unsubscribed from topic.")
-            self._log_callback("ROS Thread: Exiting.")
-
-    def stop(self):
-        """Signals the thread's run loop to terminate."""
-        self._log_callback("ROS Thread: Stop signal received.")
-        self._stop_event.set()
 
 class ElbowSimulatorGUI:
     def __init__(self, root, serial_handler): #
@@ -92,6 +26,17 @@ class ElbowSimulatorGUI:
 
         self.root.title(config.APP_TITLE) #
         self.root.geometry(config.MAIN_WINDOW_GEOMETRY) #
+
+        # Full session history goes to disk in the background; the on-screen log is capped
+        self.log_console = None
+        self.log_writer = StructuredLogWriter(
+            os.path.join(os.path.dirname(__file__), config.LOGS_DIR_NAME),
+            fmt=config.LOG_WRITER_FORMAT,
+            levels=config.LOG_WRITER_LEVELS,
+            rotate_bytes=config.LOG_ROTATE_BYTES,
+            max_files=config.LOG_ROTATE_MAX_FILES,
+        )
+        self.log_writer.start()
         
         # --- NEW: Setup Cyberpunk Theme ---
         self._setup_cyberpunk_style()
@@ -99,9 +44,12 @@ class ElbowSimulatorGUI:
         self.serial_handler.set_callbacks( #
             data_callback=self._handle_serial_data, #
             status_callback=self._update_connection_status_display, #
-            error_callback=self._handle_serial_error #
+            error_callback=self._handle_serial_error, #
+            link_callback=self._handle_link_state,
+            log_callback=self.log_message
         )
         self.is_verbose_arduino_side = False #
+        self.motion_controller = MotionController(self.serial_handler, log_callback=self.log_message)
 
         # --- Tkinter Variables ---
         self.control_mode_is_degrees_var = tk.BooleanVar(value=True) # True=Degrees, False=Steps
@@ -111,19 +59,29 @@ class ElbowSimulatorGUI:
         self.wrist_yaw_mode_var = tk.BooleanVar(value=False)  # False = Jaws Mode, True = Wrist Yaw Mode
 
         # Positional Control Cumulative Display
-        self.cumulative_ep_degrees_var = tk.DoubleVar(value=90.0) #
-        self.cumulative_ey_degrees_var = tk.DoubleVar(value=90.0) #
-        self.cumulative_wp_degrees_var = tk.DoubleVar(value=90.0) #
-        self.cumulative_lj_degrees_var = tk.DoubleVar(value=90.0) #
-        self.cumulative_rj_degrees_var = tk.DoubleVar(value=90.0) #
+        self.cumulative_ep_degrees_var = tk.DoubleVar(value=config.HOME_JOINT_DEGREES) #
+        self.cumulative_ey_degrees_var = tk.DoubleVar(value=config.HOME_JOINT_DEGREES) #
+        self.cumulative_wp_degrees_var = tk.DoubleVar(value=config.HOME_JOINT_DEGREES) #
+        self.cumulative_lj_degrees_var = tk.DoubleVar(value=config.HOME_JOINT_DEGREES) #
+        self.cumulative_rj_degrees_var = tk.DoubleVar(value=config.HOME_JOINT_DEGREES) #
+        # Present positions from the telemetry ring (firmware with the TELEMETRY command)
+        self.present_position_var = tk.StringVar(value="no telemetry")
+        self.following_error_var = tk.StringVar(value="-")
         
         # --- ROS Variables ---
         self.ros_mode_var = tk.BooleanVar(value=False)
         #self.ros_topic_var = tk.StringVar(value="/joint_states") # Default topic
-        self.ros_topic_var = tk.StringVar(value="/cccleft11/joint_states") #teng4 modified.# Default topic
+        self.ros_topic_var = tk.StringVar(value=config.DEFAULT_ROS_TOPIC) #teng4 modified.# Default topic
         self.ros_status_var = tk.StringVar(value="Status: Inactive")
-        self.ros_update_freq_ms = tk.IntVar(value=100) # NEW: Update frequency in ms
-        self.ros_queue = queue.Queue()
+        self.ros_update_freq_ms = tk.IntVar(value=config.ROS_UPDATE_FREQ_MS) # NEW: Update frequency in ms
+        self.ros_update_freq_ms.trace_add("write", self._on_ros_freq_changed)
+        self.target_mailbox = TargetMailbox()
+        self.target_streamer = None
+        # Jogs and ROS targets as planned segments instead of single moves
+        self.segment_streamer = None
+        if config.PLANNER_ENABLED:
+            self.segment_streamer = SegmentStreamer(self.motion_controller, self.serial_handler, self.log_message)
+            self.segment_streamer.start()
         self.ros_thread = None
         self.ros_node_initialized = False # Flag to ensure rospy.init_node is called only once
 
@@ -140,21 +98,15 @@ class ElbowSimulatorGUI:
         # --- Tension Motor Variables ---
         self.tension_step_size_var = tk.StringVar(value="10")
 
-        #holds the latest direction values for each motor pair, 0 for true neutral, 1 for ccw, -1 for cw
-        self.latest_dir = {
-            "EP": 0,
-            "EY": 0,
-            "WP": 0,
-            "LJ": 0,
-            "RJ": 0,
-        }
-
         self._load_settings()
         self._setup_main_layout() #
         self._create_widgets() #
         self._create_output_area() # Create the serial output log box
         self._update_control_mode_ui() # Initialize new control UI
-        self._check_ros_queue() # Start the loop to check for ROS messages
+        self._displayed_state_version = -1
+        self._displayed_telemetry_frame = -1
+        self._telemetry_origin = None # Present positions minus commanded steps at the last reset (first frame after it)
+        self._refresh_joint_display() # Start mirroring the joint state into the display
 
         self.root.protocol("WM_DELETE_WINDOW", self.cleanup_on_exit)
 
@@ -179,6 +131,11 @@ class ElbowSimulatorGUI:
                 self.theta1_max_display_var.set(self.theta1_max_input_var.get())
                 self.theta2_min_display_var.set(self.theta2_min_input_var.get())
                 self.theta2_max_display_var.set(self.theta2_max_input_var.get())
+
+                # Where the firmware's limit check will most likely stand, until it reports otherwise
+                self.serial_handler.limit_guard.seed(
+                    self.theta1_min_input_var.get(), self.theta1_max_input_var.get(),
+                    self.theta2_min_input_var.get(), self.theta2_max_input_var.get())
                 
                 self.log_message("Loaded settings from gui_settings.json.", level="info")
                 self.root.update_idletasks()
@@ -381,6 +338,10 @@ class ElbowSimulatorGUI:
         )
         self.wrist_yaw_mode_button.grid(row=0, column=1, padx=15, pady=5)
         sys_cmd_frame.columnconfigure(1, weight=1)
+        self.timing_button = ttk.Button(sys_cmd_frame, text="[TIMING]", command=self._export_pipeline_timing)
+        self.timing_button.grid(row=0, column=2, padx=5, pady=5)
+        self.profile_button = ttk.Button(sys_cmd_frame, text="[PROFILE]", command=self.start_profile)
+        self.profile_button.grid(row=0, column=3, padx=5, pady=5)
 
         # Row 1: Holds both Manual Control and Tension Motors
         controls_container_frame = ttk.Frame(self.main_content_frame)
@@ -646,8 +607,7 @@ class ElbowSimulatorGUI:
         motor_steps[command_index] = actual_steps
         
         # Format and send command
-        steps_str = ",".join(map(str, motor_steps))
-        cmd = f"MOVE_ALL_MOTORS:{steps_str}"
+        cmd = encode_move_all(motor_steps)
         self.log_message(f"Tension Motor ID {motor_number}: {actual_steps} steps. Cmd: {cmd}", level="sent")
         self.serial_handler.send_command(cmd)
 
@@ -692,6 +652,12 @@ class ElbowSimulatorGUI:
         ttk.Label(cumulative_frame, textvariable=self.cumulative_rj_degrees_var, width=8, anchor="e", foreground=self.FG_COLOR).grid(row=row_idx_cum, column=1, sticky="e", pady=2)
         ttk.Label(cumulative_frame, text="°").grid(row=row_idx_cum, column=2, sticky="w", pady=2)
         row_idx_cum += 1
+        ttk.Label(cumulative_frame, text="Present EP/EY:").grid(row=row_idx_cum, column=0, sticky="w", pady=2)
+        ttk.Label(cumulative_frame, textvariable=self.present_position_var, anchor="e", foreground=self.FG_COLOR).grid(row=row_idx_cum, column=1, columnspan=2, sticky="e", pady=2)
+        row_idx_cum += 1
+        ttk.Label(cumulative_frame, text="Following Error:").grid(row=row_idx_cum, column=0, sticky="w", pady=2)
+        ttk.Label(cumulative_frame, textvariable=self.following_error_var, anchor="e", foreground=self.FG_COLOR).grid(row=row_idx_cum, column=1, columnspan=2, sticky="e", pady=2)
+        row_idx_cum += 1
         ttk.Button(cumulative_frame, text="[RESET_POSITION]", command=self._reset_cumulative_degrees_display_action, width=25).grid(row=row_idx_cum, column=0, columnspan=3, pady=10)
 
     def _create_output_area(self): #
@@ -727,6 +693,8 @@ class ElbowSimulatorGUI:
         scrollbar.grid(row=0, column=1, sticky=(tk.N, tk.S)) #
         self.output_text['yscrollcommand'] = scrollbar.set #
 
+        self.log_console = RingLogConsole(self.root, self.output_text)
+
     def _create_help_button(self, parent, help_file):
         """Creates a styled help button."""
         return ttk.Button(
@@ -779,49 +747,50 @@ class ElbowSimulatorGUI:
         scrollbar.pack(side="right", fill="y")
         text_widget.pack(side="left", expand=True, fill="both")
 
-    def log_message(self, message, level="info"):
+    def log_message(self, message, level="info", source="gui", cmd_id=None, console=True):
         """
         Logs a message to the output text box with timestamp, level icon, and color.
         Levels: info, sent, received, error, warning
+        Safe to call from any thread: the record is queued for the console and the session file.
+        Pass console=False for records that should only reach the file.
         """
-        if not (hasattr(self, 'output_text') and self.output_text and self.output_text.winfo_exists()):
-            print(f"LOG ({level}): {message}")
+        now = time.time()
+        self.log_writer.submit(level, message, source=source, cmd_id=cmd_id, ts=now)
+        if not console:
             return
 
-        timestamp = datetime.now().strftime("%H:%M:%S.%f")[:-3]
-        
-        level_icons = {
-            "info": "##",
-            "sent": ">>",
-            "received": "<<",
-            "error": "!!",
-            "warning": "!!",
-        }
-        icon = level_icons.get(level, "##")
-
-        # Insert content with specific tags for coloring
-        self.output_text.insert(tk.END, f"[{timestamp}] ", "timestamp")
-        self.output_text.insert(tk.END, f"{icon} {message}\n", level)
-        self.output_text.see(tk.END) # Auto-scroll to the end
+        if self.log_console is None:
+            print(f"LOG ({level}): {message}")
+            return
+        self.log_console.append(format_timestamp(now), level, message)
+
+    def start_profile(self, duration_s=config.PROFILE_DURATION_S):
+        """Profiles moves, target scheduling and the serial reader for duration_s; results go to the logs folder."""
+        start_profile(self.log_writer.logs_dir, duration_s, self.log_message)
+
+    def _export_pipeline_timing(self):
+        """Prints the per-stage move latency percentiles and saves the histograms to the logs folder."""
+        timing = self.serial_handler.pipeline_timing
+        lines = timing.summary_lines()
+        if not lines:
+            self.log_message("Pipeline timing: no moves recorded yet.")
+            return
+        self.log_message("Pipeline timing (per stage):")
+        for line in lines:
+            self.log_message(f"  {line}")
+        filepath = os.path.join(self.log_writer.logs_dir, f"pipeline_timing_{time.strftime('%Y%m%d_%H%M%S')}.json")
+        try:
+            timing.export(filepath)
+            self.log_message(f"Pipeline timing saved to {filepath}")
+        except Exception as e:
+            self.log_message(f"Could not save pipeline timing: {e}", level="error")
 
     def _save_logs_to_file(self):
-        """Saves the content of the output log to a timestamped text file in a specific directory."""
+        """Flushes the background log writer and reports where the session log lives."""
         try:
-            # Create logs directory if it doesn't exist
-            logs_dir = os.path.join(os.path.dirname(__file__), "logs")
-            os.makedirs(logs_dir, exist_ok=True)
-            
-            # Create timestamped filename
-            timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
-            filename = f"elbow_ctrl_log_{timestamp}.txt"
-            filepath = os.path.join(logs_dir, filename)
-            
-            # Save the log content
-            log_content = self.output_text.get("1.0", tk.END)
-            with open(filepath, "w") as f:
-                f.write(log_content)
-            
+            filepath = self.log_writer.flush()
             self.log_message(f"Log saved to {filepath}", level="info")
+            return filepath
         except Exception as e:
             self.log_message(f"Failed to save log file: {e}", level="error")
 
@@ -831,7 +800,8 @@ class ElbowSimulatorGUI:
         self.log_message(message) #
         
     def _handle_serial_data(self, response_data, data_type="received"): #
-        self.log_message(f"Arduino: {response_data}", level="received")
+        self.log_message(f"Arduino: {response_data}", level="received", source="serial",
+                         cmd_id=self.serial_handler.command_count)
         if response_data.startswith("VERBOSE_STATE:"): #
             state = response_data.split(":")[1].strip() #
             self.is_verbose_arduino_side = (state == "1") #
@@ -872,6 +842,19 @@ class ElbowSimulatorGUI:
                 messagebox.showerror("Serial Error", error_message, parent=self.root)
                 self.log_message(f"ERROR: {error_message}", level="error")
 
+    def _handle_link_state(self, degraded, reason):
+        """Heartbeat thread callback: the link got slow / stopped answering, or recovered."""
+        if degraded:
+            self.log_message(f"! LINK DEGRADED: {reason}", level="warning")
+        else:
+            self.log_message(f"Link healthy again: {reason}")
+        self.root.after(0, self._show_link_state, degraded)
+
+    def _show_link_state(self, degraded):
+        if self.serial_handler.is_connected:
+            self.status_label.config(text=f"STATUS: Connected to {self.serial_handler.port_name}"
+                                          + (" (LINK DEGRADED)" if degraded else ""))
+
     def _toggle_connection_action(self): #
         if not self.serial_handler.is_connected: #
             port = self.port_entry.get() #
@@ -1028,8 +1011,13 @@ class ElbowSimulatorGUI:
                 return
 
         self.ros_status_var.set(f"Status: Subscribing...")
-        # UPDATED: Call the new constructor without the frequency argument
-        self.ros_thread = ROSSubscriberThread(topic_name, self.ros_queue, self.log_message)
+        # Targets go into a latest-value mailbox; the streamer sends the newest one on a fixed clock
+        self.target_mailbox.clear()
+        self.target_streamer = TargetStreamer(
+            self.target_mailbox, self.motion_controller, self.serial_handler,
+            self._ros_period_s(), self.log_message, planner=self.segment_streamer)
+        self.target_streamer.start()
+        self.ros_thread = ROSSubscriberThread(topic_name, self.target_mailbox, self.log_message)
         self.ros_thread.start()
 
 
@@ -1042,50 +1030,38 @@ class ElbowSimulatorGUI:
             self.ros_thread = None
             self.ros_status_var.set("Status: Standby")
             self.log_message("ROS subscription stopped.")
-
-    def _check_ros_queue(self):
-        """
-        Periodically checks the ROS queue. It drains the queue to get the
-        most recent command and then executes the move. This ensures the
-        GUI is responsive and acts on the latest data.
-        """
-        latest_target_positions = None
+        if self.target_streamer and self.target_streamer.is_alive():
+            self.target_streamer.stop()
+            self.target_streamer.join(timeout=2)
+            self._export_target_stats()
+            self.target_streamer = None
+        if self.segment_streamer:
+            self.segment_streamer.halt() # Do not keep chasing the last streamed target
+
+    def _ros_period_s(self):
         try:
-            # Drain the queue, keeping only the last item.
-            while not self.ros_queue.empty():
-                latest_target_positions = self.ros_queue.get_nowait()
-        except queue.Empty:
-            pass # This is expected, just means we're done.
-
-        # Only proceed if we actually got a message from the queue.
-        if latest_target_positions:
-            try:
-                # self.log_message(f"ROS Command Received: Target {latest_target_positions}")
-                current_abs_positions = {
-                    "Q1": self.cumulative_ep_degrees_var.get(),
-                    "Q2": self.cumulative_ey_degrees_var.get(),
-                    "Q3": self.cumulative_wp_degrees_var.get(),
-                    "Q4L": self.cumulative_lj_degrees_var.get(),
-                    "Q4R": self.cumulative_rj_degrees_var.get(),
-                }
-                joint_degree_deltas = {
-                    "EP": latest_target_positions["Q1"] - current_abs_positions["Q1"], #THIS IS FLIPPED FOR SIGN CONVENTION
-                    "EY": latest_target_positions["Q2"] - current_abs_positions["Q2"],
-                    "WP": latest_target_positions["Q3"] - current_abs_positions["Q3"],
-                    "LJ": latest_target_positions["Q4L"] - current_abs_positions["Q4L"], 
-                    "RJ": latest_target_positions["Q4R"] - current_abs_positions["Q4R"],
-                }
-                # self.log_message(f"Calculated Deltas: {joint_degree_deltas}")
-
-                MIN_DELTA_DEG = 1  # this prevents us from wasting arduino's brain over moves we can't make anyways
-                joint_degree_deltas = {k: v for k, v in joint_degree_deltas.items() if abs(v) >= MIN_DELTA_DEG}
-                if joint_degree_deltas:
-                    self._execute_degree_based_move(joint_degree_deltas)
-            except Exception as e:
-                self.log_message(f"Error processing ROS queue: {e}", level="error")
-        
-        # Schedule the next check, controlled by the GUI entry field.
-        self.root.after(self.ros_update_freq_ms.get(), self._check_ros_queue)
+            return max(0, self.ros_update_freq_ms.get()) / 1000.0
+        except tk.TclError: # Entry is empty or not a number while being edited
+            return config.ROS_UPDATE_FREQ_MS / 1000.0
+
+    def _on_ros_freq_changed(self, *args):
+        if self.target_streamer:
+            self.target_streamer.period_s = self._ros_period_s()
+
+    def _export_target_stats(self):
+        """Logs the target age / link latency summary and saves the histograms next to the session log."""
+        self.log_message(f"ROS targets: {self.target_streamer.summary()}")
+        self.log_message(f"Link: {self.serial_handler.ack_latency.summary()}")
+        self.log_message(f"Heartbeat: {self.serial_handler.heartbeat.summary()}")
+        self.log_message(f"Limits: {self.serial_handler.limit_guard.summary()}")
+        filepath = os.path.join(self.log_writer.logs_dir, f"ros_target_stats_{time.strftime('%Y%m%d_%H%M%S')}.json")
+        try:
+            export_histograms([self.target_streamer.age_histogram, self.serial_handler.ack_latency,
+                               self.serial_handler.heartbeat.rtt_histogram],
+                              filepath, extra={**self.target_streamer.stats(), **self.serial_handler.limit_guard.stats()})
+            self.log_message(f"Target stats saved to {filepath}")
+        except Exception as e:
+            self.log_message(f"Could not save target stats: {e}", level="error")
 
     def _joint_button_action(self, joint, sign):
         try:
@@ -1132,8 +1108,11 @@ class ElbowSimulatorGUI:
                 elif joint == "Q4R":
                     motor_steps[MotorIndex.RJL] = steps; motor_steps[MotorIndex.RJR] = -steps
                 self.log_message(f"Coordinated Step Move: {joint} by {steps} steps")
-            steps_str = ",".join(map(str, motor_steps))
-            cmd = f"MOVE_ALL_MOTORS:{steps_str}"
+            blocked = self.serial_handler.limit_guard.check(motor_steps)
+            if blocked:
+                self.log_message(f"Move not sent, the firmware would block it: {blocked}", level="warning")
+                return
+            cmd = self.motion_controller.encode_move(motor_steps)
             self.serial_handler.send_command(cmd)
             self.log_message(f"Command: {cmd}", level="sent")
 
@@ -1147,7 +1126,7 @@ class ElbowSimulatorGUI:
             
             int(t1_min); int(t1_max); int(t2_min); int(t2_max)
 
-            cmd = f"UPDATE_LIMITS [{t1_min},{t1_max},{t2_min},{t2_max}]"
+            cmd = encode_update_limits(t1_min, t1_max, t2_min, t2_max)
             
             # Send the command and only update/save if it succeeds
             if self.serial_handler.send_command(cmd):
@@ -1171,7 +1150,7 @@ class ElbowSimulatorGUI:
 
     def _send_find_limits_action(self):
         """Sends the FIND_LIMITS command."""
-        cmd = "FIND_LIMITS"
+        cmd = FIND_LIMITS_COMMAND
         self.serial_handler.send_command(cmd)
         self.log_message(f"Command: {cmd}", level="sent")
 
@@ -1218,54 +1197,48 @@ class ElbowSimulatorGUI:
         self.log_message(f"Dedicated Degree Input: Deltas {joint_degree_deltas}")
         self._execute_degree_based_move(joint_degree_deltas)
 
+    @profiled
     def _execute_degree_based_move(self, joint_degree_deltas_input):
-        all_joint_keys = ["EP", "EY", "WP", "LJ", "RJ"]
-        full_joint_degree_deltas = {key: 0.0 for key in all_joint_keys}
-        full_joint_degree_deltas.update(joint_degree_deltas_input)
-        current_abs_positions = {
-            "EP": self.cumulative_ep_degrees_var.get(), "EY": self.cumulative_ey_degrees_var.get(),
-            "WP": self.cumulative_wp_degrees_var.get(), "LJ": self.cumulative_lj_degrees_var.get(),
-            "RJ": self.cumulative_rj_degrees_var.get(),
-        }
-        joint_processors = {
-            "EP": (current_abs_positions["EP"], full_joint_degree_deltas["EP"], q1_pl.get_steps, self.latest_dir["EP"]),
-            "EY": (current_abs_positions["EY"], full_joint_degree_deltas["EY"], q2_pl.get_steps, self.latest_dir["EY"]),
-            "WP": (current_abs_positions["WP"], full_joint_degree_deltas["WP"], q3_pl.get_steps, self.latest_dir["WP"]),
-            "LJ": (current_abs_positions["LJ"], full_joint_degree_deltas["LJ"], q4_pl.get_steps_L, self.latest_dir["LJ"]),
-            "RJ": (current_abs_positions["RJ"], full_joint_degree_deltas["RJ"], q4_pl.get_steps_R, self.latest_dir["RJ"]),
-        }
-        total_motor_steps = [0] * len(MotorIndex)
-        for joint_name, (curr_theta, delta_theta, get_steps_function, latest_dir) in joint_processors.items():
-            if delta_theta != 0:
-                try:
-                    # self.log_message(f"Calculating for {joint_name}: current={curr_theta:.2f}°, delta={delta_theta:.2f}°")
-                    joint_specific_motor_steps, self.latest_dir[joint_name] = get_steps_function(curr_theta, delta_theta, latest_dir)
-                    for motor_idx_enum in MotorIndex:
-                        total_motor_steps[motor_idx_enum.value] += joint_specific_motor_steps[motor_idx_enum.value]
-                    # self.log_message(f"  Steps from {joint_name}: {joint_specific_motor_steps}")
-                except Exception as e:
-                    self.log_message(f"  Error in {get_steps_function.__name__} for {joint_name}: {e}", level="error")
-                    import traceback; self.log_message(traceback.format_exc(), level="error")
-        final_integer_steps = [int(round(s)) for s in total_motor_steps]
-        # self.log_message(f"Final Combined Steps: {final_integer_steps}")
-        steps_str = ",".join(map(str, final_integer_steps))
-        cmd = f"MOVE_ALL_MOTORS:{steps_str}"
-        if self.serial_handler.send_command(cmd):
-            # self.log_message(f"Command: {cmd}", level="sent")
-            if full_joint_degree_deltas["EP"] != 0: self.cumulative_ep_degrees_var.set(round(current_abs_positions["EP"] + full_joint_degree_deltas["EP"], 2))
-            if full_joint_degree_deltas["EY"] != 0: self.cumulative_ey_degrees_var.set(round(current_abs_positions["EY"] + full_joint_degree_deltas["EY"], 2))
-            if full_joint_degree_deltas["WP"] != 0: self.cumulative_wp_degrees_var.set(round(current_abs_positions["WP"] + full_joint_degree_deltas["WP"], 2))
-            if full_joint_degree_deltas["LJ"] != 0: self.cumulative_lj_degrees_var.set(round(current_abs_positions["LJ"] + full_joint_degree_deltas["LJ"], 2))
-            if full_joint_degree_deltas["RJ"] != 0: self.cumulative_rj_degrees_var.set(round(current_abs_positions["RJ"] + full_joint_degree_deltas["RJ"], 2))
-        else:
-            self.log_message("Failed to send command.", level="error")
+        if self.segment_streamer:
+            self.segment_streamer.move_by([float(joint_degree_deltas_input.get(key, 0.0)) for key in JOINT_KEYS])
+            return
+        self.motion_controller.execute_degree_based_move(joint_degree_deltas_input)
+
+    def _refresh_joint_display(self):
+        """Mirrors the controller's joint state into the display variables at display rate."""
+        snapshot = self.motion_controller.state.snapshot()
+        if snapshot.version != self._displayed_state_version:
+            ep, ey, wp, lj, rj = snapshot.angles
+            self.cumulative_ep_degrees_var.set(ep)
+            self.cumulative_ey_degrees_var.set(ey)
+            self.cumulative_wp_degrees_var.set(wp)
+            self.cumulative_lj_degrees_var.set(lj)
+            self.cumulative_rj_degrees_var.set(rj)
+            self._displayed_state_version = snapshot.version
+        self._refresh_present_position(snapshot)
+        self.root.after(config.JOINT_DISPLAY_REFRESH_MS, self._refresh_joint_display)
+
+    def _refresh_present_position(self, snapshot):
+        """Newest telemetry frame, read in place from the ring, and how far the motors trail the commanded steps."""
+        latest = self.serial_handler.telemetry.latest()
+        if latest is None or latest[0] == self._displayed_telemetry_frame:
+            return
+        self._displayed_telemetry_frame, row = latest
+        present = row["positions"]
+        self.present_position_var.set(f"{present[MotorIndex.EP]} / {present[MotorIndex.EY]} ticks")
+        if self._telemetry_origin is None:
+            self._telemetry_origin = present - snapshot.motor_targets
+        error = present - self._telemetry_origin - snapshot.motor_targets
+        worst = int(abs(error).argmax())
+        self.following_error_var.set(f"{int(error[worst])} ticks ({MotorIndex(worst).name})")
 
     def _reset_cumulative_degrees_display_action(self, from_test_mode=False, is_initial_setup=False):
-        self.cumulative_ep_degrees_var.set(90.0)
-        self.cumulative_ey_degrees_var.set(90.0)
-        self.cumulative_wp_degrees_var.set(90.0)
-        self.cumulative_lj_degrees_var.set(90.0)
-        self.cumulative_rj_degrees_var.set(90.0)
+        if self.segment_streamer:
+            # A planned pose from before the reset would go out as one jump from the reference pose
+            self.segment_streamer.reset(apply=self.motion_controller.reset_positions)
+        else:
+            self.motion_controller.reset_positions()
+        self._telemetry_origin = None
         if not from_test_mode and not is_initial_setup:
             messagebox.showinfo("Reset", "Cumulative degree display has been reset.", parent=self.root)
         if not is_initial_setup:
@@ -1275,8 +1248,14 @@ class ElbowSimulatorGUI:
         self.log_message("Application exiting. Cleaning up...")
         self._save_settings()
         self._stop_ros_subscriber()
+        if self.segment_streamer:
+            self.segment_streamer.stop()
+            self.segment_streamer.join(timeout=2)
         if self.ros_node_initialized and IS_ROS_AVAILABLE and not rospy.is_shutdown():
             rospy.signal_shutdown("GUI is closing")
         self.serial_handler.cleanup()
         self.log_message("Cleanup complete. Goodbye.")
+        if self.log_console:
+            self.log_console.stop()
+        self.log_writer.stop()
 
@@ -0,0 +1,83 @@
+from collections import namedtuple
+
+import config
+from config import MotorIndex
+
+# Joint keys used for moves, in processing order (index = slot in JointState)
+JOINT_KEYS = ("EP", "EY", "WP", "LJ", "RJ")
+JOINT_INDEX = {key: i for i, key in enumerate(JOINT_KEYS)}
+
+# Immutable view handed to readers. angles/directions are in JOINT_KEYS order,
+# motor_targets is the summed commanded steps per motor since the last reset (MotorIndex order).
+JointSnapshot = namedtuple("JointSnapshot", ["version", "angles", "directions", "motor_targets"])
+
+
+class JointState:
+    """
+    Compact store for the cumulative joint angles, the direction state of each
+    motor pair, the commanded motor targets and a version counter.
+
+    There is a single writer (whichever thread sends moves). Every change
+    publishes a new immutable JointSnapshot with one reference assignment, so
+    readers on other threads (Tk display, telemetry, loggers) call snapshot()
+    without taking a lock and never see a half-applied move.
+    """
+    __slots__ = ("_angles", "_directions", "_motor_targets", "_version", "_snapshot")
+
+    def __init__(self, home_degrees=config.HOME_JOINT_DEGREES):
+        self._angles = [float(home_degrees)] * len(JOINT_KEYS)
+        self._directions = [0] * len(JOINT_KEYS)
+        self._motor_targets = [0] * len(MotorIndex)
+        self._version = 0
+        self._publish()
+
+    # --- Reader side (any thread) ---
+    def snapshot(self):
+        return self._snapshot
+
+    @property
+    def version(self):
+        return self._snapshot.version
+
+    # --- Writer side (single thread) ---
+    def angle(self, index):
+        return self._angles[index]
+
+    def direction(self, index):
+        return self._directions[index]
+
+    def set_direction(self, index, value):
+        # Direction state only matters to the writer; it is published with the next move
+        self._directions[index] = value
+
+    def commit_move(self, joint_deltas, motor_steps):
+        """Applies one sent move: joint_deltas in JOINT_KEYS order, motor_steps in MotorIndex order."""
+        angles = self._angles
+        for i, delta in enumerate(joint_deltas):
+            if delta != 0:
+                angles[i] = round(angles[i] + delta, 2)
+        targets = self._motor_targets
+        for i, steps in enumerate(motor_steps):
+            targets[i] += steps
+        self._version += 1
+        self._publish()
+
+    def set_angles(self, angles):
+        self._angles[:] = [float(a) for a in angles]
+        self._version += 1
+        self._publish()
+
+    def reset(self, home_degrees=config.HOME_JOINT_DEGREES):
+        """Resets the cumulative position to the reference pose and clears the motor targets."""
+        self._angles[:] = [float(home_degrees)] * len(JOINT_KEYS)
+        self._motor_targets[:] = [0] * len(MotorIndex)
+        self._version += 1
+        self._publish()
+
+    def _publish(self):
+        self._snapshot = JointSnapshot(self._version, tuple(self._angles),
+                                       tuple(self._directions), tuple(self._motor_targets))
+
+    def as_dict(self):
+        """Cumulative angles keyed by joint name (convenience for logging and the GUI)."""
+        return dict(zip(JOINT_KEYS, self._snapshot.angles))
@@ -1,6 +1,15 @@
 import math
 import numpy as np
-import matplotlib.pyplot as plt
+
+from geometry_params import load_geometry
+
+# Constants in the order the functions unpack them (one tuple unpack per call)
+_GEOMETRY_KEYS = ("L_AE", "L_BC", "r_PD", "r_OA", "a_lag_q", "b_lag_horizontal", "CD_angle",
+                  "OM", "OE", "ME", "Px", "Py", "l_offset")
+Q3_GEOMETRY = load_geometry("kinematic_q3")
+Q4_GEOMETRY = load_geometry("kinematic_q4")
+_Q3_CONSTANTS = tuple(Q3_GEOMETRY[key] for key in _GEOMETRY_KEYS)
+_Q4_CONSTANTS = tuple(Q4_GEOMETRY[key] for key in _GEOMETRY_KEYS)
 
 
 def get_q3_pl(q1_joint_angle_degrees):
@@ -13,19 +22,10 @@ def get_q3_pl(q1_joint_angle_degrees):
     Returns:
         tuple: (q3_pos, q3_neg) - Cable lengths in mm
     """
-    # Physical constants (converted from MATLAB)
-    L_AE = 1e-3 * 1.91
-    L_BC = 1e-3 * 1.09
-    r_PD = 1e-3 * 1.5
-    r_OA = 1e-3 * 1.25
-    a_lag_q = 66.92
-    b_lag_horizontal = 25.83
-    CD_angle = 25.83
-    OM = 1e-3 * 2.25
-    OE = 1e-3 * 2.29
-    ME = 1e-3 * 0.4
-    Px = -1e-3 * 2.18
-    Py = 1e-3 * 2
+    # Physical constants (converted from MATLAB; fitted values from geometry_params when present)
+    # l_offset: l_neg at -(90-q_switch_deg), l_pos at (90-q_switch_deg)
+    (L_AE, L_BC, r_PD, r_OA, a_lag_q, b_lag_horizontal, CD_angle,
+     OM, OE, ME, Px, Py, l_offset) = _Q3_CONSTANTS
     
     # Derived constants
     SCD_min = r_PD * CD_angle * math.pi / 180
@@ -48,11 +48,9 @@ def get_q3_pl(q1_joint_angle_degrees):
                 l_pos_neg_comp)
         
         if L_EC > 0 and (Ey - Py) != 0:
-            l_offset = 1e-3 * 3.6762  # l_neg at -(90-q_switch_deg)
             l_neg = (l_offset + 0.1 * (L_EC + r_PD * (math.pi - math.atan2(L_EC, r_PD) - 
                     math.atan2((Ex - Px), (Ey - Py))) + l_pos_neg_comp))
         else:
-            l_offset = 1e-3 * 3.6762  # l_neg at -(90-q_switch_deg)
             l_neg = l_offset + 0.1 * (SCD_min + L_BC + L_AE + l_pos_neg_comp)
             
     elif q1_joint_angle_degrees <= (90 - q_switch_deg):
@@ -76,12 +74,10 @@ def get_q3_pl(q1_joint_angle_degrees):
         L_EC_mirror = math.sqrt(max(0, sqrt_arg_mirror))
         
         if L_EC_mirror > 0 and (Ey_mirror - Py) != 0:
-            l_offset = 1e-3 * 3.6762  # l_pos at (90-q_switch_deg)
             l_pos = (l_offset + 0.1 * (L_EC_mirror + r_PD * (math.pi - 
                     math.atan2(L_EC_mirror, r_PD) - 
                     math.atan2((Ex_mirror - Px), (Ey_mirror - Py))) - l_pos_neg_comp))
         else:
-            l_offset = 1e-3 * 3.6762  # l_pos at (90-q_switch_deg)
             l_pos = l_offset + 0.1 * (l_base - l_pos_neg_comp)
     
     # Ensure outputs are real numbers and convert to mm
@@ -100,19 +96,10 @@ def get_q4_pl(q2_joint_angle_degrees):
     Returns:
         tuple: (q4_pos, q4_neg) - Cable lengths in mm
     """
-    # Physical constants (converted from MATLAB)
-    L_AE = 1e-3 * 1.75
-    L_BC = 1e-3 * 1.48
-    r_PD = 1e-3 * 0.875
-    r_OA = 1e-3 * 1.3
-    a_lag_q = 76.53
-    b_lag_horizontal = 11.08
-    CD_angle = 11.08
-    OM = 1e-3 * 2
-    OE = 1e-3 * 2.17
-    ME = 1e-3 * 0.858
-    Px = -1e-3 * 1.87
-    Py = 1e-3 * 1.85
+    # Physical constants (converted from MATLAB; fitted values from geometry_params when present)
+    # l_offset: l_neg at -(90-q_switch_deg), l_pos at (90-q_switch_deg)
+    (L_AE, L_BC, r_PD, r_OA, a_lag_q, b_lag_horizontal, CD_angle,
+     OM, OE, ME, Px, Py, l_offset) = _Q4_CONSTANTS
     
     # Derived constants
     SCD_min = r_PD * CD_angle * math.pi / 180
@@ -135,11 +122,9 @@ def get_q4_pl(q2_joint_angle_degrees):
                 l_pos_neg_comp)
         
         if L_EC > 0 and (Ey - Py) != 0:
-            l_offset = 1e-3 * 3.3992  # l_neg at -(90-q_switch_deg)
             l_neg = (l_offset + 0.1 * (L_EC + r_PD * (math.pi - math.atan2(L_EC, r_PD) - 
                     math.atan2((Ex - Px), (Ey - Py))) + l_pos_neg_comp))
         else:
-            l_offset = 1e-3 * 3.3992  # l_neg at -(90-q_switch_deg)
             l_neg = l_offset + 0.1 * (SCD_min + L_BC + L_AE + l_pos_neg_comp)
             
     elif q2_joint_angle_degrees <= (90 - q_switch_deg):
@@ -163,12 +148,10 @@ def get_q4_pl(q2_joint_angle_degrees):
         L_EC_mirror = math.sqrt(max(0, sqrt_arg_mirror))
         
         if L_EC_mirror > 0 and (Ey_mirror - Py) != 0:
-            l_offset = 1e-3 * 3.3992  # l_pos at (90-q_switch_deg)
             l_pos = (l_offset + 0.1 * (L_EC_mirror + r_PD * (math.pi - 
                     math.atan2(L_EC_mirror, r_PD) - 
                     math.atan2((Ex_mirror - Px), (Ey_mirror - Py))) - l_pos_neg_comp))
         else:
-            l_offset = 1e-3 * 3.3992  # l_pos at (90-q_switch_deg)
             l_pos = l_offset + 0.1 * (l_base - l_pos_neg_comp)
     
     # Ensure outputs are real numbers and convert to mm
@@ -178,6 +161,8 @@ def get_q4_pl(q2_joint_angle_degrees):
     return q4_pos, q4_neg
 
 def sanity_check():
+    import matplotlib.pyplot as plt
+
     # Plot for Q4
     q2_angles = np.linspace(-90, 90, 181)
     q4_pos_list = []
@@ -216,4 +201,5 @@ def sanity_check():
     plt.savefig('q3_path_lengths.png')
     plt.close()
 
-sanity_check()
+if __name__ == "__main__":
+    sanity_check()
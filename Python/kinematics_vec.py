@@ -0,0 +1,89 @@
+"""
+NumPy versions of the cable path-length models, evaluated over whole arrays
+of joint angles at once, for fitting (fit_geometry.py) and batch work.
+
+Each function takes the same constants dict the scalar model uses
+(geometry_params) and matches the scalar function to rounding error.
+Constants may also be arrays that broadcast against the angles, e.g.
+shape (n, 1) against angles of shape (m,) evaluates n geometry sets over
+the whole grid in one call (tolerance_analysis.py).
+"""
+import math
+
+import numpy as np
+
+# Model -> cables it predicts, in the order cable_lengths() returns them
+MODEL_CABLES = {
+    "kinematic_q3": ("pos_mm", "neg_mm"),
+    "kinematic_q4": ("pos_mm", "neg_mm"),
+    "q3_pl": ("lj_mm", "rj_mm"),
+}
+
+
+def lag_cable_lengths(q_deg, g, base_mm):
+    """
+    kinematic_model.get_q3_pl / get_q4_pl over an array of joint angles
+    (degrees). base_mm is the constant cable length (24.1 for Q3, 28 for Q4).
+    Returns (pos_mm, neg_mm) arrays.
+    """
+    q_deg = np.asarray(q_deg, dtype=float)
+    r_PD, r_OA, OE, Px, Py, l_offset = g["r_PD"], g["r_OA"], g["OE"], g["Px"], g["Py"], g["l_offset"]
+    SCD_min = r_PD * g["CD_angle"] * math.pi / 180
+    l_base = SCD_min + g["L_BC"] + g["L_AE"]
+    q_switch_deg = g["a_lag_q"] - g["b_lag_horizontal"]
+    lag_angle = np.arctan2(g["ME"], g["OM"])
+
+    def wrapped(angle_rad):
+        # Region A/B cable wrapping around the pulley (the mirrored side takes -q)
+        Ex = OE * np.sin(angle_rad - lag_angle)
+        Ey = OE * np.cos(angle_rad - lag_angle)
+        L_EC = np.sqrt(np.maximum(0, (Ex - Px)**2 + (Ey - Py)**2 - r_PD**2))
+        length = l_offset + 0.1 * (L_EC + r_PD * (math.pi - np.arctan2(L_EC, r_PD) - np.arctan2(Ex - Px, Ey - Py)))
+        return np.where((L_EC > 0) & (Ey - Py != 0), length, l_offset + 0.1 * l_base)
+
+    q_rad = np.radians(q_deg)
+    l_pos = l_base + r_OA * np.radians((90 - q_switch_deg) - q_deg)
+    l_neg = l_base + r_OA * np.radians((90 - q_switch_deg) + q_deg)
+    l_pos = np.where(q_deg > (90 - q_switch_deg), wrapped(-q_rad), l_pos) # Region B
+    l_neg = np.where(q_deg <= -(90 - q_switch_deg), wrapped(q_rad), l_neg) # Region A
+    return base_mm + 1000 * l_pos, base_mm + 1000 * l_neg
+
+
+def wrist_path_length(q_deg, g):
+    """q3_pl._calculate_pl_value over an array of wrist pitch angles (degrees). Returns mm."""
+    L1_c, L2_c, r1_c, c1x_c, c1y_c, r2_c = (g[name] for name in ("L1_c", "L2_c", "r1_c", "c1x_c", "c1y_c", "r2_c"))
+    q_rad = np.radians(np.asarray(q_deg, dtype=float))
+    angle_offset = np.arcsin(np.clip(np.divide(L2_c, L1_c), -1.0, 1.0))
+    px = L1_c * np.cos(q_rad - angle_offset)
+    py = L1_c * np.sin(q_rad - angle_offset)
+
+    # Case 1: l1 + s1
+    l1 = np.sqrt(np.maximum(0, (px - c1x_c)**2 + (py - c1y_c)**2 - r1_c**2))
+    numerator = px - c1x_c
+    denominator = py - c1y_c
+    with np.errstate(divide="ignore", invalid="ignore"):
+        alpha1 = np.where(r1_c != 0, np.arctan(l1 / r1_c), np.where(l1 > 0, math.pi / 2, 0.0))
+        beta1 = np.where(denominator == 0, np.copysign(math.pi / 2, numerator) * (numerator != 0),
+                         np.arctan(numerator / denominator))
+    case1 = l1 + r1_c * np.abs((math.pi / 2) - alpha1 - np.abs(beta1))
+
+    # Case 2: l2 + 2*s2 + l3 + s3, C2 at the origin
+    l3 = np.sqrt(np.maximum(0, px**2 + py**2 - r2_c**2))
+    dist_sq_c1_c2 = c1x_c**2 + c1y_c**2
+    l2 = np.sqrt(np.maximum(0, dist_sq_c1_c2 - (r1_c + r2_c)**2))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        alpha3 = np.where(r2_c != 0, np.arctan(l3 / r2_c), np.where(l3 > 0, math.pi / 2, 0.0))
+        alpha2 = np.where(dist_sq_c1_c2 > 0, np.arccos(np.clip((r1_c + r2_c) / np.sqrt(dist_sq_c1_c2), -1.0, 1.0)), 0.0)
+        beta2 = np.where(c1y_c == 0, np.where(np.abs(c1x_c) > 0, math.pi / 2, 0.0),
+                         np.arctan(np.abs(c1x_c) / np.abs(c1y_c)))
+    s3 = r2_c * np.abs(np.arctan2(py, px) - alpha3)
+    case2 = l2 + 2 * r2_c * np.abs((math.pi / 2) - alpha2 - beta2) + l3 + s3
+
+    return np.where((c1x_c - px) < r1_c, case1, case2)
+
+
+def cable_lengths(model, q_deg, g):
+    """Path lengths (mm) of every cable of a model (MODEL_CABLES order) over an array of joint angles."""
+    if model == "q3_pl":
+        return wrist_path_length(q_deg, g), wrist_path_length(180.0 - np.asarray(q_deg), g)
+    return lag_cable_lengths(q_deg, g, 24.1 if model == "kinematic_q3" else 28.0)
@@ -0,0 +1,105 @@
+import json
+import math
+
+
+class LatencyHistogram:
+    """
+    Fixed-memory latency histogram with logarithmic buckets (HDR-style).
+
+    Values are recorded in seconds. Each bucket is `precision` wider than the
+    previous one, so percentiles are accurate to about that relative error
+    from `min_value` up to `max_value`, whatever the number of samples.
+    """
+    def __init__(self, name="latency", min_value=1e-6, max_value=60.0, precision=0.02):
+        self.name = name
+        self.min_value = min_value
+        self.max_value = max_value
+        self._log_base = math.log1p(precision)
+        self._bucket_count = int(math.log(max_value / min_value) / self._log_base) + 2
+        self.reset()
+
+    def reset(self):
+        self._counts = [0] * self._bucket_count
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+
+    def record(self, value):
+        if value < 0:
+            value = 0.0
+        if value <= self.min_value:
+            index = 0
+        else:
+            index = min(int(math.log(value / self.min_value) / self._log_base) + 1, self._bucket_count - 1)
+        self._counts[index] += 1
+        self.count += 1
+        self.total += value
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+
+    def merge(self, other):
+        for i, c in enumerate(other._counts):
+            self._counts[i] += c
+        self.count += other.count
+        self.total += other.total
+        if other.min is not None and (self.min is None or other.min < self.min):
+            self.min = other.min
+        if other.max is not None and (self.max is None or other.max > self.max):
+            self.max = other.max
+
+    def _bucket_value(self, index):
+        if index == 0:
+            return self.min_value
+        # Upper edge of the bucket, clamped to what was actually seen
+        value = self.min_value * math.exp(index * self._log_base)
+        return min(value, self.max) if self.max is not None else value
+
+    def percentile(self, p):
+        """Value at percentile p (0-100), or None if nothing was recorded."""
+        if self.count == 0:
+            return None
+        rank = max(1, math.ceil(self.count * p / 100.0))
+        seen = 0
+        for i, c in enumerate(self._counts):
+            seen += c
+            if seen >= rank:
+                return self._bucket_value(i)
+        return self.max
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else None
+
+    def to_dict(self):
+        """Summary plus the non-empty buckets as [upper_edge_s, count] pairs."""
+        return {
+            "name": self.name,
+            "count": self.count,
+            "min_s": self.min,
+            "mean_s": self.mean,
+            "p50_s": self.percentile(50),
+            "p90_s": self.percentile(90),
+            "p99_s": self.percentile(99),
+            "max_s": self.max,
+            "buckets": [[self._bucket_value(i), c] for i, c in enumerate(self._counts) if c],
+        }
+
+    def summary(self):
+        """One line for the console: count, p50/p99/max in milliseconds."""
+        if self.count == 0:
+            return f"{self.name}: no samples"
+        return (f"{self.name}: n={self.count} p50={self.percentile(50) * 1000:.2f} ms "
+                f"p99={self.percentile(99) * 1000:.2f} ms max={self.max * 1000:.2f} ms")
+
+
+def export_histograms(histograms, filepath, extra=None):
+    """Writes a list of histograms (and any extra counters) to a JSON file."""
+    payload = {"histograms": [h.to_dict() for h in histograms]}
+    if extra:
+        payload.update(extra)
+    with open(filepath, "w") as f:
+        json.dump(payload, f, indent=2)
+    return filepath
@@ -0,0 +1,243 @@
+import re
+import threading
+import time
+from collections import deque
+
+import config
+from command_codec import MOVE_ALL_MOTORS_HEADER, FIND_LIMITS_COMMAND, RESPONSE_MOVE_DONE, RESPONSE_MOVE_FAILED, VERBOSE_REPLY
+
+# Motors the firmware limit-checks: (name in its messages, command index, limit pair)
+LIMITED_MOTORS = (("Q1", 0, "theta1"), ("Q2", 1, "theta2"))
+_MOTOR_SLOT = {name: slot for slot, (name, _, _) in enumerate(LIMITED_MOTORS)}
+
+_BLOCK_RE = re.compile(r"PRE-MOVE CHECK FAILED: Cannot move motor (\w+)\. Goal \((-?\d+)\) exceeds limits \[(-?\d+), (-?\d+)\]")
+_LIMIT_RE = re.compile(r"^Theta([12]) (Min|Max): (-?\d+)") # UPDATE_LIMITS reply
+_FOUND_RE = re.compile(r"^Theta([12]): (-?\d+) -> (-?\d+)") # FIND_LIMITS summary
+
+ACCEPTED, UNKNOWN, BLOCKED = 0, 1, 2
+
+
+class LimitGuard:
+    """
+    Host copy of the firmware's pre-move limit check (isMoveBlockedByLimit),
+    so moves the board would certainly reject are not sent at all.
+
+    For Q1 and Q2 it keeps the limits the firmware is using and an interval
+    [lo, hi] that the motor's present position is known to lie in. Both are
+    seeded from the saved limits (the motors are assumed to start inside
+    them) and corrected by what the firmware prints: UPDATE_LIMITS and
+    FIND_LIMITS replies set the limits, and a PRE-MOVE CHECK FAILED line
+    gives the exact position. FIND_LIMITS steps Q1/Q2 where the guard cannot
+    follow, so it forgets their positions until the summary, which leaves
+    each motor at its new maximum. Executed moves shift the interval; moves whose
+    fate is not known (quiet firmware, no answer) widen it. A move is only
+    rejected when every position in the interval would be blocked, so the
+    guard never stops a move the firmware would have made.
+    """
+    def __init__(self, enabled=config.LIMIT_PREFLIGHT):
+        self.enabled = enabled
+        self.limits = [None] * len(LIMITED_MOTORS) # (min, max) per limited motor, None = unknown
+        self.positions = [None] * len(LIMITED_MOTORS) # (lo, hi) after every resolved move, None = unknown
+        self.verbose = True # Firmware starts verbose; only verbose firmware reports each move's fate
+        self._in_flight = deque() # (sent time, deltas) waiting for "[SyncWrite] Success" / failure, in order
+        self._lock = threading.Lock()
+
+        self.moves_checked = 0
+        self.moves_rejected = 0 # Round trips avoided
+        self.firmware_blocks = 0 # Blocks the guard could not predict
+        self.position_fixes = 0 # Exact positions learned from block messages
+
+    # --- Model ---
+    def seed(self, t1_min, t1_max, t2_min, t2_max):
+        """Saved limits (gui_settings.json); the motors are assumed to be somewhere inside them."""
+        with self._lock:
+            self.limits = [(int(t1_min), int(t1_max)), (int(t2_min), int(t2_max))]
+            self.positions = list(self.limits)
+
+    def _fate(self, positions, deltas):
+        """(ACCEPTED / UNKNOWN / BLOCKED, slot that decides a block) for a move from the given intervals."""
+        fate = ACCEPTED
+        for slot, delta in enumerate(deltas):
+            if delta == 0:
+                continue
+            interval, limits = positions[slot], self.limits[slot]
+            if interval is None or limits is None:
+                fate = UNKNOWN
+                continue
+            lo, hi = interval
+            low_limit, high_limit = limits
+            if delta > 0:
+                if lo + delta > high_limit:
+                    return BLOCKED, slot
+                if hi + delta > high_limit:
+                    fate = UNKNOWN
+            else:
+                if hi + delta < low_limit:
+                    return BLOCKED, slot
+                if lo + delta < low_limit:
+                    fate = UNKNOWN
+        return fate, None
+
+    def _advance(self, positions, deltas):
+        """Intervals after a move whose outcome is not reported: shifted if it must pass, else widened."""
+        fate, _ = self._fate(positions, deltas)
+        if fate == BLOCKED:
+            return positions
+        advanced = list(positions)
+        for slot, delta in enumerate(deltas):
+            if delta and advanced[slot] is not None:
+                lo, hi = advanced[slot]
+                advanced[slot] = (lo + delta, hi + delta) if fate == ACCEPTED else (lo + min(delta, 0), hi + max(delta, 0))
+        return advanced
+
+    def _expire(self, now):
+        while self._in_flight and now - self._in_flight[0][0] > config.MOVE_ACK_TIMEOUT_S:
+            self.positions = self._advance(self.positions, self._in_flight.popleft()[1])
+
+    def _expected_positions(self):
+        positions = self.positions
+        for _, deltas in self._in_flight:
+            positions = self._advance(positions, deltas)
+        return positions
+
+    # --- Host side ---
+    def check(self, motor_steps):
+        """Returns None if the move may be sent, or why the firmware would certainly block it."""
+        if not self.enabled:
+            return None
+        deltas = tuple(motor_steps[index] for _, index, _ in LIMITED_MOTORS)
+        if not any(deltas):
+            return None
+        with self._lock:
+            self.moves_checked += 1
+            self._expire(time.monotonic())
+            positions = self._expected_positions()
+            fate, slot = self._fate(positions, deltas)
+            if fate != BLOCKED:
+                return None
+            self.moves_rejected += 1
+            lo, hi = positions[slot]
+            delta = deltas[slot]
+            low_limit, high_limit = self.limits[slot]
+            return (f"{LIMITED_MOTORS[slot][0]} would end at {lo + delta}..{hi + delta}, "
+                    f"outside its limits [{low_limit}, {high_limit}]")
+
+    def check_sequence(self, motor_steps_list):
+        """check() for a waypoint sequence: the board checks every cumulative goal before running any."""
+        if not self.enabled:
+            return None
+        with self._lock:
+            self.moves_checked += 1
+            self._expire(time.monotonic())
+            positions = self._expected_positions()
+            for waypoint, motor_steps in enumerate(motor_steps_list):
+                deltas = tuple(motor_steps[index] for _, index, _ in LIMITED_MOTORS)
+                fate, slot = self._fate(positions, deltas)
+                if fate == BLOCKED:
+                    self.moves_rejected += 1
+                    lo, hi = positions[slot]
+                    low_limit, high_limit = self.limits[slot]
+                    return (f"waypoint {waypoint}: {LIMITED_MOTORS[slot][0]} would end at {lo + deltas[slot]}.."
+                            f"{hi + deltas[slot]}, outside its limits [{low_limit}, {high_limit}]")
+                positions = self._advance(positions, deltas)
+        return None
+
+    def on_command_sent(self, command):
+        if command.startswith(FIND_LIMITS_COMMAND):
+            with self._lock:
+                self._in_flight.clear()
+                self.positions = [None] * len(LIMITED_MOTORS)
+            return
+        if not command.startswith(MOVE_ALL_MOTORS_HEADER):
+            return
+        try:
+            values = command[len(MOVE_ALL_MOTORS_HEADER):].split(",", len(LIMITED_MOTORS))
+            deltas = tuple(int(values[index]) for _, index, _ in LIMITED_MOTORS)
+        except (ValueError, IndexError):
+            return # The firmware rejects it too
+        with self._lock:
+            now = time.monotonic()
+            self._expire(now)
+            if self.verbose:
+                self._in_flight.append((now, deltas))
+            else:
+                self.positions = self._advance(self.positions, deltas)
+
+    def on_sequence_progress(self, motor_steps_list):
+        """Waypoints the board reports executed (SEQ lines), in order."""
+        with self._lock:
+            for motor_steps in motor_steps_list:
+                deltas = tuple(motor_steps[index] for _, index, _ in LIMITED_MOTORS)
+                self.positions = [None if p is None else (p[0] + d, p[1] + d) for p, d in zip(self.positions, deltas)]
+
+    def on_disconnect(self):
+        with self._lock:
+            while self._in_flight:
+                self.positions = self._advance(self.positions, self._in_flight.popleft()[1])
+
+    # --- Firmware side ---
+    def on_response(self, response, kind):
+        """Called by the serial reader with every line and its classify_response() kind."""
+        if kind == RESPONSE_MOVE_DONE:
+            with self._lock:
+                if self._in_flight:
+                    deltas = self._in_flight.popleft()[1]
+                    self.positions = [None if p is None else (p[0] + d, p[1] + d) for p, d in zip(self.positions, deltas)]
+        elif kind == RESPONSE_MOVE_FAILED:
+            with self._lock:
+                if self._in_flight:
+                    self._in_flight.popleft() # Aborted or not written: nothing moved
+        elif response.startswith("> PRE-MOVE CHECK FAILED"):
+            match = _BLOCK_RE.search(response)
+            slot = _MOTOR_SLOT.get(match.group(1)) if match else None
+            if slot is None:
+                return
+            goal, low_limit, high_limit = (int(v) for v in match.group(2, 3, 4))
+            with self._lock:
+                self.firmware_blocks += 1
+                self.limits[slot] = (low_limit, high_limit)
+                if self._in_flight:
+                    present = goal - self._in_flight[0][1][slot]
+                    self.positions[slot] = (present, present)
+                    self.position_fixes += 1
+        elif response.startswith(VERBOSE_REPLY):
+            self.verbose = response.endswith("ON")
+        elif response.startswith("Theta"):
+            self._note_limit_line(response)
+
+    def _note_limit_line(self, response):
+        match = _LIMIT_RE.match(response)
+        with self._lock:
+            if match:
+                slot = int(match.group(1)) - 1
+                low_limit, high_limit = self.limits[slot] or (None, None)
+                if match.group(2) == "Min":
+                    low_limit = int(match.group(3))
+                else:
+                    high_limit = int(match.group(3))
+                # Min arrives before Max; an unknown half stays open until then
+                self.limits[slot] = (low_limit if low_limit is not None else -2**31,
+                                     high_limit if high_limit is not None else 2**31)
+                return
+            match = _FOUND_RE.match(response)
+            if match:
+                # The routine finds the maximum last and leaves the motor there
+                low_limit, high_limit = int(match.group(2)), int(match.group(3))
+                slot = int(match.group(1)) - 1
+                self.limits[slot] = (low_limit, high_limit)
+                self.positions[slot] = (high_limit, high_limit)
+
+    def stats(self):
+        return {
+            "preflight_enabled": self.enabled,
+            "moves_checked": self.moves_checked,
+            "moves_rejected_before_send": self.moves_rejected,
+            "firmware_blocks": self.firmware_blocks,
+            "position_fixes": self.position_fixes,
+        }
+
+    def summary(self):
+        known = ", ".join(f"{name} in {self.positions[slot]} limits {self.limits[slot]}"
+                          for slot, (name, _, _) in enumerate(LIMITED_MOTORS))
+        return (f"checked={self.moves_checked} rejected={self.moves_rejected} (round trips avoided) "
+                f"firmware_blocks={self.firmware_blocks} | {known}")
@@ -0,0 +1,181 @@
+import threading
+import time
+from collections import deque
+
+import config
+from command_codec import encode_ping, PONG_REPLY, VERBOSE_REPLY, TOGGLE_VERBOSE_COMMAND
+from latency_histogram import LatencyHistogram
+
+
+class LinkHeartbeat:
+    """
+    Periodic round-trip probe over the command link. Each probe is a PING
+    (answered by PONG <token>) or, for firmware without PING, a
+    TOGGLE_VERBOSE pair (two "Verbose mode is now" lines, mode unchanged).
+    Only mode "toggle_verbose", or "auto" after fallback_misses PINGs in a
+    row without any PONG ever, sends the pairs: a probe can go unanswered
+    while the board reads a long line or runs FIND_LIMITS.
+
+    RTTs go into a cumulative histogram and a rolling window. The link is
+    reported degraded (link_callback(True, reason)) when the rolling p90 RTT
+    exceeds degraded_rtt_s or degraded_misses probes in a row go unanswered,
+    which usually happens well before a write fails and the E-stop path runs.
+    It is reported healthy again after the next good probe.
+
+    A probe costs the board ~10 ms per character to read, in front of the
+    next move. No probe is sent when a move was acknowledged within the last
+    interval (that already shows the link is alive), and a probe still
+    unanswered is added to SerialHandler.move_interval_s().
+    """
+    def __init__(self, serial_handler, link_callback=None, log_callback=None, mode=config.HEARTBEAT_MODE,
+                 interval_s=config.HEARTBEAT_INTERVAL_S, timeout_s=config.HEARTBEAT_TIMEOUT_S,
+                 window=config.HEARTBEAT_WINDOW, degraded_rtt_s=config.LINK_DEGRADED_RTT_S,
+                 degraded_misses=config.LINK_DEGRADED_MISSES, fallback_misses=config.HEARTBEAT_FALLBACK_MISSES):
+        self.serial_handler = serial_handler
+        self.link_callback = link_callback
+        self.log = log_callback or (lambda message, level="info", **kwargs: print(f"LOG ({level}): {message}"))
+        self.mode = mode
+        self.interval_s = interval_s
+        self.timeout_s = timeout_s
+        self.degraded_rtt_s = degraded_rtt_s
+        self.degraded_misses = degraded_misses
+        self.fallback_misses = fallback_misses
+
+        self.rtt_histogram = LatencyHistogram("link_rtt")
+        self.recent_rtts = deque(maxlen=window)
+        self.probes_sent = 0
+        self.probes_missed = 0
+        self.degraded = False
+        self.active_mode = None
+
+        self._lock = threading.Lock()
+        self._expect = None # Reply prefix the current probe is waiting for
+        self._replies_needed = 0
+        self._reply_time = 0.0
+        self._reply_event = threading.Event()
+        self._probe_chars = 0 # Characters of the probe waiting for its reply
+        self._token = 0
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self.mode == "off" or (self._thread and self._thread.is_alive()):
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+        self._reply_event.set()
+        if self._thread and self._thread.is_alive() and self._thread is not threading.current_thread():
+            self._thread.join(timeout=1)
+        self._thread = None
+
+    def rolling_percentile(self, p):
+        """Percentile (0-100) of the RTTs in the rolling window, or None."""
+        rtts = sorted(self.recent_rtts)
+        if not rtts:
+            return None
+        return rtts[min(len(rtts) - 1, int(len(rtts) * p / 100.0))]
+
+    def _run(self):
+        self.active_mode = "toggle_verbose" if self.mode == "toggle_verbose" else "ping"
+        misses = 0
+        while not self._stop_event.wait(self.interval_s):
+            last_ack = self.serial_handler.last_ack_time
+            if last_ack is not None and time.perf_counter() - last_ack < self.interval_s:
+                misses = 0 # Moves are being acknowledged; a probe would only delay the next one
+                continue
+            rtt = self._probe(self.active_mode)
+            if self._stop_event.is_set():
+                break
+            if rtt is None:
+                misses += 1
+                self.probes_missed += 1
+                if (self.mode == "auto" and self.active_mode == "ping" and not self.rtt_histogram.count
+                        and misses >= self.fallback_misses):
+                    self.active_mode = "toggle_verbose"
+                    misses = 0
+                    self.log(f"Heartbeat: no PONG for {self.fallback_misses} probes; timing TOGGLE_VERBOSE pairs instead.",
+                             level="warning")
+                    continue
+                if misses >= self.degraded_misses:
+                    self._set_degraded(True, f"{misses} heartbeats unanswered (timeout {self.timeout_s:.1f} s)")
+                continue
+
+            misses = 0
+            self.rtt_histogram.record(rtt)
+            self.recent_rtts.append(rtt)
+            p90 = self.rolling_percentile(90)
+            if p90 > self.degraded_rtt_s:
+                self._set_degraded(True, f"rolling p90 RTT {p90 * 1000:.0f} ms")
+            elif self.degraded:
+                self._set_degraded(False, f"RTT back to {rtt * 1000:.0f} ms")
+
+    def _probe(self, mode):
+        """Sends one probe and returns its RTT in seconds, or None if it was not answered in time."""
+        with self._lock:
+            self._reply_event.clear()
+            if mode == "ping":
+                self._token = (self._token + 1) % 100000
+                self._expect = f"{PONG_REPLY} {self._token}"
+                self._replies_needed = 1
+                commands = (encode_ping(self._token),)
+            else:
+                self._expect = VERBOSE_REPLY
+                self._replies_needed = 2
+                commands = (TOGGLE_VERBOSE_COMMAND, TOGGLE_VERBOSE_COMMAND)
+            self._probe_chars = sum(len(command) + len(self.serial_handler.line_ending) for command in commands)
+        self.probes_sent += 1
+        started = time.perf_counter()
+        for command in commands:
+            if not self.serial_handler.send_command(command):
+                self._expect, self._probe_chars = None, 0
+                return None # A failed write goes through the serial error / E-stop path
+        answered = self._reply_event.wait(self.timeout_s)
+        with self._lock:
+            self._expect = None
+            self._probe_chars = 0
+            if not answered or self._replies_needed:
+                return None
+            return self._reply_time - started
+
+    def on_response(self, response):
+        """
+        Called by the serial reader for every line. Returns True if the line
+        belongs to the heartbeat (it is then kept out of the console).
+        """
+        expect = self._expect
+        if expect is None:
+            # Late answers to a probe that already timed out
+            return response.startswith(PONG_REPLY + " ")
+        if not response.startswith(expect):
+            return response.startswith(PONG_REPLY + " ")
+        with self._lock:
+            if self._expect is None or self._replies_needed == 0:
+                return True
+            self._replies_needed -= 1
+            if self._replies_needed == 0:
+                self._reply_time = time.perf_counter()
+                self._probe_chars = 0
+                self._reply_event.set()
+        return True
+
+    def outstanding_chars(self):
+        """Characters of a probe the board may still be reading (0 once it has answered)."""
+        return self._probe_chars
+
+    def _set_degraded(self, degraded, reason):
+        if degraded == self.degraded:
+            return
+        self.degraded = degraded
+        if self.link_callback:
+            self.link_callback(degraded, reason)
+
+    def summary(self):
+        p50 = self.rolling_percentile(50)
+        p99 = self.rolling_percentile(99)
+        rolling = f"rolling p50={p50 * 1000:.0f} ms p99={p99 * 1000:.0f} ms" if p50 is not None else "no replies"
+        return (f"{self.active_mode or self.mode}: sent={self.probes_sent} missed={self.probes_missed} "
+                f"{rolling} degraded={self.degraded}")
@@ -0,0 +1,318 @@
+"""
+Reconstructs moves from elbow_ctrl_log_*.txt files (and the structured
+.jsonl / .elog session logs) and measures them.
+
+For every MOVE_ALL_MOTORS the verbose firmware echoed, one row is built
+from the host's send line and the firmware's Received Command, Step 1-6
+and SyncWrite lines. Sends are paired with echoes in order; a
+(re)connection or E-stop forgets sends still waiting for one. Phase
+durations are taken between those lines:
+  fw_received  host send        -> "Received Command" read back
+  syncread     "Step 1"         -> "> Success. All motors responded."
+  parse        "Step 2"         -> "Step 4" (parsing and mapping the deltas)
+  safety       "Step 4"         -> "> Success. Path is clear." / PRE-MOVE CHECK FAILED
+  syncwrite    "Step 6"         -> "> [SyncWrite] Success" / Fail
+  ack          host send        -> "> [SyncWrite] Success" / Fail
+Times are when the host logged each line, so their resolution is that of
+the serial reader: logs written before the reader drained every waiting
+line per poll show each firmware line about 0.1 s after the previous one.
+
+    python log_analyzer.py [files or globs ...] [--npz moves.npz] [--csv moves.csv] [--jobs N]
+
+With no files, every log in the logs folder is read. Text files are
+scanned through mmap with one compiled regex, so a month of logs takes
+seconds.
+"""
+import argparse
+import csv
+import glob
+import math
+import mmap
+import os
+import re
+import sys
+import time
+from collections import deque
+from datetime import datetime
+
+import numpy as np
+
+from log_writer import read_records
+
+LOGS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "logs")
+DEFAULT_PATTERNS = ("elbow_ctrl_log_*.txt", "elbow_ctrl_session_*.jsonl", "elbow_ctrl_session_*.elog")
+
+# Raw per-move times (NaN when the line was not seen), in firmware order
+TIME_COLUMNS = ("t_send", "t_received", "t_step1", "t_syncread_ok", "t_step2", "t_step4",
+                "t_safety_done", "t_step5", "t_step6", "t_done")
+# name: (start column, end column)
+PHASES = {
+    "fw_received": ("t_send", "t_received"),
+    "syncread": ("t_step1", "t_syncread_ok"),
+    "parse": ("t_step2", "t_step4"),
+    "safety": ("t_step4", "t_safety_done"),
+    "syncwrite": ("t_step6", "t_done"),
+    "ack": ("t_send", "t_done"),
+}
+OUTCOME_DONE, OUTCOME_BLOCKED, OUTCOME_FAILED, OUTCOME_INCOMPLETE = 0, 1, 2, 3
+OUTCOME_NAMES = ("done", "blocked", "failed", "incomplete")
+MOTOR_COUNT = 8
+SEND_MERGE_S = 0.05 # A "Command:" line this soon after a "Joint Move:" line is the same move
+
+_T = {name: i for i, name in enumerate(TIME_COLUMNS)}
+_STEP_COLUMNS = {b"1": _T["t_step1"], b"2": _T["t_step2"], b"4": _T["t_step4"], b"5": _T["t_step5"], b"6": _T["t_step6"]}
+
+# The messages that matter, with the event as the last named group that matched
+_MESSAGE_PATTERN = (
+    r"(?:(?P<intent>Joint Move:|Coordinated Step Move:|Individual Motor Step:)"
+    r"|(?P<reset>Connected to |Disconnected|! E-STOP)"
+    r"|Command: (?P<command>MOVE_ALL_MOTORS:[-0-9,]+)"
+    r"|Arduino: (?:Received Command: (?P<received>MOVE_ALL_MOTORS:[-0-9,]*)"
+    r"|Step (?P<step>[1-6]):"
+    r"|> Success\. (?P<success>All|Path)"
+    r"|(?P<done>> \[SyncWrite\] Success)"
+    r"|(?P<failed>> \[SyncWrite\] Fail|> ERROR)"
+    r"|(?P<blocked>> PRE-MOVE CHECK FAILED)))"
+)
+_TEXT_LINE_RE = re.compile(rb"^\[(\d\d:\d\d:\d\d)\.(\d\d\d)\] \S\S " + _MESSAGE_PATTERN.encode(), re.M)
+_MESSAGE_RE = re.compile(_MESSAGE_PATTERN.encode())
+_FILE_DATE_RE = re.compile(r"(\d{4}-\d\d-\d\d)_\d\d-\d\d-\d\d")
+
+
+class _MoveBuilder:
+    """Turns the (time, event, value) stream of one file into move rows."""
+    def __init__(self, file_index, columns):
+        self.file_index = file_index
+        self.columns = columns
+        self.pending_sends = deque() # [time, command or None], oldest first
+        self.current = None
+        self.unacknowledged_sends = 0
+
+    def event(self, t, kind, value):
+        # Most frequent first: a verbose move is 5 Step lines, 2 Success lines, 1 echo, 1 result
+        if kind == "step":
+            if self.current is not None:
+                column = _STEP_COLUMNS.get(value)
+                if column is not None:
+                    self.current[0][column] = t
+        elif kind == "success":
+            if self.current is not None:
+                self.current[0][_T["t_syncread_ok"] if value == b"All" else _T["t_safety_done"]] = t
+        elif kind == "intent":
+            self.pending_sends.append([t, None])
+        elif kind == "command":
+            last = self.pending_sends[-1] if self.pending_sends else None
+            if last is not None and last[1] is None and t - last[0] < SEND_MERGE_S:
+                last[0], last[1] = t, value
+            else:
+                self.pending_sends.append([t, value])
+        elif kind == "reset":
+            # A new connection resets the board; nothing sent before it will be answered
+            self._finish(OUTCOME_INCOMPLETE)
+            self.unacknowledged_sends += len(self.pending_sends)
+            self.pending_sends.clear()
+        elif kind == "received":
+            self._finish(OUTCOME_INCOMPLETE)
+            self._start(t, value)
+        elif self.current is None:
+            return # Firmware output before the first echoed command of the file
+        elif kind == "done":
+            self.current[0][_T["t_done"]] = t
+            self._finish(OUTCOME_DONE)
+        elif kind == "blocked":
+            self.current[0][_T["t_safety_done"]] = t
+            self._finish(OUTCOME_BLOCKED)
+        elif kind == "failed":
+            self.current[0][_T["t_done"]] = t
+            self._finish(OUTCOME_FAILED)
+
+    def _start(self, t, command):
+        times = [math.nan] * len(TIME_COLUMNS)
+        times[_T["t_received"]] = t
+        # The firmware answers in order; sends it never echoed (quiet mode, lost lines) are skipped
+        while self.pending_sends:
+            sent, sent_command = self.pending_sends.popleft()
+            if sent <= t and (sent_command is None or sent_command == command):
+                times[_T["t_send"]] = sent
+                break
+            self.unacknowledged_sends += 1
+        try:
+            steps = [int(v) for v in command.split(b":", 1)[1].split(b",")]
+        except ValueError:
+            steps = []
+        if len(steps) != MOTOR_COUNT:
+            steps = [0] * MOTOR_COUNT
+        self.current = (times, steps)
+
+    def _finish(self, outcome):
+        if self.current is None:
+            return
+        times, steps = self.current
+        self.current = None
+        columns = self.columns
+        columns["file_index"].append(self.file_index)
+        columns["outcome"].append(outcome)
+        columns["times"].append(times)
+        columns["steps"].append(steps)
+
+    def close(self):
+        self._finish(OUTCOME_INCOMPLETE)
+        self.unacknowledged_sends += len(self.pending_sends)
+
+
+def _day_start(path):
+    """Local midnight of the date in the file name, or of the file's modification time."""
+    match = _FILE_DATE_RE.search(os.path.basename(path))
+    day = datetime.strptime(match.group(1), "%Y-%m-%d") if match else datetime.fromtimestamp(os.path.getmtime(path))
+    return day.replace(hour=0, minute=0, second=0, microsecond=0).timestamp()
+
+
+def _scan_text(path, builder):
+    day = _day_start(path)
+    last_tod = 0.0
+    lines = 0
+    seconds = {} # "HH:MM:SS" -> seconds since midnight; lines come many per second
+    event = builder.event
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return 0
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            for m in _TEXT_LINE_RE.finditer(data):
+                hms, ms = m.group(1, 2)
+                second = seconds.get(hms)
+                if second is None:
+                    h, mi, s = hms.split(b":")
+                    second = seconds[hms] = int(h) * 3600 + int(mi) * 60 + int(s)
+                tod = second + int(ms) / 1000.0
+                if tod < last_tod - 43200:
+                    day += 86400 # Past midnight
+                last_tod = tod
+                kind = m.lastgroup
+                event(day + tod, kind, m.group(kind))
+                lines += 1
+    return lines
+
+
+def _scan_records(path, builder):
+    lines = 0
+    for ts, level, source, message, cmd_id in read_records(path):
+        m = _MESSAGE_RE.match(message.encode("utf-8", "replace"))
+        if m is not None and ts is not None:
+            kind = m.lastgroup
+            builder.event(ts, kind, m.group(kind))
+            lines += 1
+    return lines
+
+
+def analyze_file(args):
+    """Scans one log. Returns (column lists, matched lines, unacknowledged sends)."""
+    file_index, path = args
+    columns = {"file_index": [], "outcome": [], "times": [], "steps": []}
+    builder = _MoveBuilder(file_index, columns)
+    scan = _scan_text if path.endswith(".txt") else _scan_records
+    lines = scan(path, builder)
+    builder.close()
+    return columns, lines, builder.unacknowledged_sends
+
+
+def analyze(paths, jobs=1):
+    """Scans the logs (in parallel with jobs > 1) and returns the move table as NumPy arrays."""
+    work = list(enumerate(paths))
+    if jobs > 1 and len(work) > 1:
+        from multiprocessing import Pool
+        with Pool(min(jobs, len(work))) as pool:
+            parts = pool.map(analyze_file, work, chunksize=max(1, len(work) // (jobs * 4)))
+    else:
+        parts = [analyze_file(item) for item in work]
+
+    merged = {"file_index": [], "outcome": [], "times": [], "steps": []}
+    lines = unacknowledged = 0
+    for columns, file_lines, file_unacknowledged in parts:
+        for key, values in columns.items():
+            merged[key].extend(values)
+        lines += file_lines
+        unacknowledged += file_unacknowledged
+
+    times = np.array(merged["times"], dtype=np.float64).reshape(-1, len(TIME_COLUMNS))
+    table = {
+        "files": np.array(paths),
+        "file_index": np.array(merged["file_index"], dtype=np.int32),
+        "outcome": np.array(merged["outcome"], dtype=np.int8),
+        "steps": np.array(merged["steps"], dtype=np.int32).reshape(-1, MOTOR_COUNT),
+    }
+    for i, name in enumerate(TIME_COLUMNS):
+        table[name] = times[:, i]
+    for name, (start, end) in PHASES.items():
+        table[name] = table[end] - table[start]
+    table["matched_lines"] = np.int64(lines)
+    table["unacknowledged_sends"] = np.int64(unacknowledged)
+    return table
+
+
+def write_csv(table, filepath):
+    files = table["files"]
+    header = ["file", "outcome", *TIME_COLUMNS, *PHASES, *(f"step_{i}" for i in range(MOTOR_COUNT))]
+    columns = [table[name] for name in (*TIME_COLUMNS, *PHASES)]
+    with open(filepath, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        for row in range(len(table["outcome"])):
+            writer.writerow([os.path.basename(files[table["file_index"][row]]), OUTCOME_NAMES[table["outcome"][row]],
+                             *(f"{c[row]:.3f}" if not math.isnan(c[row]) else "" for c in columns),
+                             *table["steps"][row]])
+
+
+def summary_lines(table):
+    outcomes = np.bincount(table["outcome"], minlength=len(OUTCOME_NAMES))
+    lines = [f"{len(table['outcome'])} moves in {len(table['files'])} files: "
+             + ", ".join(f"{name}={count}" for name, count in zip(OUTCOME_NAMES, outcomes))
+             + f"; sends never echoed: {int(table['unacknowledged_sends'])}"]
+    for name in PHASES:
+        values = table[name][~np.isnan(table[name])]
+        if values.size:
+            p50, p90, p99 = np.percentile(values, (50, 90, 99)) * 1000
+            lines.append(f"  {name:12s} n={values.size:6d} p50={p50:7.0f} ms p90={p90:7.0f} ms "
+                         f"p99={p99:7.0f} ms max={values.max() * 1000:7.0f} ms")
+        else:
+            lines.append(f"  {name:12s} n=     0")
+    return lines
+
+
+def find_logs(patterns):
+    paths = []
+    for pattern in patterns or [os.path.join(LOGS_DIR, p) for p in DEFAULT_PATTERNS]:
+        matches = sorted(glob.glob(pattern))
+        paths.extend(matches if matches else ([pattern] if os.path.isfile(pattern) else []))
+    return paths
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Per-move phase timing from elbow control logs.")
+    parser.add_argument("paths", nargs="*", help="Log files or glob patterns (default: everything in logs/)")
+    parser.add_argument("--npz", help="Write the move table as a NumPy .npz (one array per column)")
+    parser.add_argument("--csv", help="Write the move table as CSV")
+    parser.add_argument("--jobs", type=int, default=1, help="Scan files in this many processes")
+    args = parser.parse_args(argv)
+
+    paths = find_logs(args.paths)
+    if not paths:
+        print("No log files found.")
+        return 1
+    started = time.perf_counter()
+    table = analyze(paths, args.jobs)
+    elapsed = time.perf_counter() - started
+    size_mb = sum(os.path.getsize(p) for p in paths) / 1e6
+    for line in summary_lines(table):
+        print(line)
+    print(f"Scanned {size_mb:.1f} MB ({int(table['matched_lines'])} matching lines) in {elapsed:.2f} s")
+    if args.npz:
+        np.savez_compressed(args.npz, **table)
+        print(f"Move table written to {args.npz}")
+    if args.csv:
+        write_csv(table, args.csv)
+        print(f"Move table written to {args.csv}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,83 @@
+import tkinter as tk
+from collections import deque
+
+import config
+from log_writer import LEVEL_ICONS
+
+
+class RingLogConsole:
+    """
+    Capped front-end for the OUTPUT_LOG text widget.
+
+    The last `max_lines` records are kept in a ring buffer. Records are queued
+    from any thread and inserted by the Tk thread in one batch per flush, and
+    the widget is trimmed in bulk once it is `trim_slack` lines over the cap,
+    so the cost of a log call does not grow with the session length.
+    """
+    def __init__(self, root, text_widget, max_lines=config.LOG_CONSOLE_MAX_LINES,
+                 trim_slack=config.LOG_CONSOLE_TRIM_SLACK, flush_ms=config.LOG_CONSOLE_FLUSH_MS):
+        self.root = root
+        self.text_widget = text_widget
+        self.max_lines = max_lines
+        self.trim_slack = trim_slack
+        self.flush_ms = flush_ms
+
+        self._lines = deque(maxlen=max_lines) # (timestamp, level, message) ring buffer
+        self._pending = deque(maxlen=max_lines) # Records waiting for the next Tk flush
+        self._widget_lines = 0
+        self._flush_job = None
+        self._schedule_flush()
+
+    def append(self, timestamp, level, message):
+        """Queues a record for display. Safe to call from any thread."""
+        self._pending.append((timestamp, level, message))
+
+    def get_text(self):
+        """Returns the buffered records as plain text (bounded by max_lines)."""
+        return "".join(f"[{ts}] {LEVEL_ICONS.get(level, '##')} {msg}\n" for ts, level, msg in list(self._lines))
+
+    def clear(self):
+        self._lines.clear()
+        self._pending.clear()
+        self.text_widget.delete("1.0", tk.END)
+        self._widget_lines = 0
+
+    def stop(self):
+        if self._flush_job is not None:
+            try:
+                self.root.after_cancel(self._flush_job)
+            except tk.TclError:
+                pass
+            self._flush_job = None
+
+    def _schedule_flush(self):
+        self._flush_job = self.root.after(self.flush_ms, self._flush)
+
+    def _flush(self):
+        try:
+            if self._pending and self.text_widget.winfo_exists():
+                self._insert_pending()
+        finally:
+            self._schedule_flush()
+
+    def _insert_pending(self):
+        # Build one insert call with (text, tag) pairs for the whole batch
+        args = []
+        added_lines = 0
+        while self._pending:
+            record = self._pending.popleft()
+            timestamp, level, message = record
+            self._lines.append(record)
+            args.extend((f"[{timestamp}] ", "timestamp", f"{LEVEL_ICONS.get(level, '##')} {message}\n", level))
+            added_lines += message.count("\n") + 1
+
+        self.text_widget.insert(tk.END, *args)
+        self._widget_lines += added_lines
+
+        # Trim in bulk rather than on every insert
+        excess = self._widget_lines - self.max_lines
+        if excess > self.trim_slack:
+            self.text_widget.delete("1.0", f"{excess + 1}.0")
+            self._widget_lines -= excess
+
+        self.text_widget.see(tk.END) # Auto-scroll to the end
@@ -0,0 +1,211 @@
+import os
+import json
+import queue
+import struct
+import threading
+import time
+from datetime import datetime
+
+
+# Icons shown in front of each message, shared by the on-screen console and the file writer
+LEVEL_ICONS = {
+    "info": "##",
+    "sent": ">>",
+    "received": "<<",
+    "error": "!!",
+    "warning": "?!",
+}
+LEVELS = ("info", "sent", "received", "error", "warning") # Index = level code in binary files
+
+# --- Binary record layout ---
+# File starts with BINARY_MAGIC, then one record after another:
+#   <d ts> <I cmd_id> <B level> <B source_len> <H message_len> <source bytes> <message bytes>
+BINARY_MAGIC = b"ELOG1\n"
+BINARY_HEADER = struct.Struct("<dIBBH")
+NO_CMD_ID = 0xFFFFFFFF
+
+FILE_EXTENSIONS = {"text": ".txt", "jsonl": ".jsonl", "binary": ".elog"}
+
+
+def no_log(message, level="info", **kwargs):
+    """Log callback that drops every message (benchmarks, offline replays, tests)."""
+
+
+def format_timestamp(ts):
+    """HH:MM:SS.mmm, matching the OUTPUT_LOG box."""
+    return datetime.fromtimestamp(ts).strftime("%H:%M:%S.%f")[:-3]
+
+
+def format_line(timestamp, level, message):
+    """Formats a log record the same way the OUTPUT_LOG box shows it."""
+    return f"[{timestamp}] {LEVEL_ICONS.get(level, '##')} {message}\n"
+
+
+def _encode_text(ts, level, source, message, cmd_id):
+    return format_line(format_timestamp(ts), level, message).encode("utf-8")
+
+
+def _encode_jsonl(ts, level, source, message, cmd_id):
+    record = {"ts": ts, "level": level, "source": source, "message": message, "cmd_id": cmd_id}
+    return (json.dumps(record, separators=(",", ":")) + "\n").encode("utf-8")
+
+
+def _encode_binary(ts, level, source, message, cmd_id):
+    source_bytes = source.encode("utf-8")[:255]
+    message_bytes = message.encode("utf-8")[:0xFFFF]
+    level_code = LEVELS.index(level) if level in LEVELS else 0
+    header = BINARY_HEADER.pack(ts, NO_CMD_ID if cmd_id is None else cmd_id,
+                                level_code, len(source_bytes), len(message_bytes))
+    return header + source_bytes + message_bytes
+
+
+_ENCODERS = {"text": _encode_text, "jsonl": _encode_jsonl, "binary": _encode_binary}
+
+
+def read_records(path):
+    """
+    Yields (ts, level, source, message, cmd_id) from a file written by StructuredLogWriter.
+    Text files only carry a time of day, so ts is None and source is "log" for them;
+    their level comes back from the icon (text logs written before warnings had
+    their own icon read their warnings as errors).
+    """
+    if path.endswith(FILE_EXTENSIONS["binary"]):
+        with open(path, "rb") as f:
+            data = f.read()
+        if not data.startswith(BINARY_MAGIC):
+            raise ValueError(f"{path} is not an elbow binary log")
+        offset = len(BINARY_MAGIC)
+        while offset + BINARY_HEADER.size <= len(data):
+            ts, cmd_id, level_code, source_len, message_len = BINARY_HEADER.unpack_from(data, offset)
+            offset += BINARY_HEADER.size
+            source = data[offset:offset + source_len].decode("utf-8", "replace")
+            offset += source_len
+            message = data[offset:offset + message_len].decode("utf-8", "replace")
+            offset += message_len
+            yield ts, LEVELS[level_code], source, message, (None if cmd_id == NO_CMD_ID else cmd_id)
+    elif path.endswith(FILE_EXTENSIONS["jsonl"]):
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    r = json.loads(line)
+                    yield r["ts"], r["level"], r["source"], r["message"], r.get("cmd_id")
+    else:
+        icon_levels = {icon: level for level, icon in LEVEL_ICONS.items()}
+        with open(path, "r", encoding="utf-8", errors="replace") as f:
+            for line in f:
+                if line.startswith("[") and "] " in line:
+                    _, rest = line.rstrip("\n").split("] ", 1)
+                    icon, _, message = rest.partition(" ")
+                    yield None, icon_levels.get(icon, "info"), "log", message, None
+
+
+class StructuredLogWriter(threading.Thread):
+    """
+    Always-on background thread that appends log records to rotating files.
+
+    Callers only pay for a queue put; encoding and buffered disk writes happen
+    here. Each record carries (ts, level, source, message, cmd_id) and is
+    written as JSON lines, packed binary, or the legacy text format.
+    """
+    def __init__(self, logs_dir, fmt="jsonl", levels=None, flush_interval=0.5,
+                 rotate_bytes=8 * 1024 * 1024, max_files=None, prefix="elbow_ctrl_session"):
+        super().__init__(daemon=True)
+        if fmt not in _ENCODERS:
+            raise ValueError(f"Unknown log format '{fmt}'. Use one of {sorted(_ENCODERS)}.")
+        self.fmt = fmt
+        self.levels = set(levels) if levels else None # None = keep every level
+        self.flush_interval = flush_interval
+        self.rotate_bytes = rotate_bytes
+        self.max_files = max_files
+        self.logs_dir = logs_dir
+        os.makedirs(logs_dir, exist_ok=True)
+        self._base_name = f"{prefix}_{datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}"
+        self._encode = _ENCODERS[fmt]
+        self._file_index = 0
+        self._written_files = []
+        self.filepath = self._path_for(0)
+
+        self._queue = queue.SimpleQueue()
+        self._stop_event = threading.Event()
+        self._flush_request = threading.Event()
+        self._flushed = threading.Event()
+        self.records_written = 0
+
+    def submit(self, level, message, source="gui", cmd_id=None, ts=None):
+        """Queues a record for writing. Safe to call from any thread."""
+        if self.levels is not None and level not in self.levels:
+            return
+        self._queue.put((time.time() if ts is None else ts, level, source, message, cmd_id))
+
+    def flush(self, timeout=1.0):
+        """Blocks until everything queued so far has reached the file. Returns the current file path."""
+        if self.is_alive():
+            self._flushed.clear()
+            self._flush_request.set()
+            self._queue.put(None) # Wake the writer
+            self._flushed.wait(timeout)
+        return self.filepath
+
+    def stop(self, timeout=2.0):
+        self._stop_event.set()
+        self._queue.put(None)
+        if self.is_alive():
+            self.join(timeout=timeout)
+
+    def _path_for(self, index):
+        suffix = "" if index == 0 else f"_{index:03d}"
+        return os.path.join(self.logs_dir, f"{self._base_name}{suffix}{FILE_EXTENSIONS[self.fmt]}")
+
+    def _open(self):
+        f = open(self.filepath, "ab", buffering=64 * 1024)
+        if self.fmt == "binary" and f.tell() == 0:
+            f.write(BINARY_MAGIC)
+        self._written_files.append(self.filepath)
+        return f
+
+    def _rotate(self, f):
+        f.close()
+        self._file_index += 1
+        self.filepath = self._path_for(self._file_index)
+        if self.max_files and len(self._written_files) >= self.max_files:
+            oldest = self._written_files.pop(0)
+            try:
+                os.remove(oldest)
+            except OSError:
+                pass
+        return self._open()
+
+    def run(self):
+        f = self._open()
+        try:
+            while True:
+                try:
+                    record = self._queue.get(timeout=self.flush_interval)
+                except queue.Empty:
+                    f.flush()
+                    continue
+
+                # Drain whatever else is waiting so one wakeup writes a whole batch
+                batch = [] if record is None else [record]
+                while True:
+                    try:
+                        record = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if record is not None:
+                        batch.append(record)
+                if batch:
+                    f.write(b"".join(self._encode(*r) for r in batch))
+                    self.records_written += len(batch)
+                    if self.rotate_bytes and f.tell() >= self.rotate_bytes:
+                        f = self._rotate(f)
+
+                if self._flush_request.is_set():
+                    f.flush()
+                    self._flush_request.clear()
+                    self._flushed.set()
+                if self._stop_event.is_set():
+                    return
+        finally:
+            f.close()
+            self._flushed.set()
@@ -1,4 +1,8 @@
 # main.py
+from process_stats import ProcessStats
+PROCESS_STATS = ProcessStats() # Created before the heavy imports so startup time includes them
+
+import argparse
 import tkinter as tk
 from tkinter import ttk
 import time # For on_closing delay if needed
@@ -6,9 +10,17 @@ import time # For on_closing delay if needed
 from gui_main_window import ElbowSimulatorGUI
 from serial_handler import SerialHandler
 import config # For app title or other global settings
+from profiler import install_signal_handler
+
 
+def main_app(argv=None):
+    parser = argparse.ArgumentParser(description=config.APP_TITLE)
+    parser.add_argument("--stats-interval", type=float, default=0,
+                        help="Log startup/CPU stats every N seconds, for comparison with elbowd (0 = off)")
+    parser.add_argument("--profile", type=float, default=0, metavar="N",
+                        help="Profile the first N seconds after startup into Python/logs (SIGUSR1 also starts a profile)")
+    args = parser.parse_args(argv)
 
-def main_app():
     root = tk.Tk()
 
     # Attempt to set a modern theme
@@ -24,6 +36,21 @@ def main_app():
     serial_comms = SerialHandler() # Callbacks will be set by GUI
 
     app = ElbowSimulatorGUI(root, serial_handler=serial_comms)
+    install_signal_handler(app.log_writer.logs_dir, app.log_message)
+    if args.profile > 0:
+        root.after_idle(app.start_profile, args.profile)
+
+    if args.stats_interval > 0:
+        # Startup is measured once the first frame has been drawn
+        def report_startup():
+            app.log_message(f"Ready in {PROCESS_STATS.mark_ready() * 1000:.0f} ms.")
+            root.after(int(args.stats_interval * 1000), report_stats)
+
+        def report_stats():
+            app.log_message(f"Stats: {PROCESS_STATS.summary()}")
+            root.after(int(args.stats_interval * 1000), report_stats)
+
+        root.after_idle(report_startup)
 
     def on_closing_main_window():
         app.cleanup_on_exit() # Call the GUI's cleanup method
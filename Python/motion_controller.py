@@ -0,0 +1,186 @@
+import threading
+import time
+import traceback
+
+import config
+from config import MotorIndex
+import batch_steps
+import q1_pl, q2_pl, q3_pl, q4_pl # Joint processors for step calculations
+from command_codec import encode_move_all, encode_move_profiled
+from joint_state import JointState, JOINT_KEYS
+from motion_profile import synchronised_profile
+from profiler import profiled
+
+# ROS/teleop targets are named after the joints; moves are named after the motor pairs
+TARGET_TO_JOINT = {"Q1": "EP", "Q2": "EY", "Q3": "WP", "Q4L": "LJ", "Q4R": "RJ"}
+TARGET_KEYS = tuple(TARGET_TO_JOINT) # Same order as JOINT_KEYS
+
+
+class MotionController:
+    """
+    Turns joint-degree moves into MOVE_ALL_MOTORS commands and keeps the
+    cumulative joint positions in a JointState. Has no Tk dependency, so the
+    GUI and the headless daemon share the same logic; displays read
+    self.state.snapshot() at their own rate.
+    """
+    def __init__(self, serial_handler, log_callback=None):
+        self.serial_handler = serial_handler
+        self.log = log_callback or (lambda message, level="info", **kwargs: print(f"LOG ({level}): {message}"))
+        self.state = JointState()
+        # Moves can come from the Tk thread (buttons) and from input threads (ROS); one at a time
+        self._move_lock = threading.RLock()
+        self._last_move_rejected = False
+
+        self.timing = serial_handler.pipeline_timing
+
+        # (joint name, step function, timing stage) in JOINT_KEYS order
+        self._processors = tuple((name, fn, f"get_steps:{name}") for name, fn in (
+            ("EP", q1_pl.get_steps),
+            ("EY", q2_pl.get_steps),
+            ("WP", q3_pl.get_steps),
+            ("LJ", q4_pl.get_steps_L),
+            ("RJ", q4_pl.get_steps_R),
+        ))
+
+    @property
+    def cumulative_degrees(self):
+        return self.state.as_dict()
+
+    def reset_positions(self):
+        """Resets the cumulative position to the reference pose."""
+        with self._move_lock:
+            self.state.reset()
+
+    def compute_motor_steps(self, joint_deltas):
+        """Sums the per-joint step contributions (deltas in JOINT_KEYS order) into one 8-motor step list."""
+        state = self.state
+        timing = self.timing
+        total_motor_steps = [0] * len(MotorIndex)
+        for i, (joint_name, get_steps_function, stage) in enumerate(self._processors):
+            delta_theta = joint_deltas[i]
+            if delta_theta != 0:
+                try:
+                    started = time.perf_counter()
+                    joint_specific_motor_steps, latest_dir = get_steps_function(
+                        state.angle(i), delta_theta, state.direction(i))
+                    timing.record(stage, time.perf_counter() - started)
+                    state.set_direction(i, latest_dir)
+                    for motor_idx in range(len(total_motor_steps)):
+                        total_motor_steps[motor_idx] += joint_specific_motor_steps[motor_idx]
+                except Exception as e:
+                    self.log(f"  Error in {get_steps_function.__name__} for {joint_name}: {e}", level="error")
+                    self.log(traceback.format_exc(), level="error")
+        return [int(round(s)) for s in total_motor_steps]
+
+    def encode_move(self, motor_steps):
+        """The MOVE_ALL_MOTORS line for a move: with PROFILED_MOVES, every motor timed to arrive together."""
+        if not config.PROFILED_MOVES:
+            return encode_move_all(motor_steps)
+        profile = synchronised_profile(motor_steps)
+        return encode_move_profiled(motor_steps, profile.velocities, profile.accelerations)
+
+    def execute_degree_based_move(self, joint_degree_deltas_input):
+        """
+        Sends one coordinated move from a {joint key: delta degrees} dict.
+        Returns True if the command was written to the link.
+        """
+        joint_deltas = [float(joint_degree_deltas_input.get(key, 0.0)) for key in JOINT_KEYS]
+        return self.execute_joint_deltas(joint_deltas)
+
+    @profiled
+    def execute_joint_deltas(self, joint_deltas, origin=None, only_motors=None):
+        """
+        Same as execute_degree_based_move with deltas already in JOINT_KEYS order.
+        origin is the perf_counter() time the move started (for pipeline timing).
+        only_motors (MotorIndex values) sends just those motors' steps, leaving out
+        the coupling compensation on the others (calibration sweeps).
+        """
+        with self._move_lock:
+            if origin is None:
+                origin = time.perf_counter()
+            final_integer_steps = self.compute_motor_steps(joint_deltas)
+            if only_motors is not None:
+                final_integer_steps = [s if i in only_motors else 0 for i, s in enumerate(final_integer_steps)]
+            blocked = self.serial_handler.limit_guard.check(final_integer_steps)
+            if blocked:
+                # Streams retry every tick; only the first rejection in a row goes to the console
+                self.log(f"Move not sent, the firmware would block it: {blocked}", level="warning",
+                         console=not self._last_move_rejected)
+                self._last_move_rejected = True
+                return False
+            self._last_move_rejected = False
+            encode_started = time.perf_counter()
+            cmd = self.encode_move(final_integer_steps)
+            self.timing.record("encode", time.perf_counter() - encode_started)
+            if not self.serial_handler.send_command(cmd, origin=origin):
+                self.log("Failed to send command.", level="error")
+                return False
+
+            self.log(f"Command: {cmd}", level="sent", cmd_id=self.serial_handler.command_count, console=False)
+            self.state.commit_move(joint_deltas, final_integer_steps)
+            return True
+
+    def apply_target(self, target_positions):
+        """
+        Moves toward an absolute target keyed by Q1/Q2/Q3/Q4L/Q4R (degrees).
+        Joints that are within ROS_MIN_DELTA_DEG of the target are left alone.
+        Returns True if a move was sent.
+        """
+        return self.apply_target_values([target_positions[key] for key in TARGET_KEYS])
+
+    @profiled
+    def apply_target_values(self, target_values):
+        """Same as apply_target with the target already in TARGET_KEYS order."""
+        with self._move_lock:
+            origin = time.perf_counter()
+            angles = self.state.snapshot().angles
+            min_delta = config.ROS_MIN_DELTA_DEG
+            joint_deltas = [0.0] * len(JOINT_KEYS)
+            any_move = False
+            for i, target in enumerate(target_values):
+                delta = target - angles[i]
+                # this prevents us from wasting arduino's brain over moves we can't make anyways
+                if abs(delta) >= min_delta:
+                    joint_deltas[i] = delta
+                    any_move = True
+            self.timing.record("deltas", time.perf_counter() - origin)
+            if not any_move:
+                return False
+            return self.execute_joint_deltas(joint_deltas, origin=origin)
+
+    def execute_joint_sequence(self, joint_waypoints, period_ms=0, on_progress=None):
+        """
+        Sends absolute joint targets ((n, 5), JOINT_KEYS order, degrees) as one
+        waypoint sequence (sequence_upload.py), compiled from the current state
+        like consecutive apply_target_values calls without the deadband. Each
+        waypoint is committed to the joint state when the board reports it
+        executed; on_progress(executed, total) is called after that.
+        Returns True if the sequence was sent.
+        """
+        with self._move_lock:
+            snapshot = self.state.snapshot()
+            steps, deltas, directions = batch_steps.compile_path(joint_waypoints, snapshot.angles, snapshot.directions)
+            steps, deltas = steps.tolist(), deltas.tolist()
+            velocities = accelerations = None
+            if config.PROFILED_MOVES:
+                profiles = [synchronised_profile(motor_steps) for motor_steps in steps]
+                velocities = [p.velocities for p in profiles]
+                accelerations = [p.accelerations for p in profiles]
+            committed = [0]
+
+            def commit(executed, total):
+                with self._move_lock:
+                    for i in range(committed[0], executed):
+                        self.state.commit_move(deltas[i], steps[i])
+                    committed[0] = executed
+                    if executed == total:
+                        for i, direction in enumerate(directions.tolist()):
+                            self.state.set_direction(i, int(direction))
+                if on_progress:
+                    on_progress(executed, total)
+
+            if not self.serial_handler.sequence.upload(steps, period_ms, velocities, accelerations, on_progress=commit):
+                return False
+            self.log(f"Sequence: {len(steps)} waypoints, period {period_ms} ms", level="sent",
+                     cmd_id=self.serial_handler.command_count, console=False)
+            return True
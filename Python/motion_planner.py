@@ -0,0 +1,311 @@
+"""
+Segmenting planner: large joint moves and streamed targets become a
+time-parameterised joint trajectory, sent as a stream of short moves.
+
+Without it a 90 deg ROS jump or an 800-step jog goes out as one relative
+command: the motors run it in a straight line in step space, the coupled
+cables only meet the coupling models at its two ends, and nothing else can
+be sent until it is done. Here TrajectoryPlanner moves a joint-space pose
+toward the queued goals with a trapezoidal speed profile (an S-curve with
+PLANNER_JERK_TIME_S) within JOINT_MAX_VELOCITY_DEG_S /
+JOINT_MAX_ACCELERATION_DEG_S2, and SegmentStreamer sends the pose the
+trajectory will have reached by the time the link has absorbed each move.
+Each segment goes through MotionController, so the coupling compensation
+is computed at the elbow's angle along the way. A new target (or the next
+queued goal, within PLANNER_BLEND_DEG of the current one) is blended in
+from the current velocity instead of stopping first.
+"""
+import math
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+import config
+from joint_state import JOINT_KEYS
+
+ANGLE_RESOLUTION_DEG = 0.01 # JointState keeps angles to 2 decimals; smaller segment deltas are not sent
+_ARRIVED_DEG = 1e-9
+
+
+class TrajectoryPlanner:
+    """
+    Joint-space trajectory generator (JOINT_KEYS order, degrees). No thread
+    and no link: advance(dt) moves its clock on and returns the pose.
+
+    The pose heads for the first queued goal in a straight line, at the
+    highest speed and acceleration the per-joint limits allow in that
+    direction, braking so that it stops on the goal. Once it is within
+    blend_deg of a goal and another goal is queued it moves on to the next
+    one without stopping; the acceleration limit rounds the corner.
+    retarget() replaces the queue (streamed targets) and the velocity carries
+    over, so the path bends toward the new target. jerk_time_s > 0 outputs
+    the moving average of the pose over that time, which turns the
+    trapezoidal speed profile into an S-curve (bounded jerk) and delays the
+    output by half that time.
+    """
+    def __init__(self, start=None, max_velocity=None, max_acceleration=None, blend_deg=config.PLANNER_BLEND_DEG,
+                 jerk_time_s=config.PLANNER_JERK_TIME_S, tick_s=config.PLANNER_TICK_S):
+        self.max_velocity = np.asarray(config.JOINT_MAX_VELOCITY_DEG_S if max_velocity is None else max_velocity, dtype=float)
+        self.max_acceleration = np.asarray(config.JOINT_MAX_ACCELERATION_DEG_S2 if max_acceleration is None
+                                           else max_acceleration, dtype=float)
+        self.blend_deg = blend_deg
+        self.tick_s = tick_s
+        self._window_ticks = max(1, int(round(jerk_time_s / tick_s)))
+        self.goals = deque()
+        self.reset([config.HOME_JOINT_DEGREES] * len(JOINT_KEYS) if start is None else start)
+
+    def reset(self, start):
+        """Stops at `start` with nothing queued."""
+        self.position = np.array(start, dtype=float)
+        self.velocity = np.zeros_like(self.position)
+        self.goals.clear()
+        self.time_s = 0.0
+        self._window = deque([self.position.copy()] * self._window_ticks)
+        self._window_sum = self.position * self._window_ticks
+
+    # --- Goals ---
+    def queue(self, goal):
+        """Appends an absolute goal."""
+        self.goals.append(np.array(goal, dtype=float))
+
+    def queue_delta(self, deltas):
+        """Appends a goal relative to the last queued one (or to the pose)."""
+        base = self.goals[-1] if self.goals else self.position
+        self.goals.append(base + np.asarray(deltas, dtype=float))
+
+    def retarget(self, goal):
+        """Replaces every queued goal with `goal`, keeping the current velocity."""
+        self.goals.clear()
+        self.queue(goal)
+
+    def halt(self):
+        """Drops the goals and brakes to a stop along the current direction."""
+        self.goals.clear()
+        speed = np.abs(self.velocity)
+        if speed.any():
+            stop_s = float(np.max(speed / self.max_acceleration))
+            self.goals.append(self.position + self.velocity * stop_s / 2.0)
+
+    @property
+    def output(self):
+        """The pose sent to the arm (smoothed when jerk_time_s is set)."""
+        return self._window_sum / self._window_ticks
+
+    @property
+    def idle(self):
+        """Nothing queued, stopped, and the smoothed output has caught up."""
+        return not self.goals and not self.velocity.any() and np.allclose(self.output, self.position, atol=_ARRIVED_DEG)
+
+    # --- Clock ---
+    def advance(self, dt):
+        """Moves the clock on by dt seconds (whole ticks) and returns output."""
+        for _ in range(max(0, int(round(dt / self.tick_s)))):
+            self._step(self.tick_s)
+            self.time_s += self.tick_s
+            self._window_sum += self.position - self._window.popleft()
+            self._window.append(self.position.copy())
+        if not self.goals and not self.velocity.any():
+            self._window_sum = np.sum(self._window, axis=0) # Drop accumulated rounding once settled
+        return self.output
+
+    def _direction_limits(self, direction):
+        """Largest speed and acceleration along a unit direction that keep every joint within its limits."""
+        moving = np.abs(direction) > 1e-12
+        return (float(np.min(self.max_velocity[moving] / np.abs(direction[moving]))),
+                float(np.min(self.max_acceleration[moving] / np.abs(direction[moving]))))
+
+    def _step(self, h):
+        while self.goals:
+            error = self.goals[0] - self.position
+            distance = float(np.linalg.norm(error))
+            if len(self.goals) > 1 and distance <= self.blend_deg:
+                self.goals.popleft() # Blend into the next goal
+                continue
+            break
+        else:
+            self.velocity[:] = 0.0
+            return
+        if distance <= _ARRIVED_DEG:
+            self.position = self.goals.popleft()
+            self.velocity[:] = 0.0
+            return
+        direction = error / distance
+        speed_limit, acceleration = self._direction_limits(direction)
+        # Fastest speed from which the pose can still brake onto the goal in whole ticks (no overshoot)
+        brake = acceleration * h
+        speed = min(speed_limit, brake * (math.sqrt(0.25 + 2.0 * distance / (brake * h)) - 0.5), distance / h)
+        change = direction * speed - self.velocity
+        over = np.abs(change) / (self.max_acceleration * h)
+        if over.max() > 1.0:
+            change /= over.max()
+        self.velocity += change
+        self.position = self.position + self.velocity * h
+        if distance / h <= speed_limit and np.allclose(self.velocity, error / h):
+            self.position = self.goals.popleft() # Landed on the goal this tick
+            self.velocity[:] = 0.0
+
+
+def plan_path(start, goals, period_s, planner=None, max_duration_s=600.0):
+    """
+    Poses every period_s from `start` through the queued `goals` until the
+    planner is idle: (n, 5) array, first row after the first period.
+    """
+    planner = planner or TrajectoryPlanner(start)
+    planner.reset(start)
+    for goal in goals:
+        planner.queue(goal)
+    poses = []
+    while not planner.idle and planner.time_s < max_duration_s:
+        poses.append(planner.advance(period_s).copy())
+    return np.array(poses).reshape(-1, len(start))
+
+
+class SegmentStreamer(threading.Thread):
+    """
+    Sends a TrajectoryPlanner as segments through a MotionController. Each
+    segment is the move from the arm's current joint state to the pose the
+    trajectory reaches once the link has absorbed it
+    (serial_handler.move_interval_s(), at least min_segment_s), so segments
+    stay as short as the link allows and streaming never waits for a whole
+    big move. The planner starts from the controller's joint state whenever
+    it has been idle. A segment the controller refuses (limit check, link
+    down) halts the planner.
+    """
+    def __init__(self, motion_controller, serial_handler, log_callback, planner=None,
+                 min_segment_s=config.PLANNER_MIN_SEGMENT_S):
+        super().__init__(daemon=True)
+        self.motion_controller = motion_controller
+        self.serial_handler = serial_handler
+        self.planner = planner or TrajectoryPlanner(motion_controller.state.snapshot().angles)
+        self.min_segment_s = min_segment_s
+        self._log_callback = log_callback
+        self._lock = threading.Lock()
+        self._send_lock = threading.Lock() # Held from planning a segment until it is sent
+        self._wake = threading.Event()
+        self._stop_event = threading.Event()
+        self._clock_origin = None # monotonic() time of planner time 0 while it is running
+
+        self.segments_sent = 0
+        self.segments_refused = 0
+        self.goals_queued = 0
+        self.targets_tracked = 0
+
+    # --- Inputs (any thread) ---
+    def _sync_if_idle(self):
+        if self.planner.idle:
+            self.planner.reset(self.motion_controller.state.snapshot().angles)
+            self._clock_origin = None
+
+    def move_to(self, target_values):
+        """Queues an absolute joint target (degrees, JOINT_KEYS / TARGET_KEYS order)."""
+        with self._lock:
+            self._sync_if_idle()
+            self.planner.queue(target_values)
+            self.goals_queued += 1
+        self._wake.set()
+
+    def move_by(self, joint_deltas):
+        """Queues a move relative to the last queued target (a jog)."""
+        with self._lock:
+            self._sync_if_idle()
+            self.planner.queue_delta(joint_deltas)
+            self.goals_queued += 1
+        self._wake.set()
+
+    def track(self, target_values, min_delta=config.ROS_MIN_DELTA_DEG):
+        """
+        Retargets to the newest streamed target. Returns False (and leaves the
+        plan alone) if no joint differs from the current goal by min_delta.
+        """
+        with self._lock:
+            self._sync_if_idle()
+            planner = self.planner
+            current = planner.goals[-1] if planner.goals else planner.position
+            if np.all(np.abs(np.asarray(target_values, dtype=float) - current) < min_delta):
+                return False
+            planner.retarget(target_values)
+            self.targets_tracked += 1
+        self._wake.set()
+        return True
+
+    def halt(self):
+        """Brakes to a stop and forgets the queued targets."""
+        with self._lock:
+            self.planner.halt()
+        self._wake.set()
+
+    def reset(self, apply=None):
+        """
+        Drops the plan without braking and restarts from the controller's joint
+        state. apply() (e.g. MotionController.reset_positions) runs first, with
+        no segment being planned or sent, so none is computed across the change.
+        """
+        with self._send_lock:
+            if apply:
+                apply()
+            with self._lock:
+                self.planner.reset(self.motion_controller.state.snapshot().angles)
+                self._clock_origin = None
+
+    # --- Segment loop ---
+    def run(self):
+        while not self._stop_event.is_set():
+            with self._lock:
+                idle = self.planner.idle
+            if idle:
+                self._wake.wait(0.1)
+                self._wake.clear()
+                continue
+            interval = max(self.min_segment_s, self.serial_handler.move_interval_s())
+            started = time.monotonic()
+            with self._send_lock:
+                with self._lock:
+                    if self.planner.idle: # Reset since the check above
+                        continue
+                    if self._clock_origin is None:
+                        self._clock_origin = started - self.planner.time_s
+                    pose = self.planner.advance(started + interval - self._clock_origin - self.planner.time_s).copy()
+                if not self._send_segment(pose):
+                    continue
+            self._stop_event.wait(max(self.min_segment_s, self.serial_handler.move_interval_s())
+                                  - (time.monotonic() - started))
+
+    def _send_segment(self, pose):
+        angles = self.motion_controller.state.snapshot().angles
+        deltas = [target - angle for target, angle in zip(pose.tolist(), angles)]
+        deltas = [d if abs(d) >= ANGLE_RESOLUTION_DEG / 2 else 0.0 for d in deltas]
+        if not any(deltas):
+            return True
+        try:
+            sent = self.motion_controller.execute_joint_deltas(deltas)
+        except Exception as e:
+            self._log_callback(f"Error sending planned segment: {e}", level="error")
+            sent = False
+        if sent:
+            self.segments_sent += 1
+            return True
+        self.segments_refused += 1
+        self._log_callback("Planned segment not sent; stopping the planned motion.", level="warning")
+        with self._lock:
+            self.planner.reset(self.motion_controller.state.snapshot().angles)
+            self._clock_origin = None
+        return False
+
+    def stop(self):
+        self._stop_event.set()
+        self._wake.set()
+
+    def stats(self):
+        return {
+            "segments_sent": self.segments_sent,
+            "segments_refused": self.segments_refused,
+            "goals_queued": self.goals_queued,
+            "targets_tracked": self.targets_tracked,
+        }
+
+    def summary(self):
+        s = self.stats()
+        return (f"segments={s['segments_sent']} refused={s['segments_refused']} "
+                f"goals={s['goals_queued']} tracked={s['targets_tracked']}")
@@ -0,0 +1,129 @@
+"""
+Synchronised per-motor motion profiles for MOVE_ALL_MOTORS.
+
+The sketch runs every motor at a fixed Profile Velocity, so in a move where
+EP turns a few steps and the jaw lead screws a few thousand, each motor
+arrives at a different time and the coupled cables are mistensioned on the
+way. Here every moving motor gets its own Profile Velocity and Profile
+Acceleration, proportional to its step count: the motors then move as one
+straight line in motor space and arrive together. The common time is the
+shortest one that keeps every motor within MOTOR_MAX_PROFILE_VELOCITY and
+MOTOR_MAX_PROFILE_ACCELERATION.
+
+Timing follows the Dynamixel velocity-based profile: a trapezoid, or a
+triangle when the move is too short to reach the profile velocity;
+acceleration 0 changes velocity instantly. The registers are integers, so
+values are rounded up: a motor can arrive slightly early, never late.
+"""
+import math
+from collections import namedtuple
+
+import config
+from command_codec import MOVE_ALL_MOTORS_HEADER, decode_move_all
+
+# Per motor in MotorIndex order; duration_s is the latest arrival
+MoveProfile = namedtuple("MoveProfile", "velocities accelerations arrivals_s duration_s")
+
+
+def velocity_steps_per_s(velocity):
+    """Profile Velocity register value in steps/s."""
+    return velocity * config.PROFILE_VELOCITY_UNIT_RPM * config.STEPS_PER_REV / 60.0
+
+
+def acceleration_steps_per_s2(acceleration):
+    """Profile Acceleration register value in steps/s^2."""
+    return acceleration * config.PROFILE_ACCELERATION_UNIT_RPM2 * config.STEPS_PER_REV / 3600.0
+
+
+def move_time_s(steps, velocity, acceleration=0):
+    """Time one motor takes for a move of `steps` at the given register values (velocity 0 = unlimited)."""
+    distance = abs(steps)
+    if distance == 0 or velocity <= 0:
+        return 0.0
+    v = velocity_steps_per_s(velocity)
+    if acceleration <= 0:
+        return distance / v
+    a = acceleration_steps_per_s2(acceleration)
+    if distance >= v * v / a:
+        return distance / v + v / a
+    return 2.0 * math.sqrt(distance / a)
+
+
+def travelled(steps, velocity, acceleration, t):
+    """Signed steps a motor has covered t seconds into its move."""
+    distance = abs(steps)
+    if distance == 0 or velocity <= 0 or t >= move_time_s(steps, velocity, acceleration):
+        return steps
+    if t <= 0:
+        return 0
+    v = velocity_steps_per_s(velocity)
+    if acceleration <= 0:
+        covered = v * t
+    else:
+        a = acceleration_steps_per_s2(acceleration)
+        total = move_time_s(steps, velocity, acceleration)
+        ramp = min(v / a, total / 2.0) # Time spent accelerating (and decelerating)
+        if t <= ramp:
+            covered = a * t * t / 2.0
+        elif t <= total - ramp:
+            covered = a * ramp * ramp / 2.0 + a * ramp * (t - ramp)
+        else:
+            left = total - t
+            covered = distance - a * left * left / 2.0
+    return math.copysign(min(covered, distance), steps)
+
+
+def _register(value, limit):
+    """Smallest register value >= value (tolerating float noise), at least 1 and at most limit."""
+    return max(1, min(int(limit), math.ceil(value - 1e-9)))
+
+
+def synchronised_profile(motor_steps, max_velocities=None, max_accelerations=None):
+    """
+    Profile Velocity and Acceleration per motor so that every motor of the
+    move finishes together in the least time the limits allow. Stationary
+    motors get 0. A max acceleration of 0 means no acceleration limit (the
+    motor changes velocity instantly, as with the sketch's defaults).
+    """
+    max_velocities = config.MOTOR_MAX_PROFILE_VELOCITY if max_velocities is None else max_velocities
+    max_accelerations = config.MOTOR_MAX_PROFILE_ACCELERATION if max_accelerations is None else max_accelerations
+    moving = [i for i, steps in enumerate(motor_steps) if steps]
+    count = len(motor_steps)
+    velocities, accelerations, arrivals = [0] * count, [0] * count, [0.0] * count
+    if not moving:
+        return MoveProfile(velocities, accelerations, arrivals, 0.0)
+    # Normalised limits of the shared path s(t), 0 -> 1: every motor covers s * its steps
+    speed = min(velocity_steps_per_s(max_velocities[i]) / abs(motor_steps[i]) for i in moving)
+    limited = [i for i in moving if max_accelerations[i] > 0]
+    rate = min((acceleration_steps_per_s2(max_accelerations[i]) / abs(motor_steps[i]) for i in limited), default=None)
+    for i in moving:
+        distance = abs(motor_steps[i])
+        velocities[i] = _register(speed * distance / velocity_steps_per_s(1), max_velocities[i])
+        if rate is not None and max_accelerations[i] > 0:
+            accelerations[i] = _register(rate * distance / acceleration_steps_per_s2(1), max_accelerations[i])
+        elif rate is not None:
+            accelerations[i] = 0 # No limit configured: instant velocity change, still on time
+        arrivals[i] = move_time_s(motor_steps[i], velocities[i], accelerations[i])
+    return MoveProfile(velocities, accelerations, arrivals, max(arrivals))
+
+
+def default_profile(motor_steps):
+    """The profile the sketch runs every move at: fixed velocities, no acceleration ramp."""
+    velocities = [v if steps else 0 for v, steps in zip(config.MOTOR_MAX_PROFILE_VELOCITY, motor_steps)]
+    accelerations = [0] * len(motor_steps)
+    arrivals = [move_time_s(steps, v) for steps, v in zip(motor_steps, velocities)]
+    return MoveProfile(velocities, accelerations, arrivals, max(arrivals, default=0.0))
+
+
+def command_duration_s(command):
+    """Motion time of a profiled MOVE_ALL_MOTORS line, 0 for a plain one (or anything else)."""
+    if not command.startswith(MOVE_ALL_MOTORS_HEADER):
+        return 0.0
+    try:
+        steps, velocities, accelerations = decode_move_all(command)
+    except ValueError:
+        return 0.0
+    if velocities is None:
+        return 0.0
+    accelerations = accelerations or [0] * len(steps)
+    return max((move_time_s(s, v or 0, a or 0) for s, v, a in zip(steps, velocities, accelerations) if v), default=0.0)
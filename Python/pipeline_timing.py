@@ -0,0 +1,48 @@
+import time
+
+from latency_histogram import LatencyHistogram, export_histograms
+
+# Stages of one move, in pipeline order. Each is the time between two timestamps:
+#   target_queued   source timestamp of the target -> picked by the scheduler (wall clock)
+#   deltas          target picked -> joint deltas computed
+#   get_steps:<J>   one q*_pl get_steps call for joint J
+#   encode          steps summed -> MOVE_ALL_MOTORS line built
+#   write           serial write + flush
+#   fw_received     write done -> firmware "Received Command" line read back (verbose firmware)
+#   fw_syncwrite    "Received Command" -> "[SyncWrite] Success" read back
+#   end_to_end      start of the move on the host (target picked / button) -> SyncWrite success
+PIPELINE_STAGES = (
+    "target_queued", "deltas",
+    "get_steps:EP", "get_steps:EY", "get_steps:WP", "get_steps:LJ", "get_steps:RJ",
+    "encode", "write", "fw_received", "fw_syncwrite", "end_to_end",
+)
+
+
+class PipelineTiming:
+    """
+    One latency histogram per move pipeline stage. Stages are recorded by
+    the thread that sees them (move thread, serial reader); timestamps are
+    time.perf_counter() except target_queued, which starts from the source's
+    wall-clock stamp. Set enabled=False to skip the bookkeeping.
+    """
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self.histograms = {stage: LatencyHistogram(stage) for stage in PIPELINE_STAGES}
+        self.started = time.time()
+
+    def record(self, stage, seconds):
+        if self.enabled:
+            self.histograms[stage].record(seconds)
+
+    def reset(self):
+        for histogram in self.histograms.values():
+            histogram.reset()
+        self.started = time.time()
+
+    def summary_lines(self):
+        """One line per stage that has samples, in pipeline order."""
+        return [h.summary() for h in self.histograms.values() if h.count]
+
+    def export(self, filepath):
+        return export_histograms(list(self.histograms.values()), filepath,
+                                 extra={"since": self.started, "stages": list(PIPELINE_STAGES)})
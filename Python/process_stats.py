@@ -0,0 +1,40 @@
+import time
+
+
+class ProcessStats:
+    """
+    Measures startup time and CPU use of the current process, so the GUI and
+    the headless daemon can be compared with the same numbers.
+    Create it as early as possible in the entry point.
+    """
+    def __init__(self):
+        self._t0 = time.perf_counter()
+        self._ready_at = None
+        self._last_wall = self._t0
+        self._last_cpu = time.process_time()
+
+    def mark_ready(self):
+        """Records the moment the application is ready to accept commands."""
+        self._ready_at = time.perf_counter()
+        self._last_wall = self._ready_at
+        self._last_cpu = time.process_time()
+        return self.startup_seconds()
+
+    def startup_seconds(self):
+        if self._ready_at is None:
+            return None
+        return self._ready_at - self._t0
+
+    def sample_cpu_percent(self):
+        """CPU use (% of one core) since the previous sample or since mark_ready()."""
+        now_wall = time.perf_counter()
+        now_cpu = time.process_time()
+        elapsed = now_wall - self._last_wall
+        percent = 100.0 * (now_cpu - self._last_cpu) / elapsed if elapsed > 0 else 0.0
+        self._last_wall, self._last_cpu = now_wall, now_cpu
+        return percent
+
+    def summary(self):
+        startup = self.startup_seconds()
+        startup_str = f"{startup * 1000:.0f} ms" if startup is not None else "n/a"
+        return f"startup {startup_str}, CPU {self.sample_cpu_percent():.1f}% (total {time.process_time():.2f} s)"
@@ -0,0 +1,164 @@
+"""
+On-demand profiling of the running driver, without external tools.
+
+A ProfileSession runs for a fixed time and writes to the logs folder:
+  profile_<time>.pstats     cProfile data for the functions marked @profiled
+                            (moves, target scheduling, serial reader lines),
+                            all threads merged; open with pstats or snakeviz.
+  profile_<time>.collapsed  stack samples of every thread, one
+                            "thread;frame;frame... count" line per stack, for
+                            flamegraph.pl / speedscope.
+
+Start one from the GUI ([PROFILE]), with --profile N on main.py / elbowd.py,
+or by sending SIGUSR1 to the process (POSIX).
+"""
+import cProfile
+import functools
+import os
+import pstats
+import signal
+import sys
+import threading
+import time
+from collections import Counter
+
+import config
+
+_active_session = None
+_session_lock = threading.Lock()
+
+
+def profiled(fn):
+    """Marks a function for cProfile while a session is running; costs one global lookup otherwise."""
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        session = _active_session
+        if session is None:
+            return fn(*args, **kwargs)
+        return session.run(fn, args, kwargs)
+    return wrapper
+
+
+def start_profile(logs_dir, duration_s=config.PROFILE_DURATION_S, log_callback=None):
+    """Starts a session unless one is running. Returns the session, or None."""
+    global _active_session
+    with _session_lock:
+        if _active_session is not None:
+            if log_callback:
+                log_callback("A profile is already running.", level="warning")
+            return None
+        session = ProfileSession(logs_dir, duration_s, log_callback)
+        _active_session = session
+    session.start()
+    return session
+
+
+class ProfileSession:
+    def __init__(self, logs_dir, duration_s, log_callback=None, sample_interval_s=config.PROFILE_SAMPLE_INTERVAL_S):
+        self.logs_dir = logs_dir
+        self.duration_s = duration_s
+        self.sample_interval_s = sample_interval_s
+        self.log = log_callback or (lambda message, level="info", **kwargs: print(f"LOG ({level}): {message}"))
+        self.pstats_path = None
+        self.collapsed_path = None
+
+        self._profilers = []
+        self._profilers_lock = threading.Lock()
+        self._local = threading.local()
+        self._samples = Counter()
+        self._sample_count = 0
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    # --- cProfile side (called through @profiled) ---
+    def run(self, fn, args, kwargs):
+        local = self._local
+        profiler = getattr(local, "profiler", None)
+        if profiler is None:
+            profiler = local.profiler = cProfile.Profile()
+            local.depth = 0
+            with self._profilers_lock:
+                self._profilers.append(profiler)
+        if local.depth:
+            return fn(*args, **kwargs) # Already inside a profiled call on this thread
+        try:
+            profiler.enable()
+        except ValueError:
+            # Newer Pythons allow one active cProfile at a time; the stack samples still cover this call
+            return fn(*args, **kwargs)
+        local.depth += 1
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            local.depth -= 1
+            profiler.disable()
+
+    # --- Sampling side ---
+    def start(self):
+        self.log(f"Profiling for {self.duration_s:g} s...")
+        self._thread = threading.Thread(target=self._sample_loop, name="profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+
+    def _sample_loop(self):
+        global _active_session
+        own_id = threading.get_ident()
+        deadline = time.monotonic() + self.duration_s
+        while not self._stop_event.wait(self.sample_interval_s) and time.monotonic() < deadline:
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                stack.append(names.get(thread_id, str(thread_id)))
+                self._samples[";".join(reversed(stack))] += 1
+            self._sample_count += 1
+
+        with _session_lock:
+            _active_session = None
+        try:
+            self._write_results()
+        except Exception as e:
+            self.log(f"Could not write profile: {e}", level="error")
+
+    def _write_results(self):
+        os.makedirs(self.logs_dir, exist_ok=True)
+        base = os.path.join(self.logs_dir, f"profile_{time.strftime('%Y%m%d_%H%M%S')}")
+
+        self.collapsed_path = base + ".collapsed"
+        with open(self.collapsed_path, "w") as f:
+            for stack, count in self._samples.most_common():
+                f.write(f"{stack} {count}\n")
+
+        with self._profilers_lock:
+            profilers = list(self._profilers)
+        stats = None
+        for profiler in profilers:
+            profiler.create_stats()
+            if not profiler.stats:
+                continue
+            if stats is None:
+                stats = pstats.Stats(profiler)
+            else:
+                stats.add(profiler)
+        if stats is not None:
+            self.pstats_path = base + ".pstats"
+            stats.dump_stats(self.pstats_path)
+            self.log(f"Profile saved to {self.pstats_path}")
+        else:
+            self.log("No profiled calls ran during the session (idle?); only stack samples were saved.")
+        self.log(f"Stack samples ({self._sample_count}) saved to {self.collapsed_path}")
+
+
+def install_signal_handler(logs_dir, log_callback=None, duration_s=config.PROFILE_DURATION_S):
+    """SIGUSR1 starts a profile. Does nothing where SIGUSR1 does not exist (Windows)."""
+    if not hasattr(signal, "SIGUSR1"):
+        return False
+    signal.signal(signal.SIGUSR1, lambda signum, frame: start_profile(logs_dir, duration_s, log_callback))
+    return True
@@ -2,7 +2,7 @@
 ##VERSION: 1.15
 
 import math
-from config import MotorIndex, STEPS_TO_MM_LS, STEPS_TO_MM_CAPSTAN, Q1_DR_COMP, ls_steps_from_mm
+from config import MotorIndex, STEPS_TO_MM_LS, STEPS_TO_MM_CAPSTAN, Q1_DR_COMP, ls_steps_from_mm, DEBUG_STEP_PRINTS
 from kinematic_model import get_q3_pl
 from experimental_model import get_q3_change
 
@@ -11,16 +11,16 @@ dir_offset = Q1_DR_COMP
 
 #geometric constants:
 q1_rad = 1.5 #mm
+jaw_radius = 1.25 #mm, jaw cables around the pitch axis (get_jaw_pl)
+q3_radius = 1.7 #mm, wrist pitch cables compensated for the Q1->Q3 coupling (get_q3_pl)
 # Positive step values (or positive delta_theta) = cable shortening
 
 def get_jaw_pl(delta_theta):
-    r2 = 1.25
-    delta_s = math.radians(delta_theta)*r2
+    delta_s = math.radians(delta_theta)*jaw_radius
     return delta_s
 
 def get_q3_pl(curr_theta, delta_theta):
 
-    q3_radius = 1.7 #mm
     curr_theta_rad = math.radians(curr_theta)
     delta_theta_rad = math.radians(delta_theta)
     angle_comp_rad = -get_q3_change(curr_theta_rad, delta_theta_rad)
@@ -46,7 +46,7 @@ def get_steps(curr_theta, delta_theta, latest_dir):
         return motor_steps, latest_dir
     
     mm_q1 = math.radians(delta_theta)*q1_rad
-    print("Calculated required Q1 path length change to be:", mm_q1)
+    if DEBUG_STEP_PRINTS: print("Calculated required Q1 path length change to be:", mm_q1)
     steps_q1 = int(mm_q1*STEPS_TO_MM_CAPSTAN)
 
     ep_comp = 0
@@ -6,14 +6,13 @@ import config as cf
 from config import MotorIndex, STEPS_TO_MM_LS, ls_steps_from_mm, capstan_steps_from_mm
 from kinematic_model import get_q4_pl
 from experimental_model import get_q4_change
-import matplotlib.pyplot as plt
 
 dir_offset = cf.Q2_DR_COMP
 EY_effective_radius = 1.3 ##mm
+q4_radius = 1.35 #mm, jaw cables compensated for the Q2->Q4 coupling (get_jaw_pl)
 
 def get_jaw_pl(curr_theta, delta_theta):
 
-    q4_radius = 1.35 #mm
     curr_theta_rad = math.radians(curr_theta)
     delta_theta_rad = math.radians(delta_theta)
     angle_comp_rad = -get_q4_change(curr_theta_rad, delta_theta_rad)
@@ -40,9 +39,9 @@ def get_steps(curr_theta, delta_theta, latest_dir):
     #curr theta is in degrees between 0 and 180
 
     mm_ey = math.radians(delta_theta)*EY_effective_radius
-    print("calculated required path length change to be:", mm_ey)
+    if cf.DEBUG_STEP_PRINTS: print("calculated required path length change to be:", mm_ey)
     steps_ey = capstan_steps_from_mm(mm_ey)
-    print("calculated required steps to be:", steps_ey)
+    if cf.DEBUG_STEP_PRINTS: print("calculated required steps to be:", steps_ey)
 
     """ if (latest_dir == 0 or latest_dir*delta_theta < 0 and cf.DIR_COMP):
         ###latest_dir and delta_theta are not the same direction/sign
@@ -3,18 +3,21 @@
 import math
 import numpy as np # If you keep numpy for specific calculations
 import config as cf
+from geometry_params import load_geometry
 
 
 #constant for the wrist pitch cable length change geometry
 ##centered around the axis as 0,0
 
 
-L1_c = 1.457  # Length of link-1 in mm
-L2_c = 0.55   # Length of link-2 in mm
-r1_c = 0.89   # Radius of circle C1 in mm
-c1x_c = 1.6   # x-coordinate of center of circle C1 in mm
-c1y_c = -1.5  # y-coordinate of center of circle C1 in mm
-r2_c = 1.0   # Radius of circle C2 in mm (assumed to be 0.0 for simplification)
+# CAD values in geometry_params.DEFAULT_GEOMETRY; fitted values (fit_geometry.py) when present
+_geometry = load_geometry("q3_pl")
+L1_c = _geometry["L1_c"]  # Length of link-1 in mm
+L2_c = _geometry["L2_c"]   # Length of link-2 in mm
+r1_c = _geometry["r1_c"]   # Radius of circle C1 in mm
+c1x_c = _geometry["c1x_c"]   # x-coordinate of center of circle C1 in mm
+c1y_c = _geometry["c1y_c"]  # y-coordinate of center of circle C1 in mm
+r2_c = _geometry["r2_c"]   # Radius of circle C2 in mm (assumed to be 0.0 for simplification)
 dir_offset = cf.Q3_DR_COMP
 
 
@@ -149,7 +152,7 @@ def get_steps(curr_theta, delta_theta, latest_dir):
         if delta_theta == 0:
             return motor_steps, latest_dir
         ##primary cables:
-        mm_wp = math.radians(delta_theta)*1.7
+        mm_wp = math.radians(delta_theta)*WP_EFFECTIVE_RADIUS_MM
         steps_wp = int(mm_wp*cf.STEPS_TO_MM_LS)
         
         if (latest_dir == 0 or latest_dir*delta_theta < 0 and cf.DIR_COMP):
@@ -160,11 +163,12 @@ def get_steps(curr_theta, delta_theta, latest_dir):
                  comp = comp/2
             steps_wp += comp
             latest_dir = delta_theta
-            print(f"Added {comp} steps due to a change in direction! new latest dir: {latest_dir}")
+            if cf.DEBUG_STEP_PRINTS: print(f"Added {comp} steps due to a change in direction! new latest dir: {latest_dir}")
         else:
 
-            print(f"latest_dir didnt change or dir_comp is off: latest_dir = {latest_dir} delta theta = {delta_theta} and dr comp = {cf.DIR_COMP}")
-            print("oopsies")
+            if cf.DEBUG_STEP_PRINTS:
+                print(f"latest_dir didnt change or dir_comp is off: latest_dir = {latest_dir} delta theta = {delta_theta} and dr comp = {cf.DIR_COMP}")
+                print("oopsies")
 
         ##auxiliary cables: 
         target_theta = curr_theta + delta_theta
@@ -183,9 +187,10 @@ def get_steps(curr_theta, delta_theta, latest_dir):
         delta_lj = target_lj - curr_lj
         delta_rj = target_rj - curr_rj
 
-        print(f"Wrist pitch delta: {delta_theta}, current_abs_wp: {curr_theta}, target_abs_wp: {target_theta}")
-        print(f"L_current_LJL_LJR: {curr_lj:.4f}, L_target_LJL_LJR: {target_lj:.4f}, delta_L: {delta_lj:.4f}")
-        print(f"L_current_RJ: {curr_rj:.4f}, L_target_RJ: {target_rj:.4f}, delta_L: {delta_rj:.4f}")
+        if cf.DEBUG_STEP_PRINTS:
+            print(f"Wrist pitch delta: {delta_theta}, current_abs_wp: {curr_theta}, target_abs_wp: {target_theta}")
+            print(f"L_current_LJL_LJR: {curr_lj:.4f}, L_target_LJL_LJR: {target_lj:.4f}, delta_L: {delta_lj:.4f}")
+            print(f"L_current_RJ: {curr_rj:.4f}, L_target_RJ: {target_rj:.4f}, delta_L: {delta_rj:.4f}")
 
         #positive steps = cable LENGTHENING (dynamixel motors aug 14 2025)
         
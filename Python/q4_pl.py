@@ -26,11 +26,12 @@ def get_steps_L(curr_theta, delta_theta, latest_dir):
             comp = comp/2
         steps += comp
         latest_dir = delta_theta
-        print(f"Added {comp} steps due to a change in direction! new latest dir: {latest_dir}")
+        if cf.DEBUG_STEP_PRINTS: print(f"Added {comp} steps due to a change in direction! new latest dir: {latest_dir}")
     else:
 
-        print(f"latest_dir didnt change or dir_comp is off: latest_dir = {latest_dir} delta theta = {delta_theta} and dr comp = {cf.DIR_COMP}")
-        print("oopsies")
+        if cf.DEBUG_STEP_PRINTS:
+            print(f"latest_dir didnt change or dir_comp is off: latest_dir = {latest_dir} delta theta = {delta_theta} and dr comp = {cf.DIR_COMP}")
+            print("oopsies")
     
     motor_steps[cf.MotorIndex.LJL] = -steps
     motor_steps[cf.MotorIndex.LJR] = steps
@@ -57,11 +58,12 @@ def get_steps_R(curr_theta, delta_theta, latest_dir):
         
         steps += comp
         latest_dir = delta_theta
-        print(f"Added {comp} steps due to a change in direction! new latest dir: {latest_dir}")
+        if cf.DEBUG_STEP_PRINTS: print(f"Added {comp} steps due to a change in direction! new latest dir: {latest_dir}")
     else:
 
-        print(f"latest_dir didnt change or dir_comp is off: latest_dir = {latest_dir} delta theta = {delta_theta} and dr comp = {cf.DIR_COMP}")
-        print("oopsies")
+        if cf.DEBUG_STEP_PRINTS:
+            print(f"latest_dir didnt change or dir_comp is off: latest_dir = {latest_dir} delta theta = {delta_theta} and dr comp = {cf.DIR_COMP}")
+            print("oopsies")
     
     motor_steps[cf.MotorIndex.RJL] = steps
     motor_steps[cf.MotorIndex.RJR] = -steps
@@ -0,0 +1,116 @@
+import math
+import threading
+import time
+
+import config
+# ROS-related imports with a fallback if ROS is not installed
+try:
+    import sys
+    sys.path.append("/opt/ros/noetic/lib/python3/dist-packages")
+    import rospy
+    # NEW: Import JointState message type
+    from sensor_msgs.msg import JointState
+    IS_ROS_AVAILABLE = True
+except ImportError:
+    rospy = None
+    IS_ROS_AVAILABLE = False
+
+# JointState names we read, in the order of the values below
+ROS_JOINT_NAMES = ("elbow_pitch", "elbow_yaw", "wrist_pitch", "jaw_1")
+RAD_TO_DEG = 180.0 / math.pi # Same factor math.degrees uses
+
+
+def joint_name_index(names):
+    """Positions of ROS_JOINT_NAMES (pitch, yaw, wrist, jaw) in a JointState name list, or None if one is missing."""
+    try:
+        return tuple(names.index(joint) for joint in ROS_JOINT_NAMES)
+    except ValueError:
+        return None
+
+
+def joint_state_to_target(position, index, target):
+    """Fills target (Q1, Q2, Q3, Q4L, Q4R in degrees) from JointState positions (radians)."""
+    pitch_i, yaw_i, wrist_i, jaw_i = index
+    target[0] = -(position[pitch_i] * RAD_TO_DEG + 90.0)
+    target[1] = position[yaw_i] * RAD_TO_DEG + 90.0
+    target[2] = position[wrist_i] * RAD_TO_DEG + 90.0
+    jaw = position[jaw_i] * RAD_TO_DEG + 90.0
+    target[3] = -jaw
+    target[4] = jaw
+    return target
+
+# --- Helper Class for ROS Communication ---
+class ROSSubscriberThread(threading.Thread):
+    def __init__(self, topic_name, target_mailbox, log_callback):
+        super().__init__(daemon=True)
+        self._topic_name = topic_name
+        self._target_mailbox = target_mailbox
+        self._log_callback = log_callback
+        self._subscriber = None
+        self._stop_event = threading.Event()
+
+        # Q1, Q2, Q3, Q4L, Q4R - reused for every message, the mailbox copies it
+        self._target = [0.0] * 5
+        # Index of each ROS_JOINT_NAMES entry in msg.position, cached per msg.name layout
+        self._last_names = None
+        self._last_index = None
+        self._index_cache = {}
+        self._warned_missing = False
+        self._use_header_stamp = config.ROS_USE_HEADER_STAMP
+
+    def _joint_index(self, names):
+        """Returns (pitch, yaw, wrist, jaw) positions in msg.position, or None if a joint is missing."""
+        if names == self._last_names: # Publishers almost always repeat the same layout
+            return self._last_index
+        key = tuple(names)
+        if key not in self._index_cache:
+            self._index_cache[key] = joint_name_index(key)
+        self._last_names = names # Same type as the next msg.name, so == is a cheap element compare
+        self._last_index = self._index_cache[key]
+        return self._last_index
+
+    def _ros_callback(self, msg):
+        # Runs for every message on the ROS thread: no per-message dicts, lists or closures.
+        try:
+            index = self._joint_index(msg.name)
+            if index is None:
+                if not self._warned_missing:
+                    self._warned_missing = True
+                    self._log_callback(f"ROS messages on '{self._topic_name}' lack one of {', '.join(ROS_JOINT_NAMES)}; ignoring them.", level="warning")
+                return
+
+            target = joint_state_to_target(msg.position, index, self._target)
+            stamp = msg.header.stamp
+            if self._use_header_stamp and (stamp.secs or stamp.nsecs):
+                self._target_mailbox.publish(target, stamp.secs + stamp.nsecs * 1e-9)
+            else:
+                self._target_mailbox.publish(target, time.time())
+        except Exception as e:
+            self._log_callback(f"ROS Callback Error: {e}", level="error")
+
+    def run(self):
+        """The main execution method of the thread."""
+        try:
+            self._log_callback(f"ROS Thread: Subscribing to topic '{self._topic_name}'.")
+            # queue_size=1: a late message is worthless once a newer one exists
+            self._subscriber = rospy.Subscriber(self._topic_name, JointState, self._ros_callback,
+                                                queue_size=1, tcp_nodelay=True)
+            
+            # The loop is simpler now, just waiting for the stop signal.
+            while not self._stop_event.is_set() and not rospy.is_shutdown():
+                self._stop_event.wait(0.05)
+
+        except rospy.ROSInterruptException:
+            self._log_callback("ROS Thread: Shutdown signal received.")
+        except Exception as e:
+            self._log_callback(f"ROS Thread: An error occurred during run: {e}", level="error")
+        finally:
+            if self._subscriber:
+                self._subscriber.unregister()
+                self._log_callback("ROS Thread: Unsubscribed from topic.")
+            self._log_callback("ROS Thread: Exiting.")
+
+    def stop(self):
+        """Signals the thread's run loop to terminate."""
+        self._log_callback("ROS Thread: Stop signal received.")
+        self._stop_event.set()
@@ -0,0 +1,267 @@
+"""
+Sequence upload: a precomputed list of 8-motor step waypoints sent as one
+SEQUENCE block instead of one MOVE_ALL_MOTORS line each.
+
+Every MOVE_ALL_MOTORS line is ~46 characters the board reads at one per
+loop pass (~10 ms each), so a scripted motion is limited to about two
+moves a second by command parsing. A SEQUENCE block carries the waypoints
+as varints behind a single header and CRC (~16 characters per waypoint),
+the board reads it in one go and then runs one goal SyncWrite per waypoint
+(or one every period_ms). Progress comes back by waypoint index ("SEQ <i>",
+see PROTOCOL.md). Uploads larger than SEQUENCE_MAX_BYTES go out as
+consecutive blocks, each sent when the board reports the previous one done.
+
+Firmware without SEQUENCE ignores the line without a word, so every block
+is followed by a PING fence: its PONG arriving before SEQ_START means the
+block was ignored. Firmware that does not answer PING either is given up on
+once the block's read time plus start_timeout_s has passed.
+"""
+import threading
+import time
+
+import config
+from command_codec import (SEQUENCE_BLOCK_HEAD, SEQUENCE_CRC, SEQUENCE_STOP_COMMAND, SEQUENCE_STARTED,
+                           SEQUENCE_PROGRESS, SEQUENCE_DONE, SEQUENCE_ABORTED, PONG_REPLY, decode_sequence_reply,
+                           encode_ping, encode_sequence_block, encode_sequence_waypoint)
+
+_MAX_BLOCK_WAYPOINTS = 0xFFFF # Count field of the block head
+_FENCE_TOKEN = "seq" # PING token prefix of the fence after each block (the heartbeat uses plain numbers)
+
+IDLE, RUNNING, DONE, ABORTED = "idle", "running", "done", "aborted"
+
+
+def split_blocks(motor_steps_list, velocities=None, accelerations=None, max_bytes=config.SEQUENCE_MAX_BYTES):
+    """
+    Greedy split into blocks of at most max_bytes (head and CRC included).
+    Returns [(encoded waypoints, their step lists)], in order.
+    """
+    overhead = SEQUENCE_BLOCK_HEAD.size + SEQUENCE_CRC.size
+    blocks, waypoints, steps, size = [], [], [], overhead
+    for i, motor_steps in enumerate(motor_steps_list):
+        waypoint = encode_sequence_waypoint(motor_steps, velocities[i] if velocities is not None else None,
+                                            accelerations[i] if accelerations is not None else None)
+        if waypoints and (size + len(waypoint) > max_bytes or len(waypoints) == _MAX_BLOCK_WAYPOINTS):
+            blocks.append((waypoints, steps))
+            waypoints, steps, size = [], [], overhead
+        if overhead + len(waypoint) > max_bytes:
+            raise ValueError(f"waypoint {i} needs {len(waypoint)} bytes, more than a block holds")
+        waypoints.append(waypoint)
+        steps.append(list(motor_steps))
+        size += len(waypoint)
+    if waypoints:
+        blocks.append((waypoints, steps))
+    return blocks
+
+
+class SequenceUploader:
+    """
+    Sends waypoint sequences over a SerialHandler and follows the board's
+    progress replies, which SerialHandler passes to on_response(). One
+    upload at a time; executed counts waypoints across all of its blocks.
+    The LimitGuard checks the whole sequence before anything is sent and
+    is moved on by the progress replies.
+    """
+    def __init__(self, serial_handler, log_callback=None, start_timeout_s=config.MOVE_ACK_TIMEOUT_S):
+        self.serial_handler = serial_handler
+        self.start_timeout_s = start_timeout_s
+        self.log = log_callback or (lambda message, level="info", **kwargs: print(f"LOG ({level}): {message}"))
+        self._lock = threading.Lock()
+        self._finished = threading.Event()
+        self._finished.set()
+        self._blocks = [] # Blocks not sent yet: (line, step lists)
+        self._block_steps = [] # Step lists of the block the board is running
+        self._block_base = 0 # Waypoints executed before that block
+        self._reported = 0 # Waypoints of that block already reported
+        self._on_progress = None
+        self._waypoint_s = 0.0
+        self._start_deadline = None # monotonic() time by which SEQ_START is due; None once it has arrived
+        self._fence = None # PONG line that answers the fence after the block being started
+        self._fences_sent = 0
+
+        self.state = IDLE
+        self.error = None # Abort reason of the last upload
+        self.total = 0
+        self.executed = 0
+        self.started = None # monotonic() time of the last upload
+
+        self.uploads = 0
+        self.uploads_aborted = 0
+        self.blocks_sent = 0
+        self.waypoints_executed = 0
+
+    @property
+    def running(self):
+        self._expire()
+        return self.state == RUNNING
+
+    def _expire(self):
+        deadline = self._start_deadline
+        if self.state == RUNNING and deadline is not None and time.monotonic() > deadline:
+            self._finish(ABORTED, "no answer")
+            self.log("Sequence not started: the board did not answer it in time.", level="warning")
+
+    def upload(self, motor_steps_list, period_ms=0, velocities=None, accelerations=None,
+               report_every=config.SEQUENCE_REPORT_EVERY, on_progress=None):
+        """
+        Starts a sequence: motor_steps_list holds one 8-motor relative step list
+        per waypoint (MotorIndex order); velocities/accelerations optionally one
+        profile list per waypoint. period_ms spaces the waypoints (0 = one
+        SyncWrite after the other). on_progress(executed, total) is called from
+        the serial reader thread. Returns True if the first block was written.
+        """
+        if self.running:
+            self.log("A sequence is already running; stop it first.", level="warning")
+            return False
+        motor_steps_list = [list(map(int, steps)) for steps in motor_steps_list]
+        if not motor_steps_list:
+            return False
+        blocked = self.serial_handler.limit_guard.check_sequence(motor_steps_list)
+        if blocked:
+            self.log(f"Sequence not sent, the firmware would block it: {blocked}", level="warning")
+            return False
+        try:
+            blocks = split_blocks(motor_steps_list, velocities, accelerations)
+        except ValueError as e:
+            self.log(f"Sequence not sent: {e}", level="error")
+            return False
+        lines = [(encode_sequence_block(waypoints, period_ms, report_every, velocities is not None), steps)
+                 for waypoints, steps in blocks]
+        with self._lock:
+            self._blocks = lines
+            self._block_base = 0
+            self._on_progress = on_progress
+            self._waypoint_s = max(period_ms / 1000.0, config.FIRMWARE_SYNCWRITE_S)
+            self.state, self.error = RUNNING, None
+            self.total, self.executed = len(motor_steps_list), 0
+            self.started = time.monotonic()
+            self.uploads += 1
+            self._finished.clear()
+            block = self._next_block()
+        # Written without the lock: a failed write disconnects, and on_disconnect() finishes the upload
+        if self._write_block(*block):
+            return True
+        self._finish(ABORTED, "not sent")
+        return False
+
+    def stop(self):
+        """Asks the board to stop after the waypoint it is running (answered with SEQ_ABORT)."""
+        with self._lock:
+            self._blocks = []
+        if self.running:
+            self.serial_handler.send_command(SEQUENCE_STOP_COMMAND)
+
+    def wait(self, timeout=None):
+        """Blocks until the upload is done or aborted; True if every waypoint ran."""
+        end = None if timeout is None else time.monotonic() + timeout
+        while not self._finished.wait(0.1 if end is None else max(0.0, min(0.1, end - time.monotonic()))):
+            self._expire()
+            if end is not None and time.monotonic() >= end:
+                break
+        return self.state == DONE
+
+    def remaining_s(self):
+        """Estimated time until the board has run the rest of the upload (0 when idle or not started yet)."""
+        if not self.running or self._start_deadline is not None:
+            return 0.0
+        return (self.total - self.executed) * self._waypoint_s
+
+    def on_disconnect(self):
+        if self.running:
+            self._finish(ABORTED, "disconnected")
+
+    def _next_block(self):
+        """Makes the next queued block the current one (lock held). Returns (line, fence token) to write."""
+        line, steps = self._blocks.pop(0)
+        self._block_steps = steps
+        self._reported = 0
+        # Firmware without SEQUENCE reads the line a character per loop pass before dropping it
+        self._start_deadline = (time.monotonic() + len(line) * config.FIRMWARE_CHAR_PERIOD_S
+                                + self.start_timeout_s)
+        self._fences_sent += 1
+        token = f"{_FENCE_TOKEN}{self._fences_sent}"
+        self._fence = f"{PONG_REPLY} {token}"
+        return line, token
+
+    def _write_block(self, line, token):
+        """Writes a block and its PING fence (lock not held). False if the write failed."""
+        if not self.serial_handler.send_command(line):
+            return False
+        self.blocks_sent += 1
+        self.serial_handler.send_command(encode_ping(token))
+        return True
+
+    def _finish(self, state, error=None):
+        with self._lock:
+            if self.state != RUNNING:
+                return # Already finished (a failed write disconnects before the caller sees it)
+            self._blocks = []
+            self._start_deadline = self._fence = None
+            self.state, self.error = state, error
+            if state == ABORTED:
+                self.uploads_aborted += 1
+        self._finished.set()
+
+    # --- Board replies (serial reader thread) ---
+    def on_response(self, response):
+        """Handles a sequence reply; returns True if it was one (kept out of the console)."""
+        if response.startswith(f"{PONG_REPLY} {_FENCE_TOKEN}"):
+            if response == self._fence and self._start_deadline is not None:
+                self._finish(ABORTED, "ignored")
+                self.log("Sequence not started: the board ignored it (firmware without SEQUENCE?).", level="warning")
+            return True
+        reply = decode_sequence_reply(response)
+        if reply is None or not self.running:
+            return False
+        kind, value, reason = reply
+        if kind == SEQUENCE_STARTED:
+            self._start_deadline = None
+            return True
+        if kind == SEQUENCE_PROGRESS:
+            self._note_executed(value + 1)
+            return True
+        if kind == SEQUENCE_DONE:
+            self._note_executed(value)
+            with self._lock:
+                self._block_base += len(self._block_steps)
+                block = self._next_block() if self._blocks else None
+            if block is None:
+                self._finish(DONE)
+            elif not self._write_block(*block):
+                self._finish(ABORTED, "not sent")
+                self.log(f"Sequence stopped after {self.executed}/{self.total} waypoints: "
+                         f"the next block could not be sent.", level="error")
+            return True
+        if kind == SEQUENCE_ABORTED:
+            self._note_executed(max(value, 0))
+            self._finish(ABORTED, reason)
+            self.log(f"Sequence aborted by the board after {self.executed}/{self.total} waypoints: {reason}",
+                     level="warning")
+            return True
+        return False
+
+    def _note_executed(self, block_executed):
+        with self._lock:
+            block_executed = min(block_executed, len(self._block_steps))
+            if block_executed <= self._reported:
+                return
+            newly = self._block_steps[self._reported:block_executed]
+            self._reported = block_executed
+            self.executed = self._block_base + block_executed
+            self.waypoints_executed += len(newly)
+            on_progress = self._on_progress
+        self.serial_handler.limit_guard.on_sequence_progress(newly)
+        if on_progress:
+            on_progress(self.executed, self.total)
+
+    def stats(self):
+        return {
+            "uploads": self.uploads,
+            "uploads_aborted": self.uploads_aborted,
+            "blocks_sent": self.blocks_sent,
+            "waypoints_executed": self.waypoints_executed,
+        }
+
+    def summary(self):
+        s = self.stats()
+        return (f"uploads={s['uploads']} aborted={s['uploads_aborted']} blocks={s['blocks_sent']} "
+                f"waypoints={s['waypoints_executed']}")
@@ -1,11 +1,25 @@
 import serial
 import time
 import threading
+from collections import deque
 import config # For serial default settings
+from command_codec import (MOVE_ALL_MOTORS_HEADER, TELEMETRY_PREFIX, classify_response, decode_telemetry_frame,
+                           encode_telemetry, RESPONSE_OTHER, RESPONSE_MOVE_RECEIVED, RESPONSE_MOVE_DONE)
+from latency_histogram import LatencyHistogram
+from limit_guard import LimitGuard
+from link_heartbeat import LinkHeartbeat
+from motion_profile import command_duration_s
+from pipeline_timing import PipelineTiming
+from profiler import profiled
+from sequence_upload import SequenceUploader
+from telemetry_ring import TelemetryRing
+
+_TELEMETRY_PREFIX = TELEMETRY_PREFIX.encode("ascii")
 
 
 class SerialHandler:
-    def __init__(self, data_callback=None, status_callback=None, error_callback=None):
+    def __init__(self, data_callback=None, status_callback=None, error_callback=None,
+                 link_callback=None, log_callback=None):
         self.serial_port = None
         self.is_connected = False
         self.port_name = config.DEFAULT_SERIAL_PORT
@@ -14,15 +28,45 @@ class SerialHandler:
         self.data_callback = data_callback # Function to call when data arrives
         self.status_callback = status_callback # Function to call with connection status updates
         self.error_callback = error_callback # Function to call on serial errors
+        self.command_count = 0 # Id of the last command written, used to tag log records
+        self.line_ending = config.SERIAL_LINE_ENDING
+        self.reader_mode = config.SERIAL_READER_MODE # Read by the monitor thread on every pass
+        self._write_lock = threading.Lock() # Moves, heartbeats and GUI commands come from different threads
+
+        # --- Move acknowledgement tracking ---
+        # Moves still waiting for the firmware's completion line (FIFO, firmware answers in order):
+        # [write done, "Received Command" seen (or None), move origin] as perf_counter() times
+        self._pending_moves = deque()
+        self._last_move_len = 0
+        self._last_move_motion_s = 0.0 # Motion time of the last move's profile (0 for a plain move)
+        self.ack_latency = LatencyHistogram("move_ack")
+        self.ack_latency_ewma = None # Seconds; None until verbose firmware has acknowledged a move
+        self.last_ack_time = None # perf_counter() of the last move acknowledgement (the heartbeat skips probes after one)
+        self.pipeline_timing = PipelineTiming(config.PIPELINE_TIMING_ENABLED)
+        # Host copy of the firmware's Q1/Q2 limit check, fed by every command and reply
+        self.limit_guard = LimitGuard()
+        # Present positions streamed by the firmware; this reader thread is the ring's only writer
+        self.telemetry = TelemetryRing()
+        self.telemetry_period_ms = config.TELEMETRY_PERIOD_MS # Requested on every connect; 0 = off
+        self.telemetry_errors = 0 # Damaged frames
+        # Waypoint sequences sent as SEQUENCE blocks; follows the board's SEQ progress lines
+        self.sequence = SequenceUploader(self, log_callback=log_callback)
+
+        # Liveness / RTT probe, running while connected. link_callback(degraded, reason)
+        self.heartbeat = LinkHeartbeat(self, link_callback=link_callback, log_callback=log_callback)
 
         self.serial_thread = threading.Thread(target=self._monitor_serial, daemon=True)
         self.serial_thread_stop_event = threading.Event()
         # self.serial_thread.start() # Start in connect method
     
-    def set_callbacks(self, data_callback, status_callback, error_callback):
+    def set_callbacks(self, data_callback, status_callback, error_callback, link_callback=None, log_callback=None):
         self.data_callback = data_callback
         self.status_callback = status_callback
         self.error_callback = error_callback
+        self.heartbeat.link_callback = link_callback
+        if log_callback:
+            self.heartbeat.log = log_callback
+            self.sequence.log = log_callback
 
     def connect(self, port_name):
         if self.is_connected:
@@ -46,6 +90,9 @@ class SerialHandler:
                 self.serial_thread_stop_event.clear()
                 self.serial_thread = threading.Thread(target=self._monitor_serial, daemon=True)
                 self.serial_thread.start()
+            self.heartbeat.start()
+            if self.telemetry_period_ms:
+                self.send_command(encode_telemetry(self.telemetry_period_ms))
             return True
         except serial.SerialException as e:
             if self.error_callback:
@@ -59,23 +106,38 @@ class SerialHandler:
         if not self.is_connected:
             return
         self.serial_thread_stop_event.set() # Signal thread to stop
+        self.heartbeat.stop()
+        self.limit_guard.on_disconnect()
+        self.sequence.on_disconnect()
         if self.serial_port and self.serial_port.is_open:
             try:
+                if hasattr(self.serial_port, "cancel_read"):
+                    self.serial_port.cancel_read() # Wakes a blocking-mode reader
                 self.serial_port.close()
             except serial.SerialException as e:
                  if self.error_callback: self.error_callback(f"Error closing port: {e}")
         self.is_connected = False
-        if self.serial_thread.is_alive():
-            self.serial_thread.join(timeout=1) # Wait for thread to finish
+        if self.serial_thread.is_alive() and self.serial_thread is not threading.current_thread():
+            self.serial_thread.join(timeout=1) # Wait for thread to finish (unless a reader-thread write failed)
         if self.status_callback:
             self.status_callback("Disconnected", "black", False)
 
 
-    def send_command(self, command):
+    def send_command(self, command, origin=None):
+        """
+        Writes one command line. origin is the perf_counter() time the move
+        started on the host, for the end_to_end pipeline stage.
+        """
         if self.is_connected and self.serial_port and self.serial_port.is_open:
             try:
-                self.serial_port.write(f"{command}\r\n".encode('ascii'))
-                self.serial_port.flush()
+                with self._write_lock:
+                    write_started = time.perf_counter()
+                    self.serial_port.write(f"{command}{self.line_ending}".encode('ascii'))
+                    self.serial_port.flush()
+                    self.command_count += 1
+                    self.limit_guard.on_command_sent(command)
+                    if command.startswith(MOVE_ALL_MOTORS_HEADER):
+                        self._note_move_sent(command, write_started, origin)
                 # Optionally log sent command via a callback if GUI needs to show it directly
                 # if self.data_callback: self.data_callback(f"Sent: {command}", "sent")
                 return True
@@ -92,22 +154,111 @@ class SerialHandler:
             return False
 
     def _monitor_serial(self):
+        partial = b"" # Blocking mode: start of a line cut off by the read timeout
         while not self.serial_thread_stop_event.is_set():
             if self.is_connected and self.serial_port and self.serial_port.is_open:
                 try:
-                    if self.serial_port.in_waiting > 0:
-                        response = self.serial_port.readline().decode('ascii', 'ignore').strip()
-                        if response and self.data_callback:
-                            self.data_callback(response, "received") # Pass type of data
+                    if self.reader_mode == "blocking":
+                        # Returns as soon as a line is complete, or after SERIAL_TIMEOUT with what has arrived
+                        raw_line = self.serial_port.readline()
+                        if raw_line.endswith(b"\n"):
+                            self._handle_line(partial + raw_line)
+                            partial = b""
+                        else:
+                            partial += raw_line
+                        continue
+                    # Drain every complete line before sleeping; verbose moves print ~15 lines each
+                    while self.serial_port.in_waiting > 0:
+                        self._handle_line(self.serial_port.readline())
                 except serial.SerialException:
-                    if self.is_connected: # Only if we thought we were connected
+                    if self.is_connected and not self.serial_thread_stop_event.is_set(): # Not a disconnect() in progress
                         if self.error_callback: self.error_callback("Lost connection during monitoring.")
                         self.disconnect() # This will also update status via its callback
                     break # Exit monitoring loop
                 except Exception as e:
+                    if self.serial_thread_stop_event.is_set():
+                        break # Port closed under a blocking read
                     if self.error_callback: self.error_callback(f"Serial monitoring error: {e}")
                     # Potentially disconnect here too if error is severe
-            time.sleep(0.1) # Reduce CPU usage
+            time.sleep(config.SERIAL_POLL_INTERVAL_S) # Reduce CPU usage
+
+    @profiled
+    def _handle_line(self, raw_line):
+        if raw_line.startswith(_TELEMETRY_PREFIX):
+            frame = decode_telemetry_frame(raw_line)
+            if frame:
+                self.telemetry.write(*frame)
+            else:
+                self.telemetry_errors += 1
+            return # Frames stay out of the console and the session log
+        response = raw_line.decode('ascii', 'ignore').strip()
+        if not response:
+            return
+        kind = classify_response(response)
+        self._note_response(kind)
+        self.limit_guard.on_response(response, kind)
+        if self.sequence.on_response(response):
+            return # Sequence progress lines (and their PING fences) stay out of the console
+        if self.heartbeat.on_response(response):
+            return # So do heartbeat replies
+        if self.data_callback:
+            self.data_callback(response, "received") # Pass type of data
+
+    def _note_move_sent(self, command, write_started, origin):
+        now = time.perf_counter()
+        self.pipeline_timing.record("write", now - write_started)
+        self._last_move_len = len(command)
+        self._last_move_motion_s = command_duration_s(command)
+        # Quiet firmware never acknowledges a move, so forget sends that will not be answered
+        while self._pending_moves and now - self._pending_moves[0][0] > config.MOVE_ACK_TIMEOUT_S:
+            self._pending_moves.popleft()
+            self.ack_latency_ewma = None
+        self._pending_moves.append([now, None, write_started if origin is None else origin])
+
+    def _note_response(self, kind):
+        if kind == RESPONSE_OTHER or not self._pending_moves:
+            return
+        now = time.perf_counter()
+        if kind == RESPONSE_MOVE_RECEIVED:
+            for move in self._pending_moves:
+                if move[1] is None:
+                    move[1] = now
+                    self.pipeline_timing.record("fw_received", now - move[0])
+                    break
+            return
+
+        sent, received, origin = self._pending_moves.popleft()
+        self.last_ack_time = now
+        latency = now - sent
+        self.ack_latency.record(latency)
+        if self.ack_latency_ewma is None:
+            self.ack_latency_ewma = latency
+        else:
+            self.ack_latency_ewma += config.MOVE_ACK_EWMA_ALPHA * (latency - self.ack_latency_ewma)
+        if kind == RESPONSE_MOVE_DONE:
+            if received is not None:
+                self.pipeline_timing.record("fw_syncwrite", now - received)
+            self.pipeline_timing.record("end_to_end", now - origin)
+
+    def move_interval_s(self):
+        """
+        How often the link can absorb a move: the measured send-to-ack latency
+        when the firmware is acknowledging moves, otherwise the modelled time
+        the firmware needs to read and execute the last move. Never shorter
+        than the motion of a profiled move: the firmware starts the next move
+        from the present position, so sending it early cuts the profile short.
+        A running sequence adds the time the board needs to finish it (a move
+        would supersede it), and a heartbeat probe still unanswered the time the
+        board needs to read it (the next move is read after it).
+        """
+        if self.ack_latency_ewma is not None:
+            interval = max(self.ack_latency_ewma, self._last_move_motion_s)
+        else:
+            chars = self._last_move_len + len(self.line_ending)
+            interval = max(chars * config.FIRMWARE_CHAR_PERIOD_S + config.FIRMWARE_MOVE_OVERHEAD_S,
+                           self._last_move_motion_s)
+        probe_s = self.heartbeat.outstanding_chars() * config.FIRMWARE_CHAR_PERIOD_S
+        return interval + self.sequence.remaining_s() + probe_s
 
     def cleanup(self):
         self.disconnect()
@@ -0,0 +1,205 @@
+import os
+import struct
+import threading
+import time
+
+from multiprocessing import shared_memory
+
+import config
+
+# Segment layout (little-endian):
+#   0   header        magic, layout version
+#   8   target block  seqlock counter, target seq, send time (time.time()), Q1, Q2, Q3, Q4L, Q4R (degrees)
+#   72  state block   seqlock counter, JointState version, publish time, EP, EY, WP, LJ, RJ (degrees),
+#                     commanded steps per motor (MotorIndex order)
+# Each block is guarded by a seqlock: the single writer makes the counter odd,
+# writes the payload, then makes it even again. Readers retry if the counter
+# was odd or changed while they copied the payload.
+HEADER = struct.Struct("<4sI")
+MAGIC = b"ELSM"
+LAYOUT_VERSION = 1
+SEQLOCK = struct.Struct("<Q")
+TARGET_PAYLOAD = struct.Struct("<Id5d")
+STATE_PAYLOAD = struct.Struct("<Qd5d8q")
+TARGET_OFFSET = 8
+STATE_OFFSET = 72
+SEGMENT_SIZE = 256
+READ_RETRIES = 100
+
+
+class SharedTargetSegment:
+    """
+    Shared-memory exchange with a teleop process on the same machine: the
+    teleop side writes targets, the driver writes its joint state back. Reads
+    unpack straight from the shared buffer; nothing goes through the kernel.
+
+    The driver creates the segment (create=True) and unlinks it on exit; the
+    teleop process attaches by name.
+    """
+    def __init__(self, name=config.SHM_SEGMENT_NAME, create=False):
+        self.name = name
+        self.created = create
+        if create:
+            try:
+                self._shm = shared_memory.SharedMemory(name=name, create=True, size=SEGMENT_SIZE)
+            except FileExistsError:
+                # Left behind by a driver that did not exit cleanly
+                stale = shared_memory.SharedMemory(name=name)
+                stale.close()
+                stale.unlink()
+                self._shm = shared_memory.SharedMemory(name=name, create=True, size=SEGMENT_SIZE)
+            with _attach_lock:
+                _created.add(name)
+            self._shm.buf[:SEGMENT_SIZE] = bytes(SEGMENT_SIZE)
+            HEADER.pack_into(self._shm.buf, 0, MAGIC, LAYOUT_VERSION)
+        else:
+            self._shm = _attach(name)
+            magic, version = HEADER.unpack_from(self._shm.buf, 0)
+            if magic != MAGIC or version != LAYOUT_VERSION:
+                self._shm.close()
+                raise ValueError(f"Shared memory '{name}' is not an elbow driver segment (layout {version}).")
+        self._buf = self._shm.buf
+        # Writers continue from the counters already in the segment
+        self._target_lock = SEQLOCK.unpack_from(self._buf, TARGET_OFFSET)[0] & ~1
+        self._state_lock = SEQLOCK.unpack_from(self._buf, STATE_OFFSET)[0] & ~1
+        self._target_seq = 0
+
+    # --- Seqlock primitives ---
+    def _write(self, offset, counter, payload, *values):
+        SEQLOCK.pack_into(self._buf, offset, counter + 1)
+        payload.pack_into(self._buf, offset + SEQLOCK.size, *values)
+        SEQLOCK.pack_into(self._buf, offset, counter + 2)
+        return counter + 2
+
+    def _read(self, offset, payload):
+        buf = self._buf
+        data_offset = offset + SEQLOCK.size
+        for _ in range(READ_RETRIES):
+            before = SEQLOCK.unpack_from(buf, offset)[0]
+            if before & 1:
+                continue
+            values = payload.unpack_from(buf, data_offset)
+            if SEQLOCK.unpack_from(buf, offset)[0] == before:
+                return values
+        return None # Writer kept the block busy; try again next poll
+
+    # --- Teleop side ---
+    def write_target(self, values, timestamp=None):
+        """Publishes a target (Q1..Q4R, degrees). Returns its sequence number."""
+        self._target_seq = (self._target_seq + 1) & 0xFFFFFFFF or 1
+        self._target_lock = self._write(TARGET_OFFSET, self._target_lock, TARGET_PAYLOAD,
+                                        self._target_seq, time.time() if timestamp is None else timestamp, *values)
+        return self._target_seq
+
+    def read_state(self):
+        """(version, publish time, angles tuple, motor step tuple), or None if the driver has not written yet."""
+        values = self._read(STATE_OFFSET, STATE_PAYLOAD)
+        if values is None or values[1] == 0.0:
+            return None
+        return values[0], values[1], values[2:7], values[7:]
+
+    # --- Driver side ---
+    def read_target(self):
+        """(seq, send time, Q1, Q2, Q3, Q4L, Q4R); seq is 0 until the teleop side writes."""
+        return self._read(TARGET_OFFSET, TARGET_PAYLOAD)
+
+    def write_state(self, snapshot):
+        """Publishes a JointSnapshot."""
+        self._state_lock = self._write(STATE_OFFSET, self._state_lock, STATE_PAYLOAD,
+                                       snapshot.version, time.time(), *snapshot.angles, *snapshot.motor_targets)
+
+    def close(self):
+        if self._shm is None:
+            return
+        self._buf = None
+        self._shm.close()
+        if self.created:
+            with _attach_lock:
+                _created.discard(self.name)
+            try:
+                self._shm.unlink()
+            except FileNotFoundError:
+                pass
+        self._shm = None
+
+
+_attach_lock = threading.Lock()
+_created = set() # Segments this process created; their tracker registration is the creator's to keep
+
+
+def _attach(name):
+    """Opens an existing segment without leaving it with this process' resource tracker (it belongs to the creator)."""
+    try:
+        return shared_memory.SharedMemory(name=name, track=False) # Python 3.13+
+    except TypeError:
+        pass
+    # Older Pythons always register the segment (POSIX only); take back just this one
+    with _attach_lock:
+        shm = shared_memory.SharedMemory(name=name)
+        if os.name == "posix" and name not in _created:
+            from multiprocessing import resource_tracker
+            resource_tracker.unregister(shm._name, "shared_memory")
+    return shm
+
+
+class ShmTargetPoller(threading.Thread):
+    """
+    Driver side of a SharedTargetSegment. Every period_s it checks for a new
+    target (publishing it to the TargetMailbox unless it is older than
+    max_age_s) and writes the JointState snapshot back when it has changed.
+    """
+    def __init__(self, segment, target_mailbox, joint_state, log_callback,
+                 period_s=config.SHM_POLL_PERIOD_S, max_age_s=config.SHM_MAX_TARGET_AGE_S):
+        super().__init__(daemon=True)
+        self.segment = segment
+        self._target_mailbox = target_mailbox
+        self._joint_state = joint_state
+        self._log_callback = log_callback
+        self.period_s = period_s
+        self.max_age_s = max_age_s
+        self._stop_event = threading.Event()
+
+        self.accepted = 0
+        self.dropped_stale = 0
+        self.states_published = 0
+
+    def run(self):
+        self._log_callback(f"SHM Thread: Polling shared memory '{self.segment.name}' every {self.period_s * 1000:.1f} ms.")
+        segment = self.segment
+        mailbox = self._target_mailbox
+        last_seq = 0
+        last_version = -1
+        try:
+            while not self._stop_event.wait(self.period_s):
+                target = segment.read_target()
+                if target is not None and target[0] != last_seq:
+                    last_seq = target[0]
+                    if self.max_age_s and time.time() - target[1] > self.max_age_s:
+                        self.dropped_stale += 1
+                    else:
+                        self.accepted += 1
+                        mailbox.publish(target[2:], target[1])
+
+                snapshot = self._joint_state.snapshot()
+                if snapshot.version != last_version:
+                    last_version = snapshot.version
+                    segment.write_state(snapshot)
+                    self.states_published += 1
+        except Exception as e:
+            self._log_callback(f"SHM Thread: An error occurred during run: {e}", level="error")
+        finally:
+            self._log_callback("SHM Thread: Exiting.")
+
+    def stop(self):
+        """Signals the thread's run loop to terminate."""
+        self._stop_event.set()
+
+    def stats(self):
+        return {
+            "shm_accepted": self.accepted,
+            "shm_dropped_stale": self.dropped_stale,
+            "shm_states_published": self.states_published,
+        }
+
+    def summary(self):
+        return ", ".join(f"{k[4:]}={v}" for k, v in self.stats().items())
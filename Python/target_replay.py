@@ -0,0 +1,209 @@
+"""
+Replays a recorded joint target stream through the move pipeline with no
+GUI and no serial link, as fast as the CPU allows.
+
+Targets go through MotionController.apply_target_values (ROS_MIN_DELTA_DEG
+deadband, q*_pl step math, MOVE_ALL_MOTORS encoding) on a simulated clock
+that follows the TargetStreamer: one tick every --period-ms, the newest
+sample at each tick, held back while the modelled firmware is still busy
+with the previous move (--no-pace to send on every tick). --period-ms 0
+applies every sample.
+
+Input CSV, either:
+  time,Q1,Q2,Q3,Q4L,Q4R          targets in degrees (time in seconds)
+  rostopic echo -b session.bag -p /cccleft11/joint_states > session.csv
+                                 JointState export (%time in ns, field.name*/field.position*)
+
+    python target_replay.py session.csv [--out moves.csv] [--compare expected.csv] [--period-ms 100]
+
+--out writes "time,command" per move; --compare checks the sequence
+against an earlier --out and exits 1 at the first difference, so a whole
+session is a regression test for the step math. --validate first checks
+every target against the precomputed workspace (workspace.py).
+"""
+import argparse
+import csv
+import sys
+import time
+
+import config
+from motion_controller import MotionController, TARGET_KEYS
+from pipeline_timing import PipelineTiming
+from latency_histogram import LatencyHistogram
+from limit_guard import LimitGuard
+from log_writer import no_log
+from motion_profile import command_duration_s
+from ros_interface import joint_name_index, joint_state_to_target
+
+
+class CommandRecorder:
+    """
+    Stands in for SerialHandler at the end of the pipeline: keeps every
+    command instead of writing it, and reports the quiet-firmware link
+    model from SerialHandler.move_interval_s().
+    """
+    def __init__(self, line_ending=config.SERIAL_LINE_ENDING):
+        self.line_ending = line_ending
+        self.pipeline_timing = PipelineTiming(config.PIPELINE_TIMING_ENABLED)
+        self.limit_guard = LimitGuard() # Unseeded, so it never rejects a move
+        self.command_count = 0
+        self.commands = []
+        self.clock = 0.0 # Simulated time of the sample being applied
+        self._last_move_len = 0
+        self._last_move_motion_s = 0.0
+
+    def send_command(self, command, origin=None):
+        self.command_count += 1
+        self.commands.append((self.clock, command))
+        self.limit_guard.on_command_sent(command)
+        self._last_move_len = len(command)
+        self._last_move_motion_s = command_duration_s(command)
+        return True
+
+    def move_interval_s(self):
+        chars = self._last_move_len + len(self.line_ending)
+        return max(chars * config.FIRMWARE_CHAR_PERIOD_S + config.FIRMWARE_MOVE_OVERHEAD_S, self._last_move_motion_s)
+
+
+def read_targets(path):
+    """Returns [(time_s, [Q1, Q2, Q3, Q4L, Q4R])] from either CSV layout, in file order."""
+    samples = []
+    with open(path, newline="") as f:
+        reader = csv.reader(f)
+        header = [h.strip() for h in next(reader)]
+        if "%time" in header:
+            time_col = header.index("%time")
+            name_cols = [i for i, h in enumerate(header) if h.startswith("field.name")]
+            position_cols = [i for i, h in enumerate(header) if h.startswith("field.position")]
+            last_names = index = None
+            for row in reader:
+                names = tuple(row[i] for i in name_cols)
+                if names != last_names:
+                    last_names, index = names, joint_name_index(names)
+                if index is None:
+                    continue
+                position = [float(row[i]) for i in position_cols]
+                samples.append((int(row[time_col]) * 1e-9, joint_state_to_target(position, index, [0.0] * len(TARGET_KEYS))))
+        else:
+            columns = [header.index(key) for key in TARGET_KEYS]
+            time_col = header.index("time")
+            for row in reader:
+                if row:
+                    samples.append((float(row[time_col]), [float(row[i]) for i in columns]))
+    return samples
+
+
+def replay(samples, period_s=config.ROS_UPDATE_FREQ_MS / 1000.0, pace_to_link=config.TARGET_PACE_TO_LINK):
+    """Runs the samples through a MotionController. Returns (recorder, controller, stats)."""
+    recorder = CommandRecorder()
+    controller = MotionController(recorder, log_callback=no_log)
+    apply_time = LatencyHistogram("apply_target")
+    stats = {"samples": len(samples), "ticks": 0, "link_busy_ticks": 0, "targets_applied": 0,
+             "targets_within_deadband": 0}
+
+    def apply(t, values):
+        recorder.clock = t
+        started = time.perf_counter()
+        moved = controller.apply_target_values(values)
+        apply_time.record(time.perf_counter() - started)
+        stats["targets_applied"] += 1
+        if not moved:
+            stats["targets_within_deadband"] += 1
+        return moved
+
+    if period_s <= 0:
+        for t, values in samples:
+            apply(t, values)
+    elif samples:
+        next_sample = 0
+        latest = None # Newest sample not yet taken, like the mailbox
+        last_send = None
+        start = samples[0][0]
+        end = samples[-1][0]
+        tick = start
+        while tick <= end + period_s:
+            stats["ticks"] += 1
+            while next_sample < len(samples) and samples[next_sample][0] <= tick:
+                latest = samples[next_sample]
+                next_sample += 1
+            if latest is not None:
+                if pace_to_link and last_send is not None and tick - last_send < recorder.move_interval_s():
+                    stats["link_busy_ticks"] += 1
+                else:
+                    if apply(tick, latest[1]):
+                        last_send = tick
+                    latest = None
+            tick = start + stats["ticks"] * period_s
+    stats["moves"] = len(recorder.commands)
+    stats["apply_target"] = apply_time
+    return recorder, controller, stats
+
+
+def compare_commands(commands, expected_path):
+    """Returns None if the command sequence matches an earlier --out file, else a description of the first difference."""
+    with open(expected_path, newline="") as f:
+        reader = csv.reader(f)
+        next(reader)
+        expected = [row[1] for row in reader if row]
+    for i, ((_, command), want) in enumerate(zip(commands, expected)):
+        if command != want:
+            return f"move {i}: got {command}, expected {want}"
+    if len(commands) != len(expected):
+        return f"{len(commands)} moves, expected {len(expected)}"
+    return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay a recorded target stream through the move pipeline offline.")
+    parser.add_argument("input", help="Target CSV (time,Q1..Q4R) or a rostopic JointState CSV export")
+    parser.add_argument("--period-ms", type=float, default=config.ROS_UPDATE_FREQ_MS,
+                        help="Scheduler period; 0 applies every sample")
+    parser.add_argument("--no-pace", action="store_true", help="Do not hold targets while the modelled link is busy")
+    parser.add_argument("--out", help="Write time,command per move")
+    parser.add_argument("--compare", help="Check the moves against an earlier --out file")
+    parser.add_argument("--validate", action="store_true", help="Check every target against the workspace first")
+    args = parser.parse_args(argv)
+
+    load_started = time.perf_counter()
+    samples = read_targets(args.input)
+    load_s = time.perf_counter() - load_started
+    if args.validate and samples:
+        from workspace import default_workspace
+        workspace = default_workspace()
+        started = time.perf_counter()
+        check = workspace.validate_trajectory([values for _, values in samples])
+        elapsed = time.perf_counter() - started
+        verdict = "all inside the workspace" if check.ok else \
+            f"{sum(1 for v in check.violations if v)} outside the workspace, first {check.message}"
+        print(f"Validated {len(samples)} targets in {elapsed * 1000:.1f} ms: {verdict}")
+    started = time.perf_counter()
+    recorder, controller, stats = replay(samples, args.period_ms / 1000.0, not args.no_pace)
+    elapsed = time.perf_counter() - started
+
+    duration = samples[-1][0] - samples[0][0] if samples else 0.0
+    print(f"{stats['samples']} samples ({duration:.1f} s of stream, read in {load_s:.2f} s) -> {stats['moves']} moves "
+          f"in {elapsed:.2f} s ({stats['moves'] / elapsed if elapsed else 0:.0f} moves/s)")
+    print(f"Targets applied: {stats['targets_applied']}, within deadband: {stats['targets_within_deadband']}, "
+          f"ticks held for the link: {stats['link_busy_ticks']}")
+    print(stats["apply_target"].summary())
+    for line in recorder.pipeline_timing.summary_lines():
+        print(line)
+    print(f"Final joint angles: {controller.cumulative_degrees}")
+
+    if args.out:
+        with open(args.out, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["time", "command"])
+            writer.writerows((f"{t:.6f}", command) for t, command in recorder.commands)
+        print(f"Moves written to {args.out}")
+    if args.compare:
+        difference = compare_commands(recorder.commands, args.compare)
+        if difference:
+            print(f"Differs from {args.compare}: {difference}")
+            return 1
+        print(f"Matches {args.compare}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
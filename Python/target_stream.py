@@ -0,0 +1,178 @@
+import threading
+import time
+
+import config
+from latency_histogram import LatencyHistogram
+from motion_controller import TARGET_KEYS
+
+
+class TargetMailbox:
+    """
+    Latest-value slot for absolute joint targets (degrees, TARGET_KEYS order).
+
+    Producers (ROS callback, other inputs) overwrite the slot; nothing queues
+    up, and the consumer always gets the newest target. Stamps are wall-clock
+    (time.time()) source timestamps: when the target was produced if the
+    input carries that, otherwise when it arrived on this host.
+    """
+    def __init__(self, size=len(TARGET_KEYS)):
+        self._values = [0.0] * size
+        self._stamp = 0.0
+        self._seq = 0
+        self._taken_seq = 0
+        self._cond = threading.Condition()
+        self.published = 0
+        self.overwritten = 0 # Targets replaced before the consumer took them
+
+    def publish(self, values, stamp=None):
+        """Overwrites the slot with a new target. Safe to call from any thread."""
+        with self._cond:
+            self._values[:] = values
+            self._stamp = time.time() if stamp is None else stamp
+            if self._seq != self._taken_seq:
+                self.overwritten += 1
+            self._seq += 1
+            self.published += 1
+            self._cond.notify()
+
+    def take(self, out, timeout=None):
+        """
+        Waits for a target newer than the last one taken and copies it into `out`.
+        Returns its stamp, or None on timeout.
+        """
+        with self._cond:
+            if self._seq == self._taken_seq:
+                if timeout == 0 or not self._cond.wait_for(lambda: self._seq != self._taken_seq, timeout):
+                    return None
+            out[:] = self._values
+            self._taken_seq = self._seq
+            return self._stamp
+
+    def pending(self):
+        """True if a target is waiting to be taken."""
+        return self._seq != self._taken_seq
+
+    def clear(self):
+        """Discards a target that has not been taken yet."""
+        with self._cond:
+            self._taken_seq = self._seq
+
+
+class TargetStreamer(threading.Thread):
+    """
+    Fixed-period scheduler for a TargetMailbox. On every tick of a steady
+    clock (period_s) it sends the newest target, unless:
+      - the target is older than deadline_s (from its source timestamp): dropped;
+      - the serial link has not finished the previous move
+        (serial_handler.move_interval_s()) and pace_to_link is set: the target
+        stays in the mailbox and is merged with whatever arrives before the
+        next tick. Without pacing, moves queue up in the firmware's input.
+    With a planner (motion_planner.SegmentStreamer) the target retargets the
+    planned trajectory instead of going out as one move; the planner paces
+    its segments to the link itself.
+    Ticks that start more than a period late and ticks lost to a busy link are
+    counted as deadline misses, so the period can be tuned against what the
+    SyncWrite cycle sustains.
+    """
+    def __init__(self, mailbox, motion_controller, serial_handler, period_s, log_callback,
+                 deadline_s=config.TARGET_DEADLINE_S, pace_to_link=config.TARGET_PACE_TO_LINK, planner=None):
+        super().__init__(daemon=True)
+        self.mailbox = mailbox
+        self.motion_controller = motion_controller
+        self.serial_handler = serial_handler
+        self.period_s = period_s # May be changed while running
+        self.deadline_s = deadline_s
+        self.pace_to_link = pace_to_link
+        self.planner = planner
+        self._log_callback = log_callback
+        self._stop_event = threading.Event()
+
+        self.age_histogram = LatencyHistogram("target_age_at_send")
+        self.ticks = 0
+        self.late_ticks = 0
+        self.link_busy_ticks = 0
+        self.dropped_stale = 0
+        self._stale_run = 0 # Targets dropped as stale in a row
+        self.moves_sent = 0
+        self.targets_within_deadband = 0
+
+    def run(self):
+        values = [0.0] * len(TARGET_KEYS)
+        next_tick = time.monotonic()
+        last_send = None
+        while not self._stop_event.is_set():
+            period = max(self.period_s, 0.001)
+            next_tick += period
+            delay = next_tick - time.monotonic()
+            if delay > 0:
+                if self._stop_event.wait(delay):
+                    break
+            elif -delay > period:
+                # The previous tick overran by a whole period; restart the clock instead of bursting
+                self.late_ticks += 1
+                next_tick = time.monotonic()
+            self.ticks += 1
+
+            if not self.mailbox.pending():
+                continue
+            if self.pace_to_link and not self.planner and last_send is not None and time.monotonic() - last_send < self.serial_handler.move_interval_s():
+                self.link_busy_ticks += 1
+                continue
+            stamp = self.mailbox.take(values, timeout=0)
+            if stamp is None:
+                continue
+            age = time.time() - stamp
+            self.serial_handler.pipeline_timing.record("target_queued", age)
+            if self.deadline_s and age > self.deadline_s:
+                self.dropped_stale += 1
+                self._stale_run += 1
+                if self._stale_run == config.TARGET_STALE_WARN_COUNT:
+                    self._log_callback(f"The last {self._stale_run} targets were all older than the {self.deadline_s:g} s "
+                                       f"deadline ({age:.2f} s); check the source's clock, ROS_USE_HEADER_STAMP "
+                                       "or UDP_USE_SEND_STAMP.",
+                                       level="warning")
+                continue
+            if self._stale_run >= config.TARGET_STALE_WARN_COUNT:
+                self._log_callback("Targets are fresh again.")
+            self._stale_run = 0
+
+            try:
+                if self.planner:
+                    moved = self.planner.track(values)
+                else:
+                    moved = self.motion_controller.apply_target_values(values)
+            except Exception as e:
+                self._log_callback(f"Error processing target: {e}", level="error")
+                continue
+            if moved:
+                last_send = time.monotonic()
+                self.moves_sent += 1
+                self.age_histogram.record(age)
+            else:
+                self.targets_within_deadband += 1
+
+    def stop(self):
+        self._stop_event.set()
+
+    def stats(self):
+        """Counters for export alongside the age histogram."""
+        return {
+            "period_s": self.period_s,
+            "deadline_s": self.deadline_s,
+            "pace_to_link": self.pace_to_link,
+            "ticks": self.ticks,
+            "deadline_misses": self.late_ticks + self.link_busy_ticks,
+            "late_ticks": self.late_ticks,
+            "link_busy_ticks": self.link_busy_ticks,
+            "targets_published": self.mailbox.published,
+            "targets_merged": self.mailbox.overwritten,
+            "targets_dropped_stale": self.dropped_stale,
+            "moves_sent": self.moves_sent,
+            "targets_within_deadband": self.targets_within_deadband,
+        }
+
+    def summary(self):
+        s = self.stats()
+        return (f"{self.age_histogram.summary()} | sent={s['moves_sent']} merged={s['targets_merged']} "
+                f"stale={s['targets_dropped_stale']} deadband={s['targets_within_deadband']} "
+                f"misses={s['deadline_misses']} (late={s['late_ticks']} link_busy={s['link_busy_ticks']}) ticks={s['ticks']}")
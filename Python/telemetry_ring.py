@@ -0,0 +1,133 @@
+import threading
+import time
+
+import numpy as np
+
+import config
+
+MOTOR_COUNT = 8
+
+# One telemetry frame. Files written by TelemetryLogger are a bare sequence of
+# these records: np.fromfile(path, dtype=FRAME_DTYPE)
+FRAME_DTYPE = np.dtype([
+    ("received", "<f8"), # Host time.time() when the frame was read
+    ("board_ms", "<u4"), # Board millis() when the positions were read (wraps)
+    ("positions", "<i4", (MOTOR_COUNT,)), # Present positions, MotorIndex order, ticks
+])
+
+
+class TelemetryRing:
+    """
+    Preallocated ring of present-position frames: one writer (the serial
+    reader), any number of readers, no locks.
+
+    Frame i lives in row i % capacity. The writer fills the row, then bumps
+    count, so every row below count is complete by the time a reader sees
+    it. Readers get NumPy views into the ring rather than copies; a view
+    stays valid until the writer laps it, capacity frames later. Readers
+    that keep data longer copy it, or check lapped() after using it.
+    """
+    def __init__(self, capacity=config.TELEMETRY_RING_SIZE):
+        self.capacity = capacity
+        self.frames = np.zeros(capacity, dtype=FRAME_DTYPE)
+        self.count = 0 # Frames written so far
+
+    # --- Writer (one thread) ---
+    def write(self, board_ms, positions, received=None):
+        row = self.frames[self.count % self.capacity]
+        row["positions"] = positions
+        row["board_ms"] = board_ms
+        row["received"] = time.time() if received is None else received
+        self.count += 1 # Publishes the row
+
+    # --- Readers (any thread) ---
+    def latest(self):
+        """(frame number, frame view) of the newest frame, or None."""
+        count = self.count
+        if count == 0:
+            return None
+        return count - 1, self.frames[(count - 1) % self.capacity]
+
+    def since(self, frame):
+        """
+        Views of the frames from number `frame` up to the newest, as a list of
+        one or two chunks (two when the range wraps), and the frame number to
+        pass next time. Frames already overwritten are skipped.
+        """
+        count = self.count
+        frame = max(frame, count - self.capacity)
+        if frame >= count:
+            return [], count
+        start, end = frame % self.capacity, count % self.capacity or self.capacity
+        if start < end:
+            return [self.frames[start:end]], count
+        return [self.frames[start:], self.frames[:end]], count
+
+    def lapped(self, frame):
+        """True if frame number `frame` has been overwritten, so views taken of it are stale."""
+        return self.count - frame > self.capacity
+
+    def rate_hz(self, frames=50):
+        """Frame rate over the last frames, from the board clock."""
+        count = self.count
+        n = min(frames, count, self.capacity)
+        if n < 2:
+            return None
+        first = int(self.frames["board_ms"][(count - n) % self.capacity])
+        last = int(self.frames["board_ms"][(count - 1) % self.capacity])
+        elapsed_ms = (last - first) & 0xFFFFFFFF
+        return (n - 1) * 1000.0 / elapsed_ms if elapsed_ms else None
+
+    def summary(self):
+        latest = self.latest()
+        if latest is None:
+            return "no frames"
+        frame, row = latest
+        rate = self.rate_hz()
+        rate_text = f"{rate:.1f} Hz" if rate else "-"
+        return f"frames={frame + 1} rate={rate_text} age={time.time() - row['received']:.2f}s latest={row['positions'].tolist()}"
+
+
+class TelemetryLogger(threading.Thread):
+    """
+    Appends every frame that passes through the ring to a file, writing the
+    ring's own rows (no per-frame conversion). The ring must hold more than
+    flush_interval_s of frames or the logger reports the frames it lost.
+    """
+    def __init__(self, ring, filepath, log_callback, flush_interval_s=config.TELEMETRY_LOG_FLUSH_S):
+        super().__init__(daemon=True)
+        self.ring = ring
+        self.filepath = filepath
+        self.log = log_callback
+        self.flush_interval_s = flush_interval_s
+        self.frames_written = 0
+        self.frames_lost = 0
+        self._next_frame = ring.count # Only frames from now on
+        self._stop_event = threading.Event()
+
+    def run(self):
+        try:
+            with open(self.filepath, "wb") as f:
+                while not self._stop_event.wait(self.flush_interval_s):
+                    self._flush(f)
+                self._flush(f)
+        except OSError as e:
+            self.log(f"Telemetry log {self.filepath} failed: {e}", level="error")
+
+    def _flush(self, f):
+        wanted = self._next_frame
+        chunks, self._next_frame = self.ring.since(wanted)
+        for chunk in chunks:
+            f.write(chunk.data) # Contiguous slices of the ring
+        written = sum(len(chunk) for chunk in chunks)
+        self.frames_written += written
+        self.frames_lost += self._next_frame - wanted - written
+        if chunks and self.ring.lapped(self._next_frame - written):
+            self.log("Telemetry ring lapped the logger while it was writing; last chunk may be mixed.", level="warning")
+        f.flush()
+
+    def stop(self):
+        self._stop_event.set()
+
+    def summary(self):
+        return f"{self.frames_written} frames to {self.filepath}, {self.frames_lost} lost"
@@ -0,0 +1,49 @@
+"""LimitGuard bookkeeping, fed the lines the firmware prints."""
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from command_codec import RESPONSE_OTHER, classify_response, encode_move_all
+from limit_guard import LimitGuard
+
+
+def respond(guard, line):
+    guard.on_response(line, classify_response(line))
+
+
+class LimitGuardTest(unittest.TestCase):
+    def test_blocks_a_move_outside_the_seeded_limits(self):
+        guard = LimitGuard(enabled=True)
+        guard.seed(2850, 3768, 2000, 3000)
+        self.assertIsNotNone(guard.check([-1000, 0, 0, 0, 0, 0, 0, 0]))
+        self.assertIsNone(guard.check([-100, 0, 0, 0, 0, 0, 0, 0]))
+
+    def test_find_limits_leaves_the_motors_at_their_new_maximum(self):
+        guard = LimitGuard(enabled=True)
+        guard.seed(2850, 3768, 2000, 3000)
+        guard.on_command_sent("FIND_LIMITS")
+        self.assertEqual(guard.positions, [None, None])
+        self.assertIsNone(guard.check([-700, 0, 0, 0, 0, 0, 0, 0])) # Position unknown while it runs
+        respond(guard, "Theta1: 3700 -> 4500")
+        respond(guard, "Theta2: 1900 -> 3100")
+        self.assertEqual(guard.limits, [(3700, 4500), (1900, 3100)])
+        self.assertEqual(guard.positions, [(4500, 4500), (3100, 3100)])
+        self.assertIsNone(guard.check([-700, 0, 0, 0, 0, 0, 0, 0])) # 3800 is inside the new limits
+        self.assertIsNotNone(guard.check([-900, 0, 0, 0, 0, 0, 0, 0]))
+        self.assertIsNotNone(guard.check([0, 100, 0, 0, 0, 0, 0, 0]))
+
+    def test_executed_moves_shift_the_position(self):
+        guard = LimitGuard(enabled=True)
+        guard.seed(0, 1000, 0, 1000)
+        guard.on_command_sent("FIND_LIMITS")
+        respond(guard, "Theta1: 0 -> 1000")
+        guard.on_command_sent(encode_move_all([-400, 0, 0, 0, 0, 0, 0, 0]))
+        respond(guard, "> [SyncWrite] Success. Command sent.")
+        self.assertEqual(guard.positions[0], (600, 600))
+        self.assertEqual(classify_response("Theta1: 0 -> 1000"), RESPONSE_OTHER)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,51 @@
+"""Heartbeat probes against the emulated driver (POSIX only: the emulator needs a pty)."""
+import os
+import sys
+import time
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import config
+from command_codec import encode_move_all
+from firmware_emulator import FirmwareEmulator
+from log_writer import no_log
+from serial_handler import SerialHandler
+
+
+class LinkHeartbeatTest(unittest.TestCase):
+    def connect(self, interval_s):
+        self.addCleanup(setattr, config, "SERIAL_CONNECT_DELAY", config.SERIAL_CONNECT_DELAY)
+        config.SERIAL_CONNECT_DELAY = 0 # A pty does not reset the board
+        emulator = FirmwareEmulator(verbose=True)
+        port = emulator.start()
+        serial_handler = SerialHandler(log_callback=no_log)
+        serial_handler.heartbeat.mode = "ping"
+        serial_handler.heartbeat.interval_s = interval_s
+        self.assertTrue(serial_handler.connect(port))
+        self.addCleanup(emulator.stop)
+        self.addCleanup(serial_handler.disconnect)
+        return emulator, serial_handler
+
+    def test_probes_an_idle_link(self):
+        emulator, serial_handler = self.connect(0.2)
+        time.sleep(1.5)
+        self.assertGreater(serial_handler.heartbeat.rtt_histogram.count, 0)
+        self.assertEqual(serial_handler.heartbeat.outstanding_chars(), 0)
+
+    def test_no_probes_while_moves_are_acknowledged(self):
+        emulator, serial_handler = self.connect(1.0) # Longer than a verbose move takes to be acknowledged
+        heartbeat = serial_handler.heartbeat
+        end = time.monotonic() + 4.0
+        sent_before = None
+        while time.monotonic() < end:
+            serial_handler.send_command(encode_move_all([0, 0, 1, -1, 0, 0, 0, 0]))
+            time.sleep(serial_handler.move_interval_s())
+            if sent_before is None and serial_handler.last_ack_time is not None:
+                sent_before = heartbeat.probes_sent
+        self.assertIsNotNone(sent_before)
+        self.assertLessEqual(heartbeat.probes_sent - sent_before, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
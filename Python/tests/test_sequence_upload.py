@@ -0,0 +1,127 @@
+"""Sequence uploads against the emulated driver (POSIX only: the emulator needs a pty)."""
+import os
+import sys
+import threading
+import time
+import unittest
+
+import serial
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import config
+from command_codec import encode_update_limits
+from firmware_emulator import FirmwareEmulator
+from log_writer import no_log
+from serial_handler import SerialHandler
+
+WAYPOINTS = [[0, 0, 10, -10, 20, -20, 5, -5]] * 4
+
+
+class FailingPort:
+    """Serial port stand-in whose writes raise once fail is set."""
+    is_open = True
+    fail = False
+
+    def write(self, data):
+        if self.fail:
+            raise serial.SerialException("write failed")
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.is_open = False
+
+
+class SequenceUploadTest(unittest.TestCase):
+    def connect(self, **emulator_options):
+        self.addCleanup(setattr, config, "SERIAL_CONNECT_DELAY", config.SERIAL_CONNECT_DELAY)
+        config.SERIAL_CONNECT_DELAY = 0 # A pty does not reset the board
+        emulator = FirmwareEmulator(verbose=False, **emulator_options)
+        port = emulator.start()
+        serial_handler = SerialHandler(log_callback=no_log)
+        serial_handler.heartbeat.mode = "off"
+        self.assertTrue(serial_handler.connect(port))
+        self.addCleanup(emulator.stop)
+        self.addCleanup(serial_handler.disconnect)
+        serial_handler.send_command(encode_update_limits(-100000, 100000, -100000, 100000))
+        return emulator, serial_handler
+
+    def test_runs_every_waypoint(self):
+        emulator, serial_handler = self.connect()
+        self.assertTrue(serial_handler.sequence.upload(WAYPOINTS))
+        self.assertTrue(serial_handler.sequence.wait(10))
+        self.assertEqual(serial_handler.sequence.executed, len(WAYPOINTS))
+        self.assertEqual(emulator.positions[2], 2048 + 10 * len(WAYPOINTS))
+
+    def test_firmware_without_sequence_ignores_the_block(self):
+        emulator, serial_handler = self.connect(sequences_supported=False)
+        interval = serial_handler.move_interval_s()
+        uploader = serial_handler.sequence
+        self.assertTrue(uploader.upload(WAYPOINTS))
+        self.assertFalse(uploader.wait(10))
+        self.assertEqual(uploader.error, "ignored")
+        self.assertFalse(uploader.running)
+        self.assertEqual(serial_handler.move_interval_s(), interval)
+        self.assertTrue(uploader.upload(WAYPOINTS)) # Not refused as "already running"
+        uploader.wait(10)
+
+    def test_no_answer_times_out(self):
+        emulator, serial_handler = self.connect(sequences_supported=False, ping_supported=False)
+        uploader = serial_handler.sequence
+        uploader.start_timeout_s = 0.2
+        self.assertTrue(uploader.upload(WAYPOINTS))
+        started = time.monotonic()
+        self.assertFalse(uploader.wait(10))
+        self.assertLess(time.monotonic() - started, 5)
+        self.assertEqual(uploader.error, "no answer")
+        self.assertEqual(uploader.remaining_s(), 0.0)
+
+
+    def test_profiles_without_accelerations(self):
+        emulator, serial_handler = self.connect()
+        self.assertTrue(serial_handler.sequence.upload(WAYPOINTS, velocities=[[40] * 8] * len(WAYPOINTS)))
+        self.assertTrue(serial_handler.sequence.wait(10))
+
+
+class FailedWriteTest(unittest.TestCase):
+    def setUp(self):
+        self.port = FailingPort()
+        self.serial_handler = SerialHandler(log_callback=no_log)
+        self.serial_handler.serial_port = self.port
+        self.serial_handler.is_connected = True
+        self.serial_handler.send_command(encode_update_limits(-100000, 100000, -100000, 100000))
+
+    def run_unblocked(self, target):
+        """Runs target in a thread; fails the test if it is still blocked after a few seconds."""
+        result = []
+        thread = threading.Thread(target=lambda: result.append(target()), daemon=True)
+        thread.start()
+        thread.join(5)
+        self.assertFalse(thread.is_alive(), "deadlocked")
+        return result[0]
+
+    def test_upload_returns_when_the_write_fails(self):
+        self.port.fail = True
+        uploader = self.serial_handler.sequence
+        self.assertFalse(self.run_unblocked(lambda: uploader.upload(WAYPOINTS)))
+        self.assertFalse(uploader.running)
+        self.assertFalse(self.serial_handler.is_connected)
+        self.assertEqual(uploader.uploads_aborted, 1)
+
+    def test_next_block_write_fails(self):
+        uploader = self.serial_handler.sequence
+        waypoints = [[0, 0, 1000, -1000, 2000, -2000, 500, -500]] * 1000 # Several blocks
+        self.assertTrue(uploader.upload(waypoints))
+        first = len(uploader._block_steps)
+        self.port.fail = True
+        self.serial_handler._handle_line(f"SEQ_START {first}\n".encode())
+        self.run_unblocked(lambda: self.serial_handler._handle_line(f"SEQ_DONE {first}\n".encode()))
+        self.assertFalse(uploader.running)
+        self.assertEqual(uploader.executed, first)
+        self.assertEqual(uploader.uploads_aborted, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,41 @@
+"""Workspace tables and trajectory validation in the target convention the ROS stream uses."""
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from ros_interface import joint_state_to_target
+from workspace import OUT_OF_RANGE, Workspace
+
+JOINT_INDEX = (0, 1, 2, 3) # Pitch, yaw, wrist, jaw in the JointState position list
+
+
+class ValidateTrajectoryTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.workspace = Workspace.build(step_deg=0.5)
+
+    def ros_targets(self, positions):
+        return [joint_state_to_target(position, JOINT_INDEX, [0.0] * 5) for position in positions]
+
+    def test_ros_targets_are_in_range(self):
+        sweep = np.linspace(-1.4, 1.4, 50)
+        targets = self.ros_targets(np.column_stack([sweep, -sweep, sweep / 2, np.abs(sweep)]))
+        check = self.workspace.validate_trajectory(targets, budget_mm=None)
+        self.assertTrue(check.ok, check.message)
+        self.assertLess(targets[0][0], 0) # Q1 and Q4L arrive negated
+        self.assertLess(targets[0][3], 0)
+
+    def test_wrong_sign_is_out_of_range(self):
+        target = self.ros_targets([[0.0, 0.0, 0.0, 0.0]])[0]
+        target[0] = -target[0]
+        check = self.workspace.validate_trajectory([target], budget_mm=None)
+        self.assertEqual(check.violations[0], OUT_OF_RANGE)
+        self.assertIn("Q1=90.00 outside -180..0 deg", check.message)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,287 @@
+"""
+Monte-Carlo tolerance analysis of the cable path lengths.
+
+Samples perturbed geometry sets around the current constants
+(geometry_params.load_geometry), evaluates every cable of the model over
+the joint range with the vectorised kinematics (kinematics_vec.py) and
+reports how far each cable's length change (relative to the reference
+pose, which is what the step counts follow) can drift from the nominal
+one, and which constants cause it.
+
+    python tolerance_analysis.py q3_pl [--samples 1000000] [--tol r1_c=0.01,L2_c=0.05] [--jobs 4]
+    python tolerance_analysis.py kinematic_q4 --length-mm 0.01 --distribution uniform --npz q4_tol.npz
+
+Tolerances are +/- limits in mm (lengths, radii, positions) and degrees (the
+kinematic models' lag/wrap angles); --distribution normal treats the limit
+as 3 sigma, uniform samples inside it. The joint angle grid and nominal
+lengths live in one shared-memory block that every worker maps read-only;
+workers evaluate --chunk sets per call and send back only running sums,
+deviation histograms and the regression terms, so memory stays flat for
+any --samples.
+
+Sensitivity: a linear fit of the deviation at every grid angle on the
+sampled perturbations gives each constant's deviation per full tolerance
+(the largest over the range is reported) and its share of the cable's
+variance summed over the range.
+"""
+import argparse
+import math
+import os
+import sys
+import time
+from multiprocessing import Pool, shared_memory
+
+import numpy as np
+
+import config
+from geometry_params import DEFAULT_GEOMETRY, load_geometry
+from kinematics_vec import MODEL_CABLES, cable_lengths
+
+# Model -> (grid start, grid end, reference angle), degrees in the model's own convention
+MODEL_RANGES = {
+    "kinematic_q3": (-90.0, 90.0, 0.0),
+    "kinematic_q4": (-90.0, 90.0, 0.0),
+    "q3_pl": (0.0, 180.0, 90.0),
+}
+ANGLE_CONSTANTS = ("a_lag_q", "b_lag_horizontal", "CD_angle") # Degrees; every other constant is a length
+HISTOGRAM_BINS = 400
+BAND_PERCENTILES = (2.5, 50.0, 97.5)
+
+_shared = {} # Worker-side view of the shared angle grid / nominal lengths
+
+
+def tolerance_limits(model, names, length_mm, angle_deg, overrides=None):
+    """+/- limit of each constant in the model's own units (the kinematic models work in metres)."""
+    unit = 1e-3 if model.startswith("kinematic") else 1.0
+    limits = []
+    for name in names:
+        value = (overrides or {}).get(name, angle_deg if name in ANGLE_CONSTANTS else length_mm)
+        limits.append(value if name in ANGLE_CONSTANTS else value * unit)
+    return np.array(limits)
+
+
+def _deviations(model, nominal, names, limits, distribution, rng, count, angles, nominal_delta, ref_index):
+    """
+    Samples count geometry sets; returns (z, deviation) with z the perturbations
+    in units of each tolerance (n, params) and deviation the length-change error
+    (n, cables, angles) in um. Sets the model cannot evaluate are dropped.
+    """
+    if distribution == "normal":
+        z = rng.standard_normal((count, len(names))) / 3.0
+    else:
+        z = rng.uniform(-1.0, 1.0, (count, len(names)))
+    g = dict(nominal)
+    for i, name in enumerate(names):
+        g[name] = nominal[name] + limits[i] * z[:, i:i + 1]
+    with np.errstate(all="ignore"):
+        lengths = np.stack(np.broadcast_arrays(*cable_lengths(model, angles, g)), axis=1)
+    deviation = (lengths - lengths[:, :, ref_index:ref_index + 1] - nominal_delta) * 1000.0
+    valid = np.all(np.isfinite(deviation), axis=(1, 2))
+    return z[valid], deviation[valid]
+
+
+def _attach_shared(name, shape):
+    block = shared_memory.SharedMemory(name=name)
+    grid = np.ndarray(shape, dtype=np.float64, buffer=block.buf)
+    grid.flags.writeable = False
+    _shared.update(block=block, grid=grid)
+
+
+def evaluate_chunk(task):
+    """One chunk of geometry sets (runs in a pool worker). Returns its partial statistics."""
+    model, nominal, names, limits, distribution, seed, count, ref_index, low, width = task
+    grid = _shared["grid"]
+    z, deviation = _deviations(model, nominal, names, limits, distribution, np.random.default_rng(seed),
+                               count, grid[0], grid[1:], ref_index)
+    cables, points = deviation.shape[1:]
+    bins = np.clip(((deviation - low) / width).astype(np.int64), 0, HISTOGRAM_BINS - 1)
+    bins += (np.arange(cables * points) * HISTOGRAM_BINS).reshape(cables, points)
+    x = np.hstack([np.ones((len(z), 1)), z])
+    return {
+        "count": len(z), "rejected": count - len(z),
+        "sum": deviation.sum(axis=0), "sum_sq": np.square(deviation).sum(axis=0),
+        "min": deviation.min(axis=0, initial=np.inf), "max": deviation.max(axis=0, initial=-np.inf),
+        "histogram": np.bincount(bins.ravel(), minlength=cables * points * HISTOGRAM_BINS),
+        "xtx": x.T @ x, "xty": (x.T @ deviation.reshape(len(z), -1)).reshape(-1, cables, points),
+    }
+
+
+def _merge(total, part):
+    if total is None:
+        return part
+    for key, value in part.items():
+        if key == "min":
+            total[key] = np.minimum(total[key], value)
+        elif key == "max":
+            total[key] = np.maximum(total[key], value)
+        else:
+            total[key] = total[key] + value
+    return total
+
+
+def percentiles(histogram, low, width, count, q):
+    """Percentile q (0-100) of every (cable, angle) histogram, interpolated inside the bin."""
+    cumulative = np.cumsum(histogram, axis=-1)
+    target = q / 100.0 * count
+    index = np.argmax(cumulative >= target, axis=-1)[..., None]
+    before = np.take_along_axis(cumulative, index, axis=-1) - np.take_along_axis(histogram, index, axis=-1)
+    inside = np.take_along_axis(histogram, index, axis=-1)
+    fraction = np.where(inside > 0, (target - before) / np.maximum(inside, 1), 0.0)
+    return low + (index[..., 0] + fraction[..., 0]) * width
+
+
+def sensitivities(stats):
+    """
+    Linear fit of the deviation on the perturbations at every (cable, angle).
+    Returns (largest effect over the range, um per full tolerance (params, cables),
+    share of each cable's variance over the range (params, cables), R^2 per cable).
+    """
+    n = stats["count"]
+    xty = stats["xty"]
+    coefficients = np.linalg.lstsq(stats["xtx"], xty.reshape(len(xty), -1), rcond=None)[0][1:]
+    coefficients = coefficients.reshape(-1, *xty.shape[1:])
+    z_mean = stats["xtx"][0, 1:] / n
+    z_var = np.diag(stats["xtx"])[1:] / n - z_mean**2
+    y_var = (stats["sum_sq"] / n - (stats["sum"] / n)**2).sum(axis=-1)
+    explained = (coefficients**2 * z_var[:, None, None]).sum(axis=-1)
+    share = explained / np.where(y_var > 0, y_var, np.inf)
+    largest = np.take_along_axis(coefficients, np.abs(coefficients).argmax(axis=-1)[..., None], axis=-1)[..., 0]
+    return largest, share, share.sum(axis=0)
+
+
+def analyse(model, nominal, names, limits, distribution="normal", samples=config.TOLERANCE_SAMPLES,
+            chunk=config.TOLERANCE_CHUNK, step_deg=config.TOLERANCE_GRID_STEP_DEG, jobs=1, seed=0, progress=None):
+    """Runs the Monte-Carlo analysis. Returns a dict of grid, nominal lengths, bands and sensitivities."""
+    start, end, reference = MODEL_RANGES[model]
+    angles = np.arange(start, end + step_deg / 2, step_deg)
+    ref_index = int(np.argmin(np.abs(angles - reference)))
+    nominal_lengths = np.stack(cable_lengths(model, angles, nominal))
+    nominal_delta = nominal_lengths - nominal_lengths[:, ref_index:ref_index + 1]
+
+    seeds = np.random.SeedSequence(seed).spawn(math.ceil(samples / chunk) + 1)
+    # Histogram range per (cable, angle) from a pilot chunk; values past it still count in the edge bins
+    _, pilot = _deviations(model, nominal, names, limits, distribution, np.random.default_rng(seeds[0]),
+                           min(chunk, samples), angles, nominal_delta, ref_index)
+    span = 2.0 * np.abs(pilot).max(axis=0) + 1e-6
+    low, width = -span, 2.0 * span / HISTOGRAM_BINS
+
+    tasks = []
+    for i, chunk_seed in enumerate(seeds[1:]):
+        count = min(chunk, samples - i * chunk)
+        tasks.append((model, nominal, names, limits, distribution, chunk_seed, count, ref_index, low, width))
+
+    grid = np.vstack([angles, nominal_delta])
+    block = shared_memory.SharedMemory(create=True, size=grid.nbytes)
+    stats = None
+    try:
+        np.ndarray(grid.shape, dtype=grid.dtype, buffer=block.buf)[:] = grid
+        if jobs > 1:
+            with Pool(min(jobs, len(tasks)), initializer=_attach_shared, initargs=(block.name, grid.shape)) as pool:
+                for done, part in enumerate(pool.imap_unordered(evaluate_chunk, tasks), 1):
+                    stats = _merge(stats, part)
+                    if progress:
+                        progress(done, len(tasks))
+        else:
+            _attach_shared(block.name, grid.shape)
+            for done, task in enumerate(tasks, 1):
+                stats = _merge(stats, evaluate_chunk(task))
+                if progress:
+                    progress(done, len(tasks))
+    finally:
+        if "block" in _shared: # In-process run: drop our view before the block goes away
+            _shared.pop("grid")
+            _shared.pop("block").close()
+        block.close()
+        block.unlink()
+
+    n = stats["count"]
+    if n == 0:
+        raise ValueError("No perturbed geometry set could be evaluated; the tolerances are too large.")
+    cables = len(MODEL_CABLES[model])
+    histogram = stats["histogram"].reshape(cables, len(angles), HISTOGRAM_BINS)
+    mean = stats["sum"] / n
+    effect, share, r_squared = sensitivities(stats)
+    return {
+        "model": model, "names": names, "limits": limits, "angles": angles, "reference": angles[ref_index],
+        "nominal_mm": nominal_lengths, "nominal_delta_mm": nominal_delta,
+        "samples": n, "rejected": stats["rejected"],
+        "mean_um": mean, "std_um": np.sqrt(np.maximum(stats["sum_sq"] / n - mean**2, 0)),
+        "min_um": stats["min"], "max_um": stats["max"],
+        "bands_um": np.stack([percentiles(histogram, low, width, n, q) for q in BAND_PERCENTILES]),
+        "clipped": int(histogram[..., 0].sum() + histogram[..., -1].sum()),
+        "effect_um": effect, "share": share, "r_squared": r_squared,
+    }
+
+
+def report(result, rows=10, top=5):
+    """Prints per-cable uncertainty bands (um and lead screw steps) and the most sensitive constants."""
+    angles = result["angles"]
+    low, mid, high = result["bands_um"]
+    step_um = 1000.0 / config.STEPS_TO_MM_LS
+    shown = np.unique(np.linspace(0, len(angles) - 1, rows).round().astype(int))
+    for c, cable in enumerate(MODEL_CABLES[result["model"]]):
+        widest = int(np.argmax(high[c] - low[c]))
+        print(f"\n{cable}: 95% band {low[c, widest]:+.2f} .. {high[c, widest]:+.2f} um "
+              f"({(high[c, widest] - low[c, widest]) / step_um:.1f} steps wide) at {angles[widest]:g} deg, "
+              f"extremes {result['min_um'][c].min():+.2f} .. {result['max_um'][c].max():+.2f} um")
+        print(f"  {'angle':>7s} {'nominal dL mm':>14s} {'p2.5 um':>9s} {'p50 um':>8s} {'p97.5 um':>9s} {'std um':>8s} {'+/- steps':>9s}")
+        for i in shown:
+            half_steps = max(abs(low[c, i]), abs(high[c, i])) / step_um
+            print(f"  {angles[i]:7.1f} {result['nominal_delta_mm'][c, i]:14.4f} {low[c, i]:9.2f} {mid[c, i]:8.2f} "
+                  f"{high[c, i]:9.2f} {result['std_um'][c, i]:8.2f} {half_steps:9.1f}")
+        print(f"  Most sensitive constants (a linear fit explains {result['r_squared'][c] * 100:.0f}% of the variance):")
+        for p in np.argsort(-result["share"][:, c])[:top]:
+            name = result["names"][p]
+            unit, scale = ("deg", 1.0) if name in ANGLE_CONSTANTS else \
+                ("mm", 1e3 if result["model"].startswith("kinematic") else 1.0)
+            print(f"    {name:18s} +/-{result['limits'][p] * scale:g} {unit:3s} -> up to {result['effect_um'][p, c]:+8.2f} um "
+                  f"({result['share'][p, c] * 100:4.1f}% of variance)")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("model", choices=sorted(MODEL_RANGES))
+    parser.add_argument("--samples", type=int, default=config.TOLERANCE_SAMPLES)
+    parser.add_argument("--chunk", type=int, default=config.TOLERANCE_CHUNK, help="Geometry sets per vectorised call")
+    parser.add_argument("--params", help="Comma-separated constants to perturb (default: all of the model's)")
+    parser.add_argument("--length-mm", type=float, default=config.TOLERANCE_LENGTH_MM, help="+/- tolerance of lengths")
+    parser.add_argument("--angle-deg", type=float, default=config.TOLERANCE_ANGLE_DEG, help="+/- tolerance of angles")
+    parser.add_argument("--tol", help="Per-constant overrides, name=value pairs (mm or deg)")
+    parser.add_argument("--distribution", choices=("normal", "uniform"), default="normal")
+    parser.add_argument("--step-deg", type=float, default=config.TOLERANCE_GRID_STEP_DEG, help="Angle grid spacing")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1, help="Worker processes")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--npz", help="Also save the grid, bands and sensitivities to this .npz")
+    args = parser.parse_args(argv)
+
+    names = tuple(args.params.split(",")) if args.params else tuple(DEFAULT_GEOMETRY[args.model])
+    unknown = set(names) - set(DEFAULT_GEOMETRY[args.model])
+    if unknown:
+        parser.error(f"{args.model} has no constant {', '.join(sorted(unknown))}")
+    overrides = {name: float(value) for name, value in (pair.split("=", 1) for pair in args.tol.split(","))} \
+        if args.tol else None
+    limits = tolerance_limits(args.model, names, args.length_mm, args.angle_deg, overrides)
+
+    started = time.perf_counter()
+    progress = lambda done, total: print(f"  {done}/{total} chunks", end="\r")
+    result = analyse(args.model, load_geometry(args.model), names, limits, args.distribution, args.samples,
+                     args.chunk, args.step_deg, args.jobs, args.seed, progress)
+    elapsed = time.perf_counter() - started
+    print()
+    angles = result["angles"]
+    print(f"{args.model}: {result['samples']} geometry sets x {len(angles)} angles ({angles[0]:g}..{angles[-1]:g} deg, "
+          f"reference {result['reference']:g}) in {elapsed:.1f} s on {args.jobs} process(es); {args.distribution}, "
+          f"+/-{args.length_mm:g} mm / +/-{args.angle_deg:g} deg" + (" (3 sigma)" if args.distribution == "normal" else ""))
+    if result["rejected"]:
+        print(f"{result['rejected']} sets could not be evaluated (geometry does not close) and were dropped.")
+    if result["clipped"]:
+        print(f"{result['clipped']} deviations fell outside the histogram range; the bands near the edges are approximate.")
+    report(result)
+    if args.npz:
+        np.savez(args.npz, **{key: value for key, value in result.items() if key != "model"}, model=args.model)
+        print(f"\nWritten {args.npz}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
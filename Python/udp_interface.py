@@ -0,0 +1,153 @@
+import os
+import socket
+import struct
+import threading
+import time
+
+import config
+
+# One datagram = one target: seq (uint32), send time (time.time(), float64),
+# then Q1, Q2, Q3, Q4L, Q4R in degrees (GUI frame, same as the ROS path produces). Little-endian.
+TARGET_PACKET = struct.Struct("<Id5d")
+SEQ_MODULUS = 1 << 32
+
+
+def pack_target(seq, timestamp, values):
+    """Builds one target datagram. For senders; values in TARGET_KEYS order."""
+    return TARGET_PACKET.pack(seq % SEQ_MODULUS, timestamp, *values)
+
+
+def parse_address(spec):
+    """
+    "host:port" -> (AF_INET, (host, port)); "unix:/path" -> (AF_UNIX, "/path").
+    """
+    if spec.startswith("unix:"):
+        if not hasattr(socket, "AF_UNIX"):
+            raise ValueError("Unix-domain sockets are not available on this platform.")
+        return socket.AF_UNIX, spec[len("unix:"):]
+    host, sep, port = spec.rpartition(":")
+    if not sep:
+        raise ValueError(f"Expected host:port or unix:/path, got '{spec}'")
+    return socket.AF_INET, (host or "127.0.0.1", int(port))
+
+
+def is_newer_seq(seq, last_seq):
+    """Serial-number comparison, so the 32-bit counter can wrap."""
+    return 0 < (seq - last_seq) % SEQ_MODULUS < SEQ_MODULUS // 2
+
+
+class UDPTargetListener(threading.Thread):
+    """
+    Receives target datagrams on a UDP or Unix-domain datagram socket and
+    publishes them to a TargetMailbox, like ROSSubscriberThread but without
+    rospy. Out-of-order packets (seq not newer than the last accepted one) are
+    dropped. Targets are stamped with their arrival time, unless
+    use_send_stamp trusts the sender's clock: then they carry the send
+    timestamp and packets older than max_age_s are dropped as stale.
+    """
+    def __init__(self, address, target_mailbox, log_callback, max_age_s=config.UDP_MAX_TARGET_AGE_S,
+                 resync_after_s=config.UDP_RESYNC_AFTER_S, use_send_stamp=config.UDP_USE_SEND_STAMP):
+        super().__init__(daemon=True)
+        self.address = address
+        self._family, self._bind_address = parse_address(address)
+        self._target_mailbox = target_mailbox
+        self._log_callback = log_callback
+        self.max_age_s = max_age_s
+        self.resync_after_s = resync_after_s
+        self.use_send_stamp = use_send_stamp
+        self._stop_event = threading.Event()
+        self._sock = None
+
+        self.received = 0
+        self.accepted = 0
+        self.dropped_out_of_order = 0
+        self.dropped_stale = 0
+        self.dropped_malformed = 0
+
+    def open(self):
+        """Binds the socket. Called by run(), or earlier to fail fast on a busy port."""
+        if self._sock:
+            return
+        sock = socket.socket(self._family, socket.SOCK_DGRAM)
+        try:
+            if self._family == socket.AF_UNIX:
+                if os.path.exists(self._bind_address):
+                    os.unlink(self._bind_address) # Left over from a previous run
+            sock.bind(self._bind_address)
+            sock.settimeout(0.1) # So stop() is noticed
+        except Exception:
+            sock.close()
+            raise
+        self._sock = sock
+
+    def run(self):
+        try:
+            self.open()
+        except Exception as e:
+            self._log_callback(f"UDP Thread: Could not bind {self.address}: {e}", level="error")
+            return
+        self._log_callback(f"UDP Thread: Listening for targets on {self.address}.")
+
+        buffer = bytearray(TARGET_PACKET.size + 1) # +1 so oversized datagrams are detected
+        view = memoryview(buffer)
+        unpack_from = TARGET_PACKET.unpack_from
+        packet_size = TARGET_PACKET.size
+        mailbox = self._target_mailbox
+        last_seq = None
+        last_accepted = 0.0
+        try:
+            while not self._stop_event.is_set():
+                try:
+                    nbytes = self._sock.recv_into(view)
+                except socket.timeout:
+                    continue
+                received_at = time.monotonic()
+                self.received += 1
+                if nbytes != packet_size:
+                    self.dropped_malformed += 1
+                    continue
+
+                seq, timestamp, q1, q2, q3, q4l, q4r = unpack_from(buffer)
+                if (last_seq is not None and not is_newer_seq(seq, last_seq)
+                        and received_at - last_accepted < self.resync_after_s):
+                    self.dropped_out_of_order += 1
+                    continue
+                now = time.time()
+                if self.use_send_stamp and timestamp:
+                    if self.max_age_s and now - timestamp > self.max_age_s:
+                        self.dropped_stale += 1
+                        continue
+                    now = timestamp
+
+                last_seq = seq
+                last_accepted = received_at
+                self.accepted += 1
+                mailbox.publish((q1, q2, q3, q4l, q4r), now)
+        except Exception as e:
+            self._log_callback(f"UDP Thread: An error occurred during run: {e}", level="error")
+        finally:
+            self.close()
+            self._log_callback("UDP Thread: Exiting.")
+
+    def close(self):
+        if self._sock:
+            self._sock.close()
+            self._sock = None
+            if self._family == socket.AF_UNIX and os.path.exists(self._bind_address):
+                os.unlink(self._bind_address)
+
+    def stop(self):
+        """Signals the thread's run loop to terminate."""
+        self._stop_event.set()
+
+    def stats(self):
+        return {
+            "udp_received": self.received,
+            "udp_accepted": self.accepted,
+            "udp_dropped_out_of_order": self.dropped_out_of_order,
+            "udp_dropped_stale": self.dropped_stale,
+            "udp_dropped_malformed": self.dropped_malformed,
+        }
+
+    def summary(self):
+        return ", ".join(f"{k[4:]}={v}" for k, v in self.stats().items())
@@ -0,0 +1,283 @@
+"""
+Precomputed workspace of the arm and fast trajectory validation.
+
+A move from the home pose to any pose costs each motor the sum of one
+contribution per joint, and each contribution depends on that joint's
+angle alone (the coupling models act joint by joint). The (Q1, Q2, Q3, Q4L,
+Q4R) grid is therefore stored as five 1-D tables: per joint, every motor's
+steps for a move from HOME_JOINT_DEGREES to each angle of a
+WORKSPACE_GRID_STEP_DEG grid over its JOINT_RANGE_DEG, compiled with the batch
+step compiler (batch_steps.py). The motor positions of a whole trajectory
+are five interpolations and a sum. Where a table jumps (the wrist path
+length switches case near Q3 = 83 and 97 deg) the jump is located by
+bisection and both sides are inserted into that joint's grid, so no
+interpolation spans it. Direction compensation (a fixed offset per
+reversal) is not in the tables.
+
+The tables are cached as workspace/workspace_<key>.npz. The key hashes
+everything they are built from (cable geometry, coupling model
+coefficients, conversion constants, grid), so a new geometry fit or
+calibration capture builds a new cache on first use.
+
+    python workspace.py                  # build or load the cache and summarise it
+    python workspace.py session.csv      # validate a recorded target stream (target_replay formats)
+"""
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+from collections import namedtuple
+
+import numpy as np
+
+import config
+from config import MotorIndex
+import batch_steps
+import experimental_model
+from joint_state import JOINT_KEYS
+from limit_guard import LIMITED_MOTORS
+from motion_controller import TARGET_KEYS
+
+CACHE_FORMAT = 2
+JUMP_MARGIN_STEPS = 8 # A grid cell changing more than 4x the typical cell plus this is a discontinuity
+JUMP_BISECTIONS = 40
+
+# Violation bits per waypoint
+OUT_OF_RANGE = 1 # A joint outside its JOINT_RANGE_DEG
+CABLE_BUDGET = 2 # A lead screw further than CABLE_TRAVEL_BUDGET_MM from home
+FIRMWARE_LIMIT = 4 # Q1 motor certainly outside the firmware's theta limits; FIRMWARE_LIMIT << 1 for Q2
+
+LEAD_SCREW_MOTORS = (MotorIndex.WPD, MotorIndex.WPU, MotorIndex.RJL, MotorIndex.RJR, MotorIndex.LJR, MotorIndex.LJL)
+
+# ok: every waypoint passes. violations: bitmask per waypoint. positions: motor steps from home per waypoint (n, 8).
+# first_bad: index of the first failing waypoint or None. message: what is wrong with it ("" when ok).
+TrajectoryCheck = namedtuple("TrajectoryCheck", ["ok", "violations", "positions", "first_bad", "message"])
+
+
+def workspace_dir():
+    return os.path.join(os.path.dirname(os.path.abspath(__file__)), config.WORKSPACE_DIR_NAME)
+
+
+def joint_ranges():
+    """(low, high) per joint from config.JOINT_RANGE_DEG, TARGET_KEYS order."""
+    return [tuple(config.JOINT_RANGE_DEG[key]) for key in TARGET_KEYS]
+
+
+def cache_key(step_deg, ranges):
+    """Hash of everything the tables depend on."""
+    inputs = {
+        "format": CACHE_FORMAT, "step_deg": step_deg, "ranges": [list(r) for r in ranges],
+        "home": config.HOME_JOINT_DEGREES,
+        "wrist_geometry": batch_steps.wrist_geometry(), "coupling": experimental_model.model_coefficients(),
+        "conversion": [config.STEPS_PER_REV, config.LEAD_SCREW_PITCH, config.CAPSTAN_CIRCUMFERENCE,
+                       config.STEPS_TO_MM_LS, config.STEPS_TO_MM_CAPSTAN],
+        "radii": [batch_steps.q1_pl.q1_rad, batch_steps.q1_pl.q3_radius, batch_steps.q1_pl.jaw_radius,
+                  batch_steps.q2_pl.EY_effective_radius, batch_steps.q2_pl.q4_radius,
+                  batch_steps.q3_pl.WP_EFFECTIVE_RADIUS_MM, batch_steps.q4_pl.jaw_radius],
+    }
+    return hashlib.sha1(json.dumps(inputs, sort_keys=True).encode()).hexdigest()[:12]
+
+
+def _from_home(joint, angles):
+    """Steps (n, 8) of one joint's move from home to each angle, without direction compensation."""
+    deltas = np.asarray(angles, dtype=float) - config.HOME_JOINT_DEGREES
+    home = np.full(len(deltas), float(config.HOME_JOINT_DEGREES))
+    return batch_steps.joint_contributions(joint, home, deltas, np.sign(deltas))[0]
+
+
+def _split_jumps(joint, grid, table):
+    """Inserts both sides of every discontinuity of a joint's table into its grid."""
+    change = np.abs(np.diff(table, axis=0))
+    cells = np.flatnonzero(np.any(change > 4 * np.median(change, axis=0) + JUMP_MARGIN_STEPS, axis=1))
+    if not len(cells):
+        return grid, table
+    low, high = grid[cells].copy(), grid[cells + 1].copy()
+    left, right = table[cells].copy(), table[cells + 1].copy()
+    for _ in range(JUMP_BISECTIONS):
+        middle = (low + high) / 2
+        value = _from_home(joint, middle)
+        on_left = np.abs(value - left).max(axis=1) <= np.abs(value - right).max(axis=1)
+        low, left = np.where(on_left, middle, low), np.where(on_left[:, None], value, left)
+        high, right = np.where(on_left, high, middle), np.where(on_left[:, None], right, value)
+    grid = np.insert(grid, np.repeat(cells + 1, 2), np.column_stack([low, high]).ravel())
+    table = np.insert(table, np.repeat(cells + 1, 2), np.stack([left, right], axis=1).reshape(-1, table.shape[1]), axis=0)
+    return grid, table
+
+
+class Workspace:
+    """Per-joint step tables over the joint range, and trajectory checks against them."""
+    def __init__(self, grids, tables, step_deg, key=None):
+        self.grids = grids # Per joint (JOINT_KEYS order): increasing angles, degrees
+        self.tables = tables # Per joint: steps from home (len(grid), 8), MotorIndex order
+        self.step_deg = step_deg # Spacing of the grid before discontinuities were split
+        self.key = key
+        self.low = np.array([grid[0] for grid in grids], dtype=float) # Per joint
+        self.high = np.array([grid[-1] for grid in grids], dtype=float)
+        # Lookup without a search: the grid point that starts each step_deg bucket, the slope
+        # of every cell, and how many inserted points a bucket can hold beyond its start
+        self._starts, self._slopes, self._extra = [], [], []
+        for grid, table in zip(grids, tables):
+            buckets = int(round((grid[-1] - grid[0]) / step_deg))
+            self._starts.append(np.searchsorted(grid, grid[0] + step_deg * np.arange(buckets), side="right") - 1)
+            self._slopes.append(np.diff(table, axis=0) / np.diff(grid)[:, None])
+            self._extra.append(int(np.diff(np.append(self._starts[-1], len(grid) - 1)).max()) - 1)
+
+    @classmethod
+    def build(cls, step_deg=config.WORKSPACE_GRID_STEP_DEG, ranges=None, key=None):
+        grids, tables = [], []
+        for joint, (low, high) in enumerate(ranges or joint_ranges()):
+            grid = low + step_deg * np.arange(int(round((high - low) / step_deg)) + 1)
+            joint_grid, table = _split_jumps(joint, grid, _from_home(joint, grid))
+            grids.append(joint_grid)
+            tables.append(table)
+        return cls(grids, tables, step_deg, key)
+
+    @classmethod
+    def load(cls, step_deg=config.WORKSPACE_GRID_STEP_DEG, ranges=None, rebuild=False):
+        """The cached tables for the current models, built and saved first if there are none."""
+        ranges = ranges or joint_ranges()
+        key = cache_key(step_deg, ranges)
+        path = os.path.join(workspace_dir(), f"workspace_{key}.npz")
+        if not rebuild and os.path.exists(path):
+            with np.load(path) as data:
+                joints = range(len(JOINT_KEYS))
+                return cls([data[f"grid_{j}"] for j in joints], [data[f"table_{j}"] for j in joints], step_deg, key)
+        workspace = cls.build(step_deg, ranges, key)
+        os.makedirs(workspace_dir(), exist_ok=True)
+        temp_path = path + ".tmp.npz"
+        arrays = {f"grid_{j}": grid for j, grid in enumerate(workspace.grids)}
+        arrays.update({f"table_{j}": table for j, table in enumerate(workspace.tables)})
+        np.savez(temp_path, **arrays)
+        os.replace(temp_path, path)
+        return workspace
+
+    def cache_path(self):
+        return os.path.join(workspace_dir(), f"workspace_{self.key}.npz") if self.key else None
+
+    def in_range(self, poses):
+        """(n, 5) bool: joint inside the tables' range."""
+        poses = np.atleast_2d(np.asarray(poses, dtype=float))
+        return (poses >= self.low) & (poses <= self.high)
+
+    def motor_positions(self, poses):
+        """Motor steps from home for each pose (n, 5), JOINT_KEYS order -> (n, 8). Out-of-range joints are clamped."""
+        poses = np.atleast_2d(np.asarray(poses, dtype=float))
+        total = np.zeros((len(poses), len(MotorIndex)))
+        for joint, (grid, table) in enumerate(zip(self.grids, self.tables)):
+            starts = self._starts[joint]
+            angles = np.clip(poses[:, joint], grid[0], grid[-1])
+            bucket = np.clip(((angles - grid[0]) / self.step_deg).astype(np.int64), 0, len(starts) - 1)
+            index = np.take(starts, bucket)
+            for _ in range(self._extra[joint]): # Step past the points inserted at a discontinuity
+                index += (index < len(grid) - 2) & (angles >= np.take(grid, np.minimum(index + 1, len(grid) - 1)))
+            offset = (angles - np.take(grid, index))[:, None]
+            total += np.take(table, index, axis=0) + np.take(self._slopes[joint], index, axis=0) * offset
+        return total
+
+    def validate_trajectory(self, targets, start=None, limits=None, present=None,
+                            budget_mm=config.CABLE_TRAVEL_BUDGET_MM):
+        """
+        Checks every waypoint of a trajectory before it is streamed.
+
+        targets: (n, 5) joint targets in degrees, TARGET_KEYS order.
+        start: pose the stream starts from (default home); only used for the firmware limit check.
+        limits / present: LimitGuard.limits and LimitGuard.positions ((min, max) and (lo, hi) per
+        limited motor, None when unknown); a waypoint fails when the motor would certainly be
+        outside its limits, as the firmware's pre-move check would find.
+        """
+        targets = np.atleast_2d(np.asarray(targets, dtype=float))
+        positions = self.motor_positions(targets)
+        violations = np.where(np.all(self.in_range(targets), axis=1), 0, OUT_OF_RANGE)
+        if budget_mm is not None:
+            travel_mm = np.abs(positions[:, LEAD_SCREW_MOTORS]) / config.STEPS_TO_MM_LS
+            violations |= np.where(np.any(travel_mm > budget_mm, axis=1), CABLE_BUDGET, 0)
+        if limits is not None and present is not None:
+            start_positions = self.motor_positions(start if start is not None else
+                                                   np.full(len(JOINT_KEYS), float(config.HOME_JOINT_DEGREES)))[0]
+            for slot, ((_, motor, _), limit, interval) in enumerate(zip(LIMITED_MOTORS, limits, present)):
+                if limit is None or interval is None:
+                    continue
+                moved = positions[:, motor] - start_positions[motor]
+                blocked = (interval[0] + moved > limit[1]) | (interval[1] + moved < limit[0])
+                violations |= np.where(blocked, FIRMWARE_LIMIT << slot, 0)
+        bad = np.flatnonzero(violations)
+        first_bad = int(bad[0]) if len(bad) else None
+        message = self.describe(targets, positions, violations, first_bad, budget_mm) if first_bad is not None else ""
+        return TrajectoryCheck(first_bad is None, violations, np.rint(positions).astype(np.int64), first_bad, message)
+
+    def describe(self, targets, positions, violations, index, budget_mm=config.CABLE_TRAVEL_BUDGET_MM):
+        """Human-readable reasons waypoint index fails."""
+        reasons = []
+        if violations[index] & OUT_OF_RANGE:
+            outside = [f"{key}={targets[index, j]:.2f} outside {self.low[j]:g}..{self.high[j]:g} deg"
+                       for j, key in enumerate(TARGET_KEYS) if not self.low[j] <= targets[index, j] <= self.high[j]]
+            reasons.append(", ".join(outside))
+        if violations[index] & CABLE_BUDGET:
+            over = [f"{MotorIndex(m).name} {positions[index, m] / config.STEPS_TO_MM_LS:+.2f} mm"
+                    for m in LEAD_SCREW_MOTORS if abs(positions[index, m]) / config.STEPS_TO_MM_LS > budget_mm]
+            reasons.append(f"{', '.join(over)} from home (budget +/-{budget_mm:g} mm)")
+        for slot, (name, _, _) in enumerate(LIMITED_MOTORS):
+            if violations[index] & (FIRMWARE_LIMIT << slot):
+                reasons.append(f"{name} motor outside its firmware limits")
+        return f"waypoint {index}: " + "; ".join(reasons)
+
+    def summary(self):
+        travel = sum(np.abs(table).max(axis=0) for table in self.tables)
+        worst = max(LEAD_SCREW_MOTORS, key=lambda m: travel[m])
+        points = ", ".join(f"{key} {low:g}..{high:g} deg ({len(grid)} points)"
+                           for key, low, high, grid in zip(TARGET_KEYS, self.low, self.high, self.grids))
+        return (f"Joint tables: {points}; largest lead screw travel "
+                f"from home: {MotorIndex(worst).name} up to {travel[worst] / config.STEPS_TO_MM_LS:.2f} mm")
+
+
+_default_workspace = None
+
+
+def default_workspace():
+    """The cached workspace for the current models, loaded once per process."""
+    global _default_workspace
+    if _default_workspace is None:
+        _default_workspace = Workspace.load()
+    return _default_workspace
+
+
+def validate_trajectory(targets, **kwargs):
+    """Workspace.validate_trajectory on the default workspace."""
+    return default_workspace().validate_trajectory(targets, **kwargs)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("targets", nargs="?", help="Target CSV (time,Q1..Q4R) or rostopic JointState export")
+    parser.add_argument("--rebuild", action="store_true", help="Rebuild the cache even if it exists")
+    parser.add_argument("--budget-mm", type=float, default=config.CABLE_TRAVEL_BUDGET_MM)
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    workspace = Workspace.load(rebuild=args.rebuild)
+    print(f"Workspace {workspace.cache_path()} ready in {(time.perf_counter() - started) * 1000:.0f} ms")
+    print(workspace.summary())
+    if not args.targets:
+        return 0
+
+    from target_replay import read_targets
+    targets = np.array([values for _, values in read_targets(args.targets)], dtype=float)
+    started = time.perf_counter()
+    check = workspace.validate_trajectory(targets, budget_mm=args.budget_mm)
+    elapsed = time.perf_counter() - started
+    print(f"{len(targets)} waypoints checked in {elapsed * 1000:.2f} ms")
+    if check.ok:
+        print("All waypoints are inside the workspace.")
+        return 0
+    counts = {name: int(np.count_nonzero(check.violations & bit)) for name, bit in
+              (("joint range", OUT_OF_RANGE), ("cable budget", CABLE_BUDGET),
+                                   ("firmware limits", FIRMWARE_LIMIT | FIRMWARE_LIMIT << 1))}
+    print(f"{np.count_nonzero(check.violations)} waypoints fail ({', '.join(f'{n} {c}' for n, c in counts.items() if c)})")
+    print(f"First: {check.message}")
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())